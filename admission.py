@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Admission control for the expensive stages of a search
+Each limiter lets a fixed number of requests run a stage at once and
+queues a bounded number of others, each only until its request's
+deadline. Anything beyond that is turned away immediately with
+`Overloaded`, which the API answers with a 503 and Retry-After, instead
+of letting every queued request's latency climb until workers time out.
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from metrics import registry
+
+ADMISSION_WAIT_SECONDS = registry.histogram(
+    "admission_wait_seconds", "Time spent queued for a stage's admission slot", ["stage"])
+ADMISSION_REJECTED = registry.counter(
+    "admission_rejected_total", "Requests turned away by admission control", ["stage", "reason"])
+
+class Overloaded(Exception):
+    """A stage's queue was full, or the request's deadline passed while it waited"""
+
+    def __init__(self, stage_name, reason, retry_after):
+        super().__init__(f"{stage_name} is overloaded ({reason})")
+        self.stage = stage_name
+        self.reason = reason
+        self.retry_after = retry_after
+
+class AdmissionLimiter:
+    """Concurrency limit with a bounded FIFO wait queue, used from one event loop"""
+
+    def __init__(self, name, limit, max_queue, retry_after=1):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.active = 0
+        self._waiters = deque()
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    def _reject(self, reason):
+        ADMISSION_REJECTED.inc(stage=self.name, reason=reason)
+        raise Overloaded(self.name, reason, self.retry_after)
+
+    async def acquire(self, deadline):
+        """Take a slot, waiting until deadline (a time.monotonic() value) at most"""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            ADMISSION_WAIT_SECONDS.observe(0.0, stage=self.name)
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._reject("queue_full")
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            self._reject("deadline")
+        
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        expiry = loop.call_later(timeout, self._expire, waiter)
+        started = time.perf_counter()
+        try:
+            admitted = await waiter
+        except asyncio.CancelledError:
+            # The request was abandoned; pass on a slot it had already been handed
+            if waiter.done() and not waiter.cancelled() and waiter.result():
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+        finally:
+            expiry.cancel()
+        ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - started, stage=self.name)
+        if not admitted:
+            self._reject("deadline")
+
+    def _expire(self, waiter):
+        if not waiter.done():
+            self._waiters.remove(waiter)
+            waiter.set_result(False)
+
+    def release(self):
+        """Free a slot, handing it straight to the oldest waiter if there is one"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, deadline):
+        await self.acquire(deadline)
+        try:
+            yield
+        finally:
+            self.release()
@@ -1,22 +1,53 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import Response
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import Match
 import lancedb
 from sentence_transformers import SentenceTransformer
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from pydantic import BaseModel
 from urllib.parse import unquote
 import numpy as np
 import pandas as pd
-import base64
+import pyarrow as pa
+import hmac
+import json
+import os
+import threading
+import time
+import tracemalloc
+from datetime import timedelta
 
-# Configuration
-class Config:
-    LANCEDB_PATH = "./data"
-    TABLE_NAME = "hm_mini"
-    EMBEDDING_MODEL = "clip-ViT-B-32"
-    GROUP_ORDER = ["Menswear", "Ladieswear", "Divided", "Baby/Children", "Sport"]
+from admission import AdmissionLimiter, Overloaded
+from batch_search import BatchSearchRequest, BatchSearchSpec, run_batch, validate_batch
+from caching import LRUCache, VersionedValue, etag_matches, make_etag
+from coalesce import SharedFlight, SingleFlight
+from compression import compress_body
+from config import Config
+from exact_engine import export_dir, load_or_export, remove_stale_exports
+from facets import GROUP_COLUMN, TYPE_COLUMN, build_facets
+from image_embeddings import IMAGE_VECTOR_COLUMN, TEXT_VECTOR_COLUMN, VECTOR_METRICS
+from image_store import load_row_image, open_image_table, row_image_hash
+from maintenance import MaintenanceScheduler
+from memory import memory_report, process_memory, register_cache
+from metrics import (REQUEST_SECONDS, current_timings, registry, server_timing_header, stage,
+                     stage_totals, start_request)
+from neighbor_graph import NEIGHBOR_FALLBACKS, neighbor_table_name
+from profiling import RequestProfiler, SlowQueryLog, sampled
+from reduced_vectors import (REDUCED_VECTOR_COLUMN, PCAProjection, load_table_projection,
+                             projection_fingerprint, rerank)
+from search_targets import check_target, fuse_results
+from streaming import frame_results
+from suggest import QueryLog, build_prefix_index
+from table_ops import fetch_items, quote_literal
+from warmup import WarmUp, warm_searches
+
+async def run_in_worker(fn, *args, **kwargs):
+    """run_in_threadpool, sampling the worker thread too when the request is profiled"""
+    return await run_in_threadpool(sampled(fn), *args, **kwargs)
 
 class SearchResult(BaseModel):
     image_url: str
@@ -33,12 +64,51 @@ class SearchResult(BaseModel):
     class Config:
         from_attributes = True
 
+RESULT_COLUMNS = list(SearchResult.__annotations__)
+
+# LanceDB's query builder probes 20 partitions by default; match it when
+# querying the Lance dataset directly
+DEFAULT_NPROBES = 20
+
 class LanceDBService:
     def __init__(self):
         self.db = lancedb.connect(Config.LANCEDB_PATH)
         self.encoder = SentenceTransformer(Config.EMBEDDING_MODEL)
         self.table = None
         self._ensure_table_exists()
+        self.image_table = None
+        self.neighbor_table = None
+        self.similar_cache = register_cache("similar", LRUCache(
+            Config.SIMILAR_CACHE_ENTRIES, Config.SIMILAR_CACHE_BYTES
+        ))
+        self.search_cache = register_cache("search", LRUCache(
+            Config.SEARCH_CACHE_ENTRIES, Config.SEARCH_CACHE_BYTES
+        ))
+        self.query_vectors = register_cache("query_vectors", LRUCache(
+            Config.QUERY_VECTOR_CACHE_ENTRIES
+        ))
+        self.query_log = QueryLog(Config.QUERY_LOG_PATH, Config.QUERY_LOG_MAX_BYTES)
+        self.encode_limiter = AdmissionLimiter(
+            "encode", Config.ENCODE_CONCURRENCY, Config.ENCODE_QUEUE_SIZE, Config.RETRY_AFTER_SECONDS
+        )
+        self.query_limiter = AdmissionLimiter(
+            "query", Config.QUERY_CONCURRENCY, Config.QUERY_QUEUE_SIZE, Config.RETRY_AFTER_SECONDS
+        )
+        # Identical concurrent searches and image fetches share one execution,
+        # across workers too when they share a coalescing directory
+        self.flights = {kind: SingleFlight(kind) for kind in ("search", "image")}
+        self.shared_flights = {}
+        if Config.COALESCE_SHARED_DIR:
+            self.shared_flights = {
+                kind: SharedFlight(kind, Config.COALESCE_SHARED_DIR, Config.COALESCE_SHARED_TTL_SECONDS)
+                for kind in self.flights
+            }
+        # Rebuilt from the table whenever its version changes
+        self.suggest_index = VersionedValue(self._build_suggest_index)
+        self.facets = VersionedValue(self._build_facets)
+        self.exact_engine = VersionedValue(self._load_exact_engine)
+        self.projection = VersionedValue(self._load_projection)
+        self._exact_pending = None
 
     def _ensure_table_exists(self):
         """Ensure the table exists, create if it doesn't"""
@@ -49,7 +119,8 @@ class LanceDBService:
             # For now, we'll create an empty table with the expected schema
             schema = {
                 "image_url": "string",
-                "image_data": "string",  # Base64 encoded image data
+                "image_data": "string",  # Base64 encoded image data (legacy rows)
+                "image_hash": "string",  # Key into the shared image blob table
                 "prod_name": "string", 
                 "detail_desc": "string",
                 "product_type_name": "string",
@@ -59,10 +130,25 @@ class LanceDBService:
                 "available": "bool",
                 "color": "string",
                 "size": "string",
-                "vector": "float32[512]"  # Assuming 512-dimensional vectors
+                "vector": "float32[512]",  # Assuming 512-dimensional vectors
+                "image_vector": "float32[512]"  # CLIP embedding of the product photo
             }
             self.table = self.db.create_table(Config.TABLE_NAME, schema=schema)
 
+    def get_image_table(self):
+        """Open the shared image blob table on first use"""
+        if self.image_table is None:
+            self.image_table = open_image_table(self.db, Config.IMAGE_TABLE_NAME)
+        return self.image_table
+
+    def get_neighbor_table(self):
+        """Open the precomputed neighbor table on first use, if it has been built"""
+        if self.neighbor_table is None:
+            name = neighbor_table_name(Config.TABLE_NAME)
+            if name in self.db.table_names():
+                self.neighbor_table = self.db.open_table(name)
+        return self.neighbor_table
+
     def create_filter(self, groups: List[str] = None, items: List[str] = None) -> str:
         """Create LanceDB filter string"""
         conditions = []
@@ -77,67 +163,471 @@ class LanceDBService:
             return " AND ".join(conditions)
         return None
 
+    def _load_projection(self) -> Optional[PCAProjection]:
+        return load_table_projection(self.table.schema, Config.LANCEDB_PATH, Config.TABLE_NAME)
+
+    def _reduced_projection(self) -> Optional[PCAProjection]:
+        """The PCA projection for reduced first-stage search, if enabled and trained
+
+        Only a projection whose fingerprint matches the one recorded on the
+        table's reduced column is used; while a retrain is being picked up
+        (or its file is missing), searches take the full-vector path.
+        """
+        if not Config.REDUCED_SEARCH:
+            return None
+        fingerprint = projection_fingerprint(self.table.schema)
+        if fingerprint is None:
+            return None
+        projection = self.projection.get(self.table.version)
+        if projection is None or projection.fingerprint != fingerprint:
+            return None
+        return projection
+
+    def _reduced_search(self, projection: PCAProjection, query_vector,
+                        filter_condition: Optional[str], limit: int) -> pd.DataFrame:
+        """Scan the reduced column for a candidate pool, then rerank with full vectors"""
+        reduced_query = projection.transform(query_vector).tolist()
+        search_query = self.table.search(reduced_query, vector_column_name=REDUCED_VECTOR_COLUMN)
+        search_query = search_query.metric("L2")
+        if filter_condition:
+            search_query = search_query.where(filter_condition)
+        with stage("query"):
+            results = search_query.limit(limit * Config.REDUCED_CANDIDATE_FACTOR).to_arrow()
+        with stage("to_pandas"):
+            candidates = results.to_pandas()
+        with stage("rerank"):
+            return rerank(candidates, query_vector, limit)
+
+    def _vector_search(self, query_vector, column: str, filter_condition: Optional[str],
+                       limit: int) -> pd.DataFrame:
+        """Run a vector search against one vector column"""
+        projection = self._reduced_projection() if column == TEXT_VECTOR_COLUMN else None
+        if projection is not None:
+            return self._reduced_search(projection, query_vector, filter_condition, limit)
+        
+        search_query = self.table.search(query_vector, vector_column_name=column)
+        search_query = search_query.metric(VECTOR_METRICS[column])
+        if filter_condition:
+            search_query = search_query.where(filter_condition)
+        with stage("query"):
+            results = search_query.limit(limit).to_arrow()
+        with stage("to_pandas"):
+            return results.to_pandas()
+
+    def _load_exact_engine(self):
+        dataset = self.table.to_lance()
+        engine = load_or_export(dataset, Config.EXACT_ENGINE_DIR, Config.TABLE_NAME,
+                                Config.EXACT_ENGINE)
+        remove_stale_exports(Config.EXACT_ENGINE_DIR, Config.TABLE_NAME, export_dir(
+            Config.EXACT_ENGINE_DIR, Config.TABLE_NAME, engine.version, Config.EXACT_ENGINE))
+        print(f"Exact engine ready: {len(engine)} {Config.EXACT_ENGINE} vectors (version {engine.version})")
+        return engine
+
+    def _usable_exact_engine(self, column: str):
+        """The exact engine if it is enabled, covers the column and matches the table version"""
+        if not Config.EXACT_ENGINE:
+            return None
+        version = self.table.version
+        if not self.exact_engine.is_current(version):
+            # Export in the background; Lance serves queries until it is ready
+            if self._exact_pending != version:
+                self._exact_pending = version
+                threading.Thread(target=self.exact_engine.get, args=(version,), daemon=True).start()
+            return None
+        engine = self.exact_engine.value
+        if engine.column != column or engine.version != version:
+            return None
+        return engine
+
+    def _exact_search(self, engine, query_vector, groups: List[str], items: List[str],
+                      limit: int) -> pd.DataFrame:
+        """Exact vector search in process, then fetch the result rows by position"""
+        with stage("query"):
+            rows, distances = engine.search(query_vector, limit, groups, items)
+            result_columns = [c for c in RESULT_COLUMNS if c in self.table.schema.names]
+            ordered = np.sort(rows)
+            taken = self.table.to_lance().take(ordered, columns=result_columns)
+        with stage("to_pandas"):
+            results = taken.to_pandas()
+            results.index = ordered
+            results = results.loc[rows].reset_index(drop=True)
+            results['_distance'] = distances
+            return results
+
+    def _query_results(self, query_vector, filter_condition: Optional[str],
+                       columns: List[str], limit: int, groups: Optional[List[str]] = None,
+                       items: Optional[List[str]] = None) -> pd.DataFrame:
+        """Run a filter-only search, or a vector search over the given columns
+
+        When the groups and items behind the filter are given, vector searches
+        can use the exact engine, which applies them as masks.
+        """
+        if query_vector is None:
+            # No query, just filter and paginate
+            search_query = self.table.search()
+            if filter_condition:
+                search_query = search_query.where(filter_condition)
+            with stage("query"):
+                results = search_query.limit(limit).to_arrow()
+            with stage("to_pandas"):
+                return results.to_pandas()
+        
+        frames = []
+        for column in columns:
+            engine = self._usable_exact_engine(column) if groups is not None else None
+            if engine is not None:
+                frames.append(self._exact_search(engine, query_vector, groups, items or [], limit))
+            else:
+                frames.append(self._vector_search(query_vector, column, filter_condition, limit))
+        return frames[0] if len(frames) == 1 else fuse_results(frames, limit, Config.RRF_K)
+
+    @staticmethod
+    def _to_search_results(results: pd.DataFrame) -> List[SearchResult]:
+        """Convert DataFrame to list of SearchResult objects"""
+        if results.empty:
+            return []
+
+        with stage("convert"):
+            search_results = []
+            for _, row in results.iterrows():
+                search_results.append(LanceDBService._to_search_result(row))
+        return search_results
+
+    @staticmethod
+    def _to_search_result(row) -> SearchResult:
+        """Convert one row (a Series or dict) to a SearchResult"""
+        return SearchResult(
+            image_url=row.get('image_url', ''),
+            prod_name=row.get('prod_name', 'Unknown Product'),
+            detail_desc=row.get('detail_desc', 'No description available'),
+            product_type_name=row.get('product_type_name', ''),
+            index_group_name=row.get('index_group_name', ''),
+            price=float(row.get('price', 0.0)),
+            article_id=row.get('article_id', ''),
+            available=row.get('available', True),
+            color=row.get('color', ''),
+            size=row.get('size', '')
+        )
+
+    def _result_batches(self, query_vector, filter_condition: Optional[str],
+                        target: str, limit: Optional[int]):
+        """Yield Arrow record batches of results as the Lance scanner produces them"""
+        columns = Config.SEARCH_TARGETS[target]
+        if query_vector is not None and len(columns) > 1:
+            # Fusion needs both ranked lists in full, so this target can't stream
+            results = self._query_results(query_vector, filter_condition, columns,
+                                          limit or Config.STREAM_VECTOR_LIMIT)
+            yield from pa.Table.from_pandas(results, preserve_index=False).to_batches(
+                Config.STREAM_BATCH_SIZE)
+            return
+        
+        dataset = self.table.to_lance()
+        nearest = None
+        if query_vector is not None:
+            nearest = {
+                "column": columns[0],
+                "q": query_vector,
+                "k": limit or Config.STREAM_VECTOR_LIMIT,
+                "metric": VECTOR_METRICS[columns[0]],
+                "nprobes": DEFAULT_NPROBES,
+            }
+        result_columns = [c for c in RESULT_COLUMNS if c in self.table.schema.names]
+        yield from dataset.to_batches(
+            columns=result_columns, filter=filter_condition, nearest=nearest,
+            limit=None if nearest else limit, batch_size=Config.STREAM_BATCH_SIZE
+        )
+
+    async def search_stream(self, query: str, groups: List[str], items: List[str],
+                            limit: Optional[int], target: str = "text", fmt: str = "ndjson"):
+        """Encode the query, then return a generator of serialized result chunks
+
+        Rows are converted and written one scanner batch at a time, so memory
+        stays flat however many rows match. Encoding goes through admission
+        control like /search, and raises Overloaded before anything is sent.
+        """
+        try:
+            with stage("filter"):
+                filter_condition = self.create_filter(groups, items)
+            deadline = time.monotonic() + Config.SEARCH_DEADLINE_SECONDS
+            query_vector = await self._admitted_query_vector(query, deadline)
+        except Overloaded:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=500, 
+                detail=f"Search error: {str(e)}"
+            )
+        
+        batches = self._result_batches(query_vector, filter_condition, target, limit)
+        return frame_results(batches, lambda row: jsonable_encoder(self._to_search_result(row)), fmt)
+
+    def _cached_query_vector(self, query: str) -> Optional[List[float]]:
+        """The vector of a recent identical query, if still cached"""
+        vector = self.query_vectors.get(query)
+        return None if vector is None else vector.tolist()
+
+    def _encode_query(self, query: str) -> List[float]:
+        """CLIP vector for a query text, kept for later identical queries"""
+        with stage("encode"):
+            vector = self.encoder.encode(query)
+        self.query_vectors.put(query, np.array(vector, dtype=np.float32))
+        return vector.tolist()
+
     async def search(self, query: str, groups: List[str], items: List[str], 
-                    limit: int, offset: int) -> List[SearchResult]:
+                    limit: int, offset: int, target: str = "text") -> Tuple[List[SearchResult], Optional[str]]:
+        """Search through the result cache and admission control
+
+        Returns (results, fallback). Cached results skip admission. When the
+        encoder is saturated and the search has a filter, it is answered
+        filter-only and fallback is "filter-only"; otherwise, as for a
+        saturated query stage, Overloaded is raised.
+        """
+        key = (query, tuple(groups), tuple(items), limit, target, self.table.version)
+        cached = self.search_cache.get(key)
+        if cached is not None:
+            return cached, None
+        
+        search_results, fallback = await self.coalesced(
+            "search", key, lambda: self._search_uncached(query, groups, items, limit, target),
+            encode_search, decode_search
+        )
+        if fallback is None:
+            self.search_cache.put(key, search_results)
+        return search_results, fallback
+
+    async def coalesced(self, kind: str, key, fn, encode, decode):
+        """Await fn() once for all identical concurrent requests of a kind
+
+        encode/decode turn the result into bytes and back for sharing it
+        with other workers.
+        """
+        if not Config.COALESCE_REQUESTS:
+            return await fn()
+        shared = self.shared_flights.get(kind)
+        if shared is None:
+            return await self.flights[kind].do(key, fn)
+        return await self.flights[kind].do(key, lambda: shared.do(key, fn, encode, decode))
+
+    async def _admitted_query_vector(self, query: str, deadline: float) -> Optional[List[float]]:
+        """Vector for a query text: cached, or encoded under the encoder's admission limit"""
+        if not query:
+            return None
+        query_vector = self._cached_query_vector(query)
+        if query_vector is None:
+            async with self.encode_limiter.slot(deadline):
+                query_vector = await run_in_worker(self._encode_query, query)
+        return query_vector
+
+    async def _search_uncached(self, query: str, groups: List[str], items: List[str],
+                               limit: int, target: str) -> Tuple[List[SearchResult], Optional[str]]:
+        deadline = time.monotonic() + Config.SEARCH_DEADLINE_SECONDS
+        fallback = None
         try:
-            filter_condition = self.create_filter(groups, items)
+            with stage("filter"):
+                filter_condition = self.create_filter(groups, items)
             
-            if not query:
-                # No query, just filter and paginate
-                if filter_condition:
-                    results = self.table.search().where(filter_condition).limit(limit).to_pandas()
-                else:
-                    results = self.table.search().limit(limit).to_pandas()
-            else:
+            try:
                 # Semantic search with query
-                query_vector = self.encoder.encode(query).tolist()
-                
-                search_query = self.table.search(query_vector)
-                if filter_condition:
-                    search_query = search_query.where(filter_condition)
-                
-                results = search_query.limit(limit).to_pandas()
-
-            if results.empty:
-                return []
-
-            # Convert DataFrame to list of SearchResult objects
-            search_results = []
-            for _, row in results.iterrows():
-                search_results.append(SearchResult(
-                    image_url=row.get('image_url', ''),
-                    prod_name=row.get('prod_name', 'Unknown Product'),
-                    detail_desc=row.get('detail_desc', 'No description available'),
-                    product_type_name=row.get('product_type_name', ''),
-                    index_group_name=row.get('index_group_name', ''),
-                    price=float(row.get('price', 0.0)),
-                    article_id=row.get('article_id', ''),
-                    available=row.get('available', True),
-                    color=row.get('color', ''),
-                    size=row.get('size', '')
-                ))
+                query_vector = await self._admitted_query_vector(query, deadline)
+            except Overloaded:
+                # Without a filter, "filter-only" would be an arbitrary slice of the catalog
+                if not Config.ENCODE_OVERLOAD_FALLBACK or not filter_condition:
+                    raise
+                query_vector = None
+                fallback = "filter-only"
             
-            return search_results
+            async with self.query_limiter.slot(deadline):
+                results = await run_in_worker(
+                    self._query_results, query_vector, filter_condition,
+                    Config.SEARCH_TARGETS[target], limit, groups, items
+                )
+            search_results = self._to_search_results(results)
 
+        except Overloaded:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=500, 
                 detail=f"Search error: {str(e)}"
             )
+        return search_results, fallback
+
+    async def warm(self, count: int) -> int:
+        """Pre-run the most repeated logged searches into the search cache
+
+        All their query texts are encoded in one batched model pass first.
+        Searches then run one at a time under admission control, so requests
+        are still served while warming. Returns the number of searches cached.
+        """
+        def usable(r):
+            return (r["target"] in Config.SEARCH_TARGETS
+                    and (r["target"] == "text" or IMAGE_VECTOR_COLUMN in self.table.schema.names))
+
+        async def encode(texts):
+            async with self.encode_limiter.slot(time.monotonic() + Config.SEARCH_DEADLINE_SECONDS):
+                encoded = await run_in_worker(
+                    self.encoder.encode, texts, batch_size=Config.ENCODE_BATCH_SIZE
+                )
+            for text, vector in zip(texts, encoded):
+                self.query_vectors.put(text, np.array(vector, dtype=np.float32))
+
+        async def search(r):
+            _, fallback = await self.search(r["query"], r["groups"], r["items"], r["limit"], 0, r["target"])
+            return fallback
+
+        return await warm_searches(self.query_log, count, encode, search, usable)
+
+    async def search_batch(self, specs: List[BatchSearchSpec]) -> Dict[str, List[SearchResult]]:
+        """Run many searches, encoding all query texts in one model pass"""
+        async def encode(texts):
+            deadline = time.monotonic() + Config.SEARCH_DEADLINE_SECONDS
+            async with self.encode_limiter.slot(deadline):
+                with stage("encode"):
+                    encoded = await run_in_worker(
+                        self.encoder.encode, texts, batch_size=Config.ENCODE_BATCH_SIZE
+                    )
+            return [vector.tolist() for vector in encoded]
+        
+        async def search(spec, query_vector):
+            filter_condition = self.create_filter(spec.groups, spec.items)
+            # Each query also takes a slot shared with /search, so a batch
+            # can't bypass the worker's query limit
+            deadline = time.monotonic() + Config.SEARCH_DEADLINE_SECONDS
+            async with self.query_limiter.slot(deadline):
+                # Lance releases the GIL while querying, so searches overlap in threads
+                results = await run_in_worker(
+                    self._query_results, query_vector, filter_condition,
+                    Config.SEARCH_TARGETS[spec.target], spec.limit, spec.groups, spec.items
+                )
+            return self._to_search_results(results)
+        
+        try:
+            return await run_batch(specs, encode, search, Config.BATCH_SEARCH_CONCURRENCY)
+        except Overloaded:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=500, 
+                detail=f"Batch search error: {str(e)}"
+            )
+
+    async def similar(self, article_id: str, groups: List[str], items: List[str],
+                      limit: int) -> List[SearchResult]:
+        """Items nearest to an article's stored vector, excluding the article itself"""
+        key = (article_id, tuple(groups), tuple(items), limit, self.table.version)
+        cached = self.similar_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        try:
+            deadline = time.monotonic() + Config.SEARCH_DEADLINE_SECONDS
+            async with self.query_limiter.slot(deadline):
+                similar_items = await run_in_worker(self._similar_uncached, article_id,
+                                                    groups, items, limit)
+        except (HTTPException, Overloaded):
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=500, 
+                detail=f"Similar items error: {str(e)}"
+            )
+        
+        self.similar_cache.put(key, similar_items)
+        return similar_items
+
+    def _similar_uncached(self, article_id: str, groups: List[str], items: List[str],
+                          limit: int) -> List[SearchResult]:
+        if not groups and not items:
+            similar_items = self._neighbor_results(article_id, limit)
+            if similar_items is not None:
+                return similar_items
+        
+        # Point lookup of the stored vector; nothing is re-encoded
+        with stage("lookup"):
+            rows = fetch_items(self.table, [article_id], columns=[TEXT_VECTOR_COLUMN])
+        if rows is None or rows.empty:
+            raise HTTPException(status_code=404, detail="Article not found")
+        query_vector = list(rows.iloc[0][TEXT_VECTOR_COLUMN])
+        
+        with stage("filter"):
+            filter_condition = self.create_filter(groups, items)
+        # One extra result covers the article matching itself
+        results = self._query_results(query_vector, filter_condition,
+                                      [TEXT_VECTOR_COLUMN], limit + 1, groups, items)
+        results = results[results['article_id'] != article_id].head(limit)
+        return self._to_search_results(results)
+
+    def _neighbor_results(self, article_id: str, limit: int) -> Optional[List[SearchResult]]:
+        """Related items from the neighbor table, or None if it is missing or stale"""
+        neighbor_table = self.get_neighbor_table()
+        if neighbor_table is None:
+            NEIGHBOR_FALLBACKS.inc(reason="missing")
+            return None
+        with stage("lookup"):
+            rows = fetch_items(neighbor_table, [article_id])
+        if rows is None or rows.empty:
+            NEIGHBOR_FALLBACKS.inc(reason="unknown_article")
+            return None
+        row = rows.iloc[0]
+        if row['source_version'] != self.table.version:
+            # Built from an older catalog version, until maintenance rebuilds it
+            NEIGHBOR_FALLBACKS.inc(reason="stale")
+            return None
+        if len(row['neighbor_ids']) < limit:
+            NEIGHBOR_FALLBACKS.inc(reason="too_few")
+            return None
+        
+        neighbor_ids = list(row['neighbor_ids'][:limit])
+        with stage("query"):
+            results = fetch_items(self.table, neighbor_ids)
+        rank = {neighbor_id: i for i, neighbor_id in enumerate(neighbor_ids)}
+        results = results.sort_values('article_id', key=lambda ids: ids.map(rank))
+        return self._to_search_results(results)
+
+    def _read_columns(self, columns: List[str]) -> pd.DataFrame:
+        """Scan only the given columns (those the table has) of the whole table"""
+        columns = [c for c in columns if c in self.table.schema.names]
+        return self.table.to_lance().to_table(columns=columns).to_pandas()
+
+    def _build_suggest_index(self):
+        catalog = self._read_columns(["prod_name", "product_type_name", "color"])
+        index = build_prefix_index(catalog, self.query_log.counts(), Config.SUGGEST_TOP_K,
+                                   Config.SUGGEST_MIN_QUERY_COUNT)
+        print(f"Built suggestion index: {len(index)} terms")
+        return index
+
+    def _build_facets(self):
+        return build_facets(self._read_columns([GROUP_COLUMN, TYPE_COLUMN]))
+
+    async def current(self, derived: VersionedValue):
+        """A derived value for the current table version, building it off the event loop"""
+        version = self.table.version
+        if derived.is_current(version):
+            return derived.value
+        return await run_in_worker(derived.get, version)
+
+    async def suggest(self, prefix: str, limit: int) -> List[Dict]:
+        """Completions for a search box prefix, most frequent first"""
+        index = await self.current(self.suggest_index)
+        with stage("lookup"):
+            return index.lookup(prefix, limit)
+
+    async def get_items(self, groups: List[str]) -> List[Dict]:
+        """Product types with item counts within the given groups"""
+        try:
+            facets = await self.current(self.facets)
+            return facets.types(groups)
+        except Exception as e:
+            raise HTTPException(
+                status_code=500, 
+                detail=f"Failed to fetch items: {str(e)}"
+            )
 
     async def get_groups(self) -> List[str]:
         try:
-            # Get unique groups from the table
-            groups_df = self.table.search().select(["index_group_name"]).to_pandas()
-            
-            if groups_df.empty:
-                return []
-            
-            # Get unique values and filter out None/NaN
-            groups = set()
-            for group in groups_df['index_group_name'].dropna().unique():
-                if group and str(group).strip():
-                    groups.add(str(group).strip())
+            # Groups come from the facet counts, so no scan per request
+            facets = await self.current(self.facets)
+            groups = set(facets.groups())
             
             # Sort according to GROUP_ORDER preference
             ordered_groups = [g for g in Config.GROUP_ORDER if g in groups]
@@ -151,6 +641,17 @@ class LanceDBService:
                 detail=f"Failed to fetch groups: {str(e)}"
             )
 
+def encode_search(result) -> Optional[bytes]:
+    results, fallback = result
+    if fallback:
+        # A degraded answer is for this request only, never for other workers
+        return None
+    return json.dumps({"results": jsonable_encoder(results), "fallback": fallback}).encode("utf-8")
+
+def decode_search(payload: bytes):
+    data = json.loads(payload)
+    return [SearchResult(**r) for r in data["results"]], data["fallback"]
+
 # Initialize FastAPI and services
 app = FastAPI(title="H&M Fashion Search API")
 lancedb_service = LanceDBService()
@@ -164,61 +665,352 @@ app.add_middleware(
     allow_headers=["*"],
 )
 app.mount("/static", StaticFiles(directory="static"), name="static")
+slow_query_log = SlowQueryLog(Config.SLOW_QUERY_LOG_PATH, Config.SLOW_QUERY_THRESHOLD_MS)
+request_profiler = RequestProfiler(
+    Config.PROFILE_SAMPLE_RATE, Config.PROFILE_DIR, Config.PROFILE_INTERVAL_MS, focus_file=__file__
+)
+
+def route_label(request: Request) -> str:
+    """Route template for metrics labels, so /image/{article_id} is one series"""
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return getattr(route, "path", request.url.path)
+    return "unmatched"
+
+@app.middleware("http")
+async def record_timings(request: Request, call_next):
+    """Report per-stage timings as Server-Timing headers and histograms."""
+    endpoint = route_label(request)
+    timings = start_request(endpoint)
+    started = time.perf_counter()
+    response = await call_next(request)
+    total = time.perf_counter() - started
+    response.headers["Server-Timing"] = server_timing_header(timings, total)
+    REQUEST_SECONDS.observe(total, endpoint=endpoint, method=request.method,
+                            status=response.status_code)
+    return response
+
+def json_response(content, request: Optional[Request] = None, etag: Optional[str] = None) -> Response:
+    """Serialize content to JSON as its own timed stage
+
+    With a request, the body is compressed if the client accepts it; with an
+    ETag, clients are told to revalidate it on every use.
+    """
+    with stage("serialize"):
+        body = json.dumps(jsonable_encoder(content)).encode("utf-8")
+    headers = {}
+    if etag:
+        headers.update({"ETag": etag, "Cache-Control": "no-cache"})
+    if request is not None:
+        with stage("compress"):
+            body, encoding = compress_body(body, request.headers.get("accept-encoding"),
+                                           Config.COMPRESSION_MIN_BYTES)
+        headers["Vary"] = "Accept-Encoding"
+        if encoding:
+            headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def response_etag(request: Request) -> str:
+    """ETag for a GET whose response depends only on the table and its query parameters"""
+    return make_etag(request.url.path, sorted(request.query_params.multi_items()),
+                     lancedb_service.table.version, Config.EMBEDDING_MODEL)
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A 304 response if the client already holds the representation with this ETag"""
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={
+            "ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"
+        })
+    return None
+maintenance_scheduler = None
+
+for limiter in (lancedb_service.encode_limiter, lancedb_service.query_limiter):
+    registry.gauge(f"admission_{limiter.name}_in_flight", f"Searches in the {limiter.name} stage",
+                   lambda limiter=limiter: limiter.active)
+    registry.gauge(f"admission_{limiter.name}_queued", f"Searches waiting for the {limiter.name} stage",
+                   lambda limiter=limiter: limiter.queued)
+
+@app.exception_handler(Overloaded)
+async def overloaded(request: Request, exc: Overloaded):
+    """Shed load fast: clients retry after a pause instead of queueing indefinitely."""
+    return JSONResponse(status_code=503, content={"detail": str(exc)},
+                        headers={"Retry-After": str(exc.retry_after)})
+
+registry.gauge("process_resident_memory_bytes", "Resident set size of this worker",
+               lambda: process_memory()["rss_bytes"] or 0)
+
+@app.on_event("startup")
+async def start_memory_tracing():
+    """Start tracing Python allocations if configured."""
+    if Config.TRACEMALLOC and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+@app.on_event("startup")
+async def start_maintenance():
+    """Start background dataset maintenance if configured."""
+    global maintenance_scheduler
+    if Config.MAINTENANCE_INTERVAL_SECONDS:
+        maintenance_scheduler = MaintenanceScheduler(
+            Config.LANCEDB_PATH,
+            Config.MAINTENANCE_INTERVAL_SECONDS,
+            retention=timedelta(days=Config.MAINTENANCE_RETENTION_DAYS),
+            rebuild_neighbors=Config.MAINTENANCE_REBUILD_NEIGHBORS
+        )
+        maintenance_scheduler.start()
+
+@app.on_event("startup")
+async def build_derived_indexes():
+    """Build derived indexes (facets, typeahead, exact engine) before the first request needs them."""
+    await lancedb_service.current(lancedb_service.facets)
+    await lancedb_service.current(lancedb_service.suggest_index)
+    if Config.EXACT_ENGINE:
+        await lancedb_service.current(lancedb_service.exact_engine)
+
+warm_up = WarmUp()
+
+@app.on_event("startup")
+async def warm_search_cache():
+    """Warm the search cache from the query log in the background; /ready waits for it."""
+    async def warm():
+        if Config.WARM_QUERY_COUNT:
+            started = time.perf_counter()
+            warmed = await lancedb_service.warm(Config.WARM_QUERY_COUNT)
+            print(f"Warmed search cache with {warmed} searches in {time.perf_counter() - started:.1f}s")
+    
+    warm_up.start(warm)
+
+@app.on_event("shutdown")
+async def stop_maintenance():
+    if maintenance_scheduler is not None:
+        maintenance_scheduler.stop()
+
+def validate_target(target: str):
+    """Reject unknown search targets, and image targets on tables without image vectors"""
+    check_target(target, Config.SEARCH_TARGETS, IMAGE_VECTOR_COLUMN in lancedb_service.table.schema.names)
 
 @app.get("/search", response_model=List[SearchResult])
 async def search_fashion_items(
+    request: Request,
     query: str = "", 
     group: List[str] = Query(default=[]),
     item: List[str] = Query(default=[]),
-    limit: int = 20
+    limit: int = 20,
+    target: str = "text"
+):
+    """Search for fashion items using semantic search and/or filters.
+
+    `target` selects the vectors to match: "text" descriptions, product "image"s, or "both".
+    """
+    validate_target(target)
+    query = unquote(query.strip())
+    groups = [unquote(g.strip()) for g in group]
+    items = [unquote(i.strip()) for i in item]
+    
+    etag = response_etag(request)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    lancedb_service.query_log.record(query, groups=groups, items=items, limit=limit, target=target)
+    
+    started = time.perf_counter()
+    with request_profiler.profile("search") as profile_path:
+        results, fallback = await lancedb_service.search(query, groups, items, limit, 0, target)
+        # A degraded answer must not be revalidated as if it were the real one
+        response = json_response(results, request, None if fallback else etag)
+        if fallback:
+            response.headers["X-Search-Fallback"] = fallback
+    
+    slow_query_log.record(
+        time.perf_counter() - started,
+        query=query, groups=groups, items=items, limit=limit, target=target,
+        result_count=len(results), fallback=fallback,
+        table_version=lancedb_service.table.version,
+        stages={name: round(seconds * 1000, 3)
+                for name, seconds in stage_totals(current_timings() or []).items()},
+        profile=profile_path if profile_path and os.path.exists(profile_path) else None
+    )
+    return response
+
+@app.post("/search/batch", response_model=Dict[str, List[SearchResult]])
+async def search_batch(request: Request, batch: BatchSearchRequest):
+    """Run many searches in one call, keyed by each request's `id`.
+
+    All query texts are encoded in a single batched model pass and the
+    vector searches run concurrently.
+    """
+    specs = batch.requests
+    validate_batch(specs, Config.BATCH_SEARCH_MAX_REQUESTS, Config.SEARCH_TARGETS,
+                   IMAGE_VECTOR_COLUMN in lancedb_service.table.schema.names)
+    return json_response(await lancedb_service.search_batch(specs), request)
+
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "json": "application/json"}
+
+@app.get("/search/stream")
+async def search_stream(
+    query: str = "",
+    group: List[str] = Query(default=[]),
+    item: List[str] = Query(default=[]),
+    limit: Optional[int] = None,
+    target: str = "text",
+    format: str = "ndjson"
 ):
-    """Search for fashion items using semantic search and/or filters."""
+    """Stream search results as they come off the Lance scanner.
+
+    `format=ndjson` writes one result per line; `format=json` writes a single
+    JSON array in chunks. Without a limit, filter-only searches export every
+    matching item.
+    """
+    validate_target(target)
+    if format not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unknown stream format: {format}")
     query = unquote(query.strip())
     groups = [unquote(g.strip()) for g in group]
     items = [unquote(i.strip()) for i in item]
-    return await lancedb_service.search(query, groups, items, limit, 0)
+    
+    chunks = await lancedb_service.search_stream(query, groups, items, limit, target, format)
+    return StreamingResponse(chunks, media_type=STREAM_MEDIA_TYPES[format])
+
+@app.get("/items")
+async def get_items(request: Request, group: List[str] = Query(default=[])):
+    """Product types with item counts, scoped to the selected groups."""
+    etag = response_etag(request)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    groups = [unquote(g.strip()) for g in group]
+    return json_response(await lancedb_service.get_items(groups), request, etag)
+
+@app.get("/suggest")
+async def suggest(q: str = "", limit: int = 8):
+    """Typeahead completions from product names, types, colors and past queries."""
+    if not q.strip():
+        return []
+    return json_response(await lancedb_service.suggest(q, min(limit, Config.SUGGEST_TOP_K)))
+
+@app.get("/similar/{article_id}", response_model=List[SearchResult])
+async def similar_items(
+    request: Request,
+    article_id: str,
+    group: List[str] = Query(default=[]),
+    item: List[str] = Query(default=[]),
+    limit: int = 8
+):
+    """Items similar to an article, found from its stored vector."""
+    etag = response_etag(request)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    groups = [unquote(g.strip()) for g in group]
+    items = [unquote(i.strip()) for i in item]
+    results = await lancedb_service.similar(unquote(article_id), groups, items, limit)
+    return json_response(results, request, etag)
 
 @app.get("/groups", response_model=List[str])
-async def get_groups():
+async def get_groups(request: Request):
     """Get list of unique index group names in specified order."""
-    return await lancedb_service.get_groups()
+    etag = response_etag(request)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    return json_response(await lancedb_service.get_groups(), request, etag)
 
-@app.get("/image/{article_id}")
-async def get_image(article_id: str):
-    """Serve binary image data from the database."""
+@app.get("/health")
+async def health():
+    """Liveness: the process is up and serving."""
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    """Readiness: 200 once startup warm-up is done, 503 until then."""
+    warm_up.check()
+    return {"status": "ready", "table_version": lancedb_service.table.version}
+
+MAX_MEMORY_SITES = 100
+
+def require_admin(request: Request):
+    """404 unless admin endpoints are enabled, 401 without the admin token"""
+    if not Config.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    supplied = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+    if not hmac.compare_digest(supplied.encode(), Config.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Admin token required",
+                            headers={"WWW-Authenticate": "Bearer"})
+
+@app.get("/admin/memory")
+async def get_memory(request: Request, top: int = 0):
+    """Resident memory split by encoder, Arrow, caches and Python heap.
+
+    With TRACEMALLOC enabled, `top` also lists the largest Python allocation sites.
+    Walking the heap takes a while, so the report is built in the threadpool.
+    """
+    require_admin(request)
+    top = max(0, min(top, MAX_MEMORY_SITES))
+    return await run_in_worker(memory_report, lancedb_service.encoder, top)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus metrics: per-stage and end-to-end latency histograms."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+def detect_image_type(image_bytes: bytes) -> str:
+    """Determine content type based on image format"""
+    if image_bytes.startswith(b'\xff\xd8\xff'):
+        return "image/jpeg"
+    elif image_bytes.startswith(b'\x89PNG'):
+        return "image/png"
+    elif image_bytes.startswith(b'GIF'):
+        return "image/gif"
+    elif image_bytes.startswith(b'WEBP'):
+        return "image/webp"
+    return "image/jpeg"  # Default fallback
+
+def load_image(article_id: str) -> Tuple[bytes, Optional[str]]:
+    """Image bytes for an article, and the ETag to serve them with"""
     try:
         # Search for the item by article_id
-        results = lancedb_service.table.search().where(f"article_id = '{article_id}'").limit(1).to_pandas()
+        with stage("lookup"):
+            results = lancedb_service.table.search().where(f"article_id = {quote_literal(article_id)}").limit(1).to_pandas()
         
         if results.empty:
             raise HTTPException(status_code=404, detail="Image not found")
         
-        image_data = results.iloc[0]['image_data']
-        
-        # Decode base64 image data
-        try:
-            # Remove data URL prefix if present (e.g., "data:image/jpeg;base64,")
-            if image_data.startswith('data:'):
-                image_data = image_data.split(',', 1)[1]
-            
-            image_bytes = base64.b64decode(image_data)
-            
-            # Determine content type based on image format
-            if image_bytes.startswith(b'\xff\xd8\xff'):
-                content_type = "image/jpeg"
-            elif image_bytes.startswith(b'\x89PNG'):
-                content_type = "image/png"
-            elif image_bytes.startswith(b'GIF'):
-                content_type = "image/gif"
-            elif image_bytes.startswith(b'WEBP'):
-                content_type = "image/webp"
-            else:
-                content_type = "image/jpeg"  # Default fallback
-            
-            return Response(content=image_bytes, media_type=content_type)
-            
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error decoding image: {str(e)}")
-            
+        row = results.iloc[0]
+        image_table = lancedb_service.get_image_table()
+        # Deduplicated images live in the shared blob table, keyed by content hash;
+        # legacy rows still carry base64 image_data
+        blob = bool(row_image_hash(row)) and image_table is not None
+        with stage("blob" if blob else "decode"):
+            try:
+                image = load_row_image(row, image_table)
+            except ValueError as e:
+                raise HTTPException(status_code=500, detail=f"Error decoding image: {str(e)}")
+        if image is None:
+            raise HTTPException(status_code=404, detail="Image not found")
+        return image
+    
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving image: {str(e)}")
+
+def encode_image(result) -> bytes:
+    image_bytes, etag = result
+    return (etag or "").encode("utf-8") + b"\n" + image_bytes
+
+def decode_image(payload: bytes):
+    etag, _, image_bytes = payload.partition(b"\n")
+    return image_bytes, etag.decode("utf-8") or None
+
+@app.get("/image/{article_id}")
+async def get_image(article_id: str):
+    """Serve binary image data from the database.
+
+    Concurrent requests for the same article share one lookup.
+    """
+    image_bytes, etag = await lancedb_service.coalesced(
+        "image", (article_id, lancedb_service.table.version),
+        lambda: run_in_worker(load_image, article_id), encode_image, decode_image
+    )
+    return Response(content=image_bytes, media_type=detect_image_type(image_bytes),
+                    headers={"ETag": etag} if etag else None)
@@ -0,0 +1,51 @@
+"""
+Batch search requests for POST /search/batch
+Validates a batch, encodes its distinct query texts once, and runs the
+searches concurrently, keyed by each request's id.
+"""
+
+import asyncio
+from typing import List
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from search_targets import check_target
+
+class BatchSearchSpec(BaseModel):
+    id: str
+    query: str = ""
+    groups: List[str] = []
+    items: List[str] = []
+    limit: int = 20
+    target: str = "text"
+
+class BatchSearchRequest(BaseModel):
+    requests: List[BatchSearchSpec]
+
+def validate_batch(specs, max_requests, targets, has_image_vectors):
+    """Raise a 400 for an oversized batch, duplicate ids or unusable targets; strips queries"""
+    if len(specs) > max_requests:
+        raise HTTPException(status_code=400, detail=f"At most {max_requests} requests per batch")
+    if len({spec.id for spec in specs}) != len(specs):
+        raise HTTPException(status_code=400, detail="Request ids must be unique")
+    for spec in specs:
+        check_target(spec.target, targets, has_image_vectors)
+        spec.query = spec.query.strip()
+
+async def run_batch(specs, encode, search, concurrency):
+    """Results of every spec, keyed by id
+
+    encode(texts) returns one vector per distinct non-empty query text;
+    search(spec, vector) runs one request, with vector None for filter-only
+    requests. At most `concurrency` searches run at once.
+    """
+    texts = list(dict.fromkeys(spec.query for spec in specs if spec.query))
+    vectors = dict(zip(texts, await encode(texts))) if texts else {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(spec):
+        async with semaphore:
+            return spec.id, await search(spec, vectors.get(spec.query))
+
+    return dict(await asyncio.gather(*(run(spec) for spec in specs)))
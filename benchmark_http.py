@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+HTTP load test and latency benchmark for the fashion search API
+Drives a running server with a configurable query mix and concurrency and
+reports throughput and p50/p95/p99 latency per request kind.
+
+Usage:
+    uvicorn app:app --host 0.0.0.0 --port 8000 &
+    python benchmark_http.py --concurrency 16 --duration 30 --output bench.json
+    python benchmark_http.py --baseline bench.json      # compare against a previous run
+"""
+
+import argparse
+import json
+import math
+import platform
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+DEFAULT_QUERIES = [
+    "blue cotton shirt",
+    "summer dress with floral pattern",
+    "warm winter jacket",
+    "comfortable running shoes",
+    "black leather belt",
+    "kids t-shirt",
+    "denim jeans",
+    "wool sweater",
+]
+
+DEFAULT_MIX = "text=4,filter=2,filtered_vector=3,image=4,groups=1"
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = math.ceil(p / 100 * len(sorted_values))
+    return sorted_values[max(0, min(len(sorted_values), rank) - 1)]
+
+def parse_mix(spec):
+    """Parse 'kind=weight,...' into a {kind: weight} dict"""
+    mix = {}
+    for part in spec.split(","):
+        kind, weight = part.split("=")
+        mix[kind.strip()] = float(weight)
+    return mix
+
+class Workload:
+    """Builds randomized requests for each kind in the query mix"""
+
+    def __init__(self, queries, groups, article_ids, limit):
+        self.queries = queries
+        self.groups = groups
+        self.article_ids = article_ids
+        self.limit = limit
+
+    def request(self, kind, rng):
+        """Return (path, params) for a request of the given kind"""
+        if kind == "text":
+            return "/search", {"query": rng.choice(self.queries), "limit": self.limit}
+        if kind == "filter":
+            return "/search", {"group": rng.choice(self.groups), "limit": self.limit}
+        if kind == "filtered_vector":
+            return "/search", {"query": rng.choice(self.queries),
+                               "group": rng.choice(self.groups), "limit": self.limit}
+        if kind == "image":
+            return f"/image/{rng.choice(self.article_ids)}", {}
+        if kind == "groups":
+            return "/groups", {}
+        raise ValueError(f"Unknown request kind: {kind}")
+
+def discover_workload(base_url, queries, limit):
+    """Fetch groups and article ids from the server to build realistic requests"""
+    groups = requests.get(f"{base_url}/groups", timeout=30).json()
+    items = requests.get(f"{base_url}/search", params={"limit": 1000}, timeout=60).json()
+    article_ids = [item["article_id"] for item in items if item.get("article_id")]
+    if not groups or not article_ids:
+        raise SystemExit("Server returned no groups or articles; load data before benchmarking")
+    return Workload(queries, groups, article_ids, limit)
+
+def run_benchmark(base_url, workload, mix, concurrency, duration, warmup, headers=None, seed=0):
+    """Run the load test and return per-kind samples"""
+    kinds = list(mix.keys())
+    weights = [mix[kind] for kind in kinds]
+    samples = {kind: {"latencies": [], "errors": 0, "bytes": 0} for kind in kinds}
+    lock = threading.Lock()
+    local = threading.local()
+    measure_from = time.perf_counter() + warmup
+    stop_at = measure_from + duration
+
+    def worker(worker_id):
+        rng = random.Random(seed + worker_id)
+        local.session = requests.Session()
+        local.session.headers.update(headers or {})
+        while True:
+            started = time.perf_counter()
+            if started >= stop_at:
+                return
+            kind = rng.choices(kinds, weights)[0]
+            path, params = workload.request(kind, rng)
+            try:
+                response = local.session.get(f"{base_url}{path}", params=params, timeout=60)
+                ok = response.status_code < 400
+                size = len(response.content) if ok else 0
+                if ok and response.headers.get("Content-Encoding"):
+                    # Count bytes on the wire, not after requests decompressed them
+                    size = int(response.headers.get("Content-Length") or size)
+            except requests.RequestException:
+                ok, size = False, 0
+            elapsed = time.perf_counter() - started
+            if started < measure_from:
+                continue
+            with lock:
+                sample = samples[kind]
+                if ok:
+                    sample["latencies"].append(elapsed)
+                    sample["bytes"] += size
+                else:
+                    sample["errors"] += 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    return samples
+
+def summarize(samples, duration):
+    """Turn raw samples into throughput and latency percentiles (ms)"""
+    summary = {}
+    for kind, sample in samples.items():
+        latencies = sorted(sample["latencies"])
+        count = len(latencies)
+        summary[kind] = {
+            "requests": count,
+            "errors": sample["errors"],
+            "throughput_rps": round(count / duration, 2),
+            "mean_ms": round(1000 * sum(latencies) / count, 2) if count else None,
+            "p50_ms": round(1000 * percentile(latencies, 50), 2) if count else None,
+            "p95_ms": round(1000 * percentile(latencies, 95), 2) if count else None,
+            "p99_ms": round(1000 * percentile(latencies, 99), 2) if count else None,
+            "avg_bytes": round(sample["bytes"] / count) if count else None,
+        }
+    total = sum(s["requests"] for s in summary.values())
+    summary["total"] = {"requests": total, "throughput_rps": round(total / duration, 2)}
+    return summary
+
+def relative_change(value, base):
+    """'+x.x%' change from base, or None when either side is missing or base is zero"""
+    if not value or not base:
+        return None
+    return f"{100 * (value / base - 1):+.1f}%"
+
+def print_summary(summary, baseline=None):
+    """Print a results table, with p50/p99 deltas against a baseline if given"""
+    print(f"{'kind':<16}{'req':>8}{'err':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'bytes':>9}")
+    for kind, stats in summary.items():
+        if kind == "total":
+            continue
+        line = (f"{kind:<16}{stats['requests']:>8}{stats['errors']:>6}{stats['throughput_rps']:>9}"
+                f"{stats['p50_ms'] or '-':>9}{stats['p95_ms'] or '-':>9}{stats['p99_ms'] or '-':>9}"
+                f"{stats['avg_bytes'] or '-':>9}")
+        base = (baseline or {}).get(kind) or {}
+        deltas = [(name, relative_change(stats[f"{name}_ms"], base.get(f"{name}_ms")))
+                  for name in ("p50", "p99")]
+        if any(delta for _, delta in deltas):
+            line += "  " + "".join(f"  {name} {delta or '-'}" for name, delta in deltas)
+        print(line)
+    print(f"total: {summary['total']['requests']} requests, {summary['total']['throughput_rps']} req/s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the fashion search HTTP API")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds before measuring")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Request kinds and weights, e.g. text=1,image=2")
+    parser.add_argument("--queries", help="File with one search query per line")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--accept-encoding", default="identity",
+                        help="Accept-Encoding header to send, e.g. gzip")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write JSON results to this file")
+    parser.add_argument("--baseline", help="Compare against a previous JSON results file")
+    args = parser.parse_args()
+
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    workload = discover_workload(args.base_url, queries, args.limit)
+    mix = parse_mix(args.mix)
+    print(f"Benchmarking {args.base_url}: {args.concurrency} workers, {args.duration}s, mix {mix}")
+    samples = run_benchmark(args.base_url, workload, mix, args.concurrency, args.duration,
+                            args.warmup, {"Accept-Encoding": args.accept_encoding}, args.seed)
+    summary = summarize(samples, args.duration)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    print_summary(summary, baseline)
+
+    if args.output:
+        report = {
+            "config": vars(args),
+            "machine": {"platform": platform.platform(), "python": platform.python_version()},
+            "timestamp": time.time(),
+            "results": summary,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
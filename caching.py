@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+In-process result caches
+Thread-safe LRU bounded by entry count and approximate byte size. Callers
+put the table version in their keys, so entries for an old version of the
+catalog are never served and simply age out. HTTP validators are derived
+from the table version the same way.
+"""
+
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+def approx_size(value):
+    """Rough deep size in bytes of cached results (strings, lists, dicts, models)"""
+    if isinstance(value, (str, bytes)):
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(approx_size(k) + approx_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(approx_size(v) for v in value)
+    if hasattr(value, "__dict__"):
+        return sys.getsizeof(value) + approx_size(vars(value))
+    return sys.getsizeof(value)
+
+class LRUCache:
+    """Least-recently-used cache with entry and byte limits"""
+
+    def __init__(self, max_entries=1024, max_bytes=None, sizer=approx_size):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizer = sizer
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def put(self, key, value):
+        size = self.sizer(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._entries and (
+                len(self._entries) > self.max_entries
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Entry count, byte size and hit rate, for memory and metrics reports"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+class VersionedValue:
+    """A value derived from a table, rebuilt when the table version changes
+
+    While one thread rebuilds, others keep getting the previous value instead
+    of waiting; only the very first build blocks.
+    """
+
+    def __init__(self, build):
+        self.build = build
+        self.value = None
+        self.version = None
+        self._lock = threading.Lock()
+
+    def is_current(self, version):
+        return self.value is not None and self.version == version
+
+    def get(self, version):
+        if self.is_current(version):
+            return self.value
+        if not self._lock.acquire(blocking=self.value is None):
+            return self.value
+        try:
+            if not self.is_current(version):
+                self.value = self.build()
+                self.version = version
+            return self.value
+        finally:
+            self._lock.release()
+
+def make_etag(*parts):
+    """Weak ETag over the values a response is derived from
+
+    Weak, because the same representation is sent with different content
+    encodings.
+    """
+    digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
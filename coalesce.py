@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Single-flight coalescing of identical concurrent requests
+When many clients ask for the same search or image at once, one call does
+the work and the others wait for its result. `SingleFlight` shares a call
+between requests in one worker. `SharedFlight` extends that to all workers
+on a host: the first caller claims the key with a marker file in a shared
+directory and publishes its result as a file, which the rest read.
+"""
+
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+
+from metrics import registry
+
+COALESCED = registry.counter(
+    "coalesced_requests_total", "Requests answered by an identical request's execution", ["kind", "scope"])
+
+class SingleFlight:
+    """Share one execution among concurrent identical calls on one event loop"""
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def do(self, key, fn):
+        """Await fn() once for all concurrent callers with the same key
+
+        The call runs as its own task, so a caller that goes away does not
+        cancel it for the others. Its exceptions reach every caller.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            COALESCED.inc(kind=self.name, scope="worker")
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception retrieved even if every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+class SharedFlight:
+    """Share one execution among identical calls in different worker processes
+
+    The first caller for a key claims it by creating a pending marker file
+    (an atomic O_EXCL create) and runs the call; other callers poll for
+    its published result instead of holding any lock, so different keys
+    never wait on each other. A result is reused only while it is younger
+    than `ttl` seconds. If the claimant fails, or takes longer than
+    `max_wait`, waiting callers run the call themselves. All file access
+    runs in worker threads, so a slow shared disk never stalls the loop.
+    """
+
+    def __init__(self, name, directory, ttl=1.0, max_wait=5.0, poll_interval=0.005):
+        self.name = name
+        self.directory = directory
+        self.ttl = ttl
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        self._last_prune = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, key):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, f"{self.name}-{digest}")
+        return base + ".pending", base + ".result"
+
+    def _age(self, path):
+        try:
+            return time.time() - os.path.getmtime(path)
+        except OSError:
+            return None
+
+    def _read_fresh(self, path):
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _claim(self, pending_path):
+        """Create the pending marker; False if another caller holds a live one"""
+        try:
+            os.close(os.open(pending_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+            return True
+        except FileExistsError:
+            age = self._age(pending_path)
+            if age is not None and age > self.max_wait:
+                # Left behind by a worker that died mid-call
+                self._remove(pending_path)
+                return self._claim(pending_path)
+            return False
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _publish(self, path, payload):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".publish-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp, path)
+        except BaseException:
+            self._remove(tmp)
+            raise
+        if time.monotonic() - self._last_prune > 60 * self.ttl:
+            self._last_prune = time.monotonic()
+            self.prune()
+
+    def prune(self):
+        """Delete results too old to be reused, and markers of dead calls"""
+        for name in os.listdir(self.directory):
+            if not name.startswith(f"{self.name}-"):
+                continue
+            path = os.path.join(self.directory, name)
+            age = self._age(path)
+            if age is None:
+                continue
+            if (name.endswith(".result") and age > self.ttl) or \
+                    (name.endswith(".pending") and age > self.max_wait):
+                self._remove(path)
+
+    def _poll(self, pending_path, result_path):
+        """(payload, done): the published result if any, and whether the claimant finished"""
+        payload = self._read_fresh(result_path)
+        if payload is not None:
+            return payload, True
+        if not os.path.exists(pending_path):
+            # Finished without publishing (failed, or not shareable)
+            return self._read_fresh(result_path), True
+        return None, False
+
+    async def _wait_for_result(self, pending_path, result_path):
+        """Poll until the claimant publishes; None if it gave up or ran out of time"""
+        deadline = time.monotonic() + self.max_wait
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            payload, done = await asyncio.to_thread(self._poll, pending_path, result_path)
+            if done:
+                return payload
+        return None
+
+    async def do(self, key, fn, encode, decode):
+        """Await fn() unless another worker just did or is doing it
+
+        encode/decode convert results to bytes and back; encode may return
+        None for a result that must not be shared.
+        """
+        pending_path, result_path = self._paths(key)
+        payload, claimed = await asyncio.to_thread(self._read_or_claim, pending_path, result_path)
+        if payload is None and not claimed:
+            payload = await self._wait_for_result(pending_path, result_path)
+            if payload is None:
+                return await fn()
+        if payload is not None:
+            COALESCED.inc(kind=self.name, scope="shared")
+            return decode(payload)
+        
+        try:
+            result = await fn()
+            encoded = encode(result)
+            if encoded is not None:
+                await asyncio.to_thread(self._publish, result_path, encoded)
+            return result
+        finally:
+            await asyncio.to_thread(self._remove, pending_path)
+
+    def _read_or_claim(self, pending_path, result_path):
+        """(payload, claimed): a fresh published result, or whether this caller claimed the key"""
+        payload = self._read_fresh(result_path)
+        if payload is not None:
+            return payload, False
+        return None, self._claim(pending_path)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Negotiated response compression
+Picks brotli or gzip from the client's Accept-Encoding and compresses
+bodies above a size threshold. Brotli is used only when the optional
+`brotli` package is installed.
+"""
+
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = 6
+# Low brotli qualities compress about as fast as gzip -6 and still smaller
+BROTLI_QUALITY = 4
+
+def supported_encodings():
+    """Encodings this server can produce, in order of preference"""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+def parse_accept_encoding(header):
+    """Map each coding in an Accept-Encoding header to its q-value"""
+    accepted = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+def negotiate_encoding(header):
+    """Best supported encoding the client accepts, or None for identity"""
+    accepted = parse_accept_encoding(header)
+    best, best_quality = None, 0.0
+    for coding in supported_encodings():
+        quality = accepted.get(coding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    return body
+
+def compress_body(body, accept_encoding, min_bytes):
+    """Compress body for the client if it is large enough; returns (body, encoding)"""
+    if len(body) < min_bytes:
+        return body, None
+    encoding = negotiate_encoding(accept_encoding)
+    if encoding is None:
+        return body, None
+    return compress(body, encoding), encoding
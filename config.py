@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Configuration for H&M Fashion Search
+Kept separate from app.py so loaders and tools can read it without
+starting the service.
+"""
+
+from image_embeddings import IMAGE_VECTOR_COLUMN, TEXT_VECTOR_COLUMN
+
+class Config:
+    LANCEDB_PATH = "./data"
+    TABLE_NAME = "hm_mini"
+    # Content-addressed image blobs that rows reference by image_hash
+    IMAGE_TABLE_NAME = "hm_images"
+    EMBEDDING_MODEL = "clip-ViT-B-32"
+    GROUP_ORDER = ["Menswear", "Ladieswear", "Divided", "Baby/Children", "Sport"]
+    # Which vector column(s) a query can be matched against
+    SEARCH_TARGETS = {
+        "text": [TEXT_VECTOR_COLUMN],
+        "image": [IMAGE_VECTOR_COLUMN],
+        "both": [TEXT_VECTOR_COLUMN, IMAGE_VECTOR_COLUMN],
+    }
+    RRF_K = 60
+    # Batch search: texts per encoder forward pass, parallel Lance queries, max specs per call
+    ENCODE_BATCH_SIZE = 64
+    BATCH_SEARCH_CONCURRENCY = 8
+    BATCH_SEARCH_MAX_REQUESTS = 1000
+    # Set to run compaction/version pruning in the background, e.g. 6 * 3600
+    MAINTENANCE_INTERVAL_SECONDS = None
+    MAINTENANCE_RETENTION_DAYS = 7
+    # Rebuild a neighbor graph left stale by compaction or upserts after each run
+    MAINTENANCE_REBUILD_NEIGHBORS = True
+    # /search/stream: rows per scanner batch, and the result count for vector
+    # queries when no limit is given (filter-only exports are unbounded)
+    STREAM_BATCH_SIZE = 256
+    STREAM_VECTOR_LIMIT = 10_000
+    # Exact in-process vector search over a memory-mapped export of the
+    # vector column: None (use Lance), "float32", "float16" or "int8"
+    EXACT_ENGINE = None
+    EXACT_ENGINE_DIR = "./data/exact"
+    # Search text vectors through a PCA-reduced column (see reduced_vectors.py),
+    # reranking limit * REDUCED_CANDIDATE_FACTOR candidates with full vectors
+    REDUCED_SEARCH = False
+    REDUCED_DIMS = 128
+    REDUCED_CANDIDATE_FACTOR = 10
+    # Result cache for /similar, bounded by entries and approximate bytes
+    SIMILAR_CACHE_ENTRIES = 10_000
+    SIMILAR_CACHE_BYTES = 64 * 1024 * 1024
+    # Result cache for /search, and CLIP vectors of recent query texts
+    SEARCH_CACHE_ENTRIES = 10_000
+    SEARCH_CACHE_BYTES = 128 * 1024 * 1024
+    QUERY_VECTOR_CACHE_ENTRIES = 10_000
+    # At startup, pre-run the most repeated logged searches into the search
+    # cache (0 disables); /ready answers 503 until they are loaded
+    WARM_QUERY_COUNT = 0
+    # Admission control per worker: searches running the CLIP encoder and
+    # Lance queries at once, how many more may queue for each, and how long
+    # a search may spend queued in total before it is shed with a 503
+    ENCODE_CONCURRENCY = 2
+    ENCODE_QUEUE_SIZE = 32
+    QUERY_CONCURRENCY = 8
+    QUERY_QUEUE_SIZE = 64
+    SEARCH_DEADLINE_SECONDS = 2.0
+    RETRY_AFTER_SECONDS = 1
+    # When the encoder is saturated, answer with filter-only results instead of a 503
+    ENCODE_OVERLOAD_FALLBACK = True
+    # Identical concurrent /search and /image requests share one execution
+    # per worker. With COALESCE_SHARED_DIR set (e.g. "/dev/shm/hm-search"),
+    # workers on the same host also share results younger than the TTL
+    COALESCE_REQUESTS = True
+    COALESCE_SHARED_DIR = None
+    COALESCE_SHARED_TTL_SECONDS = 1.0
+    # Every /search query is logged here; popular queries feed /suggest
+    QUERY_LOG_PATH = "./data/query_log.jsonl"
+    # The log is rotated to QUERY_LOG_PATH + ".1" past this size
+    QUERY_LOG_MAX_BYTES = 16 * 1024 * 1024
+    SUGGEST_TOP_K = 10
+    # Past queries are suggested only once searched this many times
+    SUGGEST_MIN_QUERY_COUNT = 3
+    # JSON responses smaller than this are sent uncompressed
+    COMPRESSION_MIN_BYTES = 1024
+    # Searches slower than this are appended to the slow-query log
+    SLOW_QUERY_THRESHOLD_MS = 500
+    SLOW_QUERY_LOG_PATH = "./data/slow_queries.jsonl"
+    # Fraction of searches to profile (0 disables); stacks go to PROFILE_DIR
+    PROFILE_SAMPLE_RATE = 0.0
+    PROFILE_INTERVAL_MS = 5
+    PROFILE_DIR = "./data/profiles"
+    # Trace Python allocations for /admin/memory (adds allocation overhead)
+    TRACEMALLOC = False
+    # /admin endpoints need "Authorization: Bearer <ADMIN_TOKEN>"; None disables them
+    ADMIN_TOKEN = None
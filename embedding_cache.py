@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Content-addressed embedding cache for the data loaders
+Embeddings are stored on disk keyed by (model name, SHA-256 of the text),
+so re-ingesting unchanged descriptions never hits the encoder again.
+"""
+
+import hashlib
+import os
+import sqlite3
+from contextlib import contextmanager
+
+import numpy as np
+
+DEFAULT_CACHE_PATH = "./data/embedding_cache.sqlite"
+
+# Stay well below SQLite's bound-parameter limit on bulk lookups
+LOOKUP_CHUNK_SIZE = 500
+
+def content_hash(text):
+    """Hash text content for use as a cache key"""
+    return hashlib.sha256(str(text).encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """Persistent (model name, content hash) -> float32 vector store"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " content_hash TEXT NOT NULL,"
+            " dim INTEGER NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, content_hash))"
+        )
+        self.conn.commit()
+
+    def get_many(self, model_name, hashes):
+        """Look up vectors for many content hashes, returning {hash: vector}"""
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        for start in range(0, len(unique), LOOKUP_CHUNK_SIZE):
+            chunk = unique[start:start + LOOKUP_CHUNK_SIZE]
+            placeholders = ", ".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT content_hash, vector FROM embeddings"
+                f" WHERE model = ? AND content_hash IN ({placeholders})",
+                [model_name, *chunk],
+            )
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model_name, hashes, vectors):
+        """Store vectors for the given content hashes"""
+        rows = []
+        for key, vector in zip(hashes, vectors):
+            vector = np.asarray(vector, dtype=np.float32)
+            rows.append((model_name, key, int(vector.shape[0]), vector.tobytes()))
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, content_hash, dim, vector)"
+            " VALUES (?, ?, ?, ?)",
+            rows,
+        )
+        self.conn.commit()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+@contextmanager
+def cache_or_default(cache=None):
+    """Use the given cache, or open the default one and close it afterwards"""
+    if cache is not None:
+        yield cache
+        return
+    with EmbeddingCache() as default:
+        yield default
+
+def encode_with_cache(encoder, texts, model_name, cache=None, batch_size=64):
+    """Encode texts, only running the encoder for cache misses
+
+    Returns a float32 array with one row per input text, in input order.
+    """
+    texts = [str(text) for text in texts]
+    hashes = [content_hash(text) for text in texts]
+    with cache_or_default(cache) as cache:
+        found = cache.get_many(model_name, hashes)
+
+        # Encode each missing text once, even if it appears several times
+        missing = {}
+        for key, text in zip(hashes, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        hits = sum(1 for key in hashes if key in found)
+        print(f"Embedding cache: {hits} hits, {len(missing)} unique texts to encode")
+
+        if missing:
+            encoded = encoder.encode(list(missing.values()), batch_size=batch_size)
+            encoded = np.asarray(encoded, dtype=np.float32)
+            cache.put_many(model_name, list(missing.keys()), encoded)
+            found.update(zip(missing.keys(), encoded))
+
+    return np.stack([found[key] for key in hashes]) if hashes else np.zeros((0, 0), dtype=np.float32)
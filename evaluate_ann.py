@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+ANN recall vs latency evaluation
+Computes exact top-k neighbors by brute force, then sweeps vector index
+parameters (nprobes, refine_factor) and reports recall@k against p50/p99
+query latency for each setting. With --reduced, the PCA-reduced first stage
+is measured too, for several candidate pool sizes.
+
+Usage:
+    python evaluate_ann.py --sample 200 --k 10
+    python evaluate_ann.py --queries queries.txt --nprobes 5 10 20 50 --refine 1 5 10
+    python evaluate_ann.py --table hm_synthetic --build-index --output ann.json
+    python evaluate_ann.py --reduced --candidates 2 5 10 20
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from config import Config
+from image_embeddings import TEXT_VECTOR_COLUMN, VECTOR_METRICS
+from reduced_vectors import REDUCED_VECTOR_COLUMN, load_table_projection, rerank
+from table_ops import vectors_to_numpy
+
+def load_queries(path):
+    """Read queries from a text file (one per line) or a JSONL log with a "query" field"""
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                line = json.loads(line).get("query", "")
+            if line:
+                queries.append(line)
+    return queries
+
+def sample_catalog_vectors(dataset, column, count, seed=0):
+    """Use stored vectors of randomly sampled catalog items as queries"""
+    rng = np.random.default_rng(seed)
+    rows = dataset.count_rows()
+    indices = np.sort(rng.choice(rows, size=min(count, rows), replace=False))
+    sample = dataset.take(indices, columns=[column])
+    return vectors_to_numpy(sample.column(column))
+
+def has_vector_index(dataset, column):
+    """Whether an index covers the column; a scalar index on another column doesn't count"""
+    return any(column in index.get("fields", []) for index in dataset.list_indices())
+
+def _distances(queries, block, metric):
+    if metric == "cosine":
+        q = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        b = block / np.linalg.norm(block, axis=1, keepdims=True)
+        return 1.0 - q @ b.T
+    if metric == "dot":
+        return -(queries @ block.T)
+    # Squared L2, which ranks identically to L2
+    return (np.sum(queries ** 2, axis=1)[:, None] - 2.0 * queries @ block.T
+            + np.sum(block ** 2, axis=1)[None, :])
+
+def exact_topk(dataset, column, queries, k, metric="L2", batch_size=65536):
+    """Brute-force top-k article ids per query, scanning the column in blocks"""
+    best_ids = np.empty((len(queries), 0), dtype=object)
+    best_dist = np.empty((len(queries), 0), dtype=np.float32)
+    for batch in dataset.to_batches(columns=["article_id", column], batch_size=batch_size):
+        block = vectors_to_numpy(batch.column(column))
+        ids = np.array(batch.column("article_id").to_pylist(), dtype=object)
+        dist = np.concatenate([best_dist, _distances(queries, block, metric)], axis=1)
+        cand = np.concatenate([best_ids, np.broadcast_to(ids, (len(queries), len(ids)))], axis=1)
+        keep = np.argsort(dist, axis=1)[:, :k]
+        best_dist = np.take_along_axis(dist, keep, axis=1)
+        best_ids = np.take_along_axis(cand, keep, axis=1)
+    return [set(row) for row in best_ids]
+
+def evaluate(search_fn, queries, exact, k):
+    """Run search_fn for every query, returning recall@k and latency percentiles"""
+    latencies, recalls = [], []
+    for query, truth in zip(queries, exact):
+        started = time.perf_counter()
+        ids = search_fn(query)
+        latencies.append(time.perf_counter() - started)
+        recalls.append(len(truth.intersection(ids[:k])) / len(truth))
+    latencies = np.array(latencies) * 1000
+    return {
+        "recall": round(float(np.mean(recalls)), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+    }
+
+def lance_search_fn(table, column, k, metric, nprobes=None, refine_factor=None):
+    """Search function over the table's ANN path with the given parameters"""
+    def search(query):
+        builder = table.search(query, vector_column_name=column).metric(metric).limit(k)
+        if nprobes:
+            builder = builder.nprobes(nprobes)
+        if refine_factor:
+            builder = builder.refine_factor(refine_factor)
+        return builder.select(["article_id"]).to_arrow().column("article_id").to_pylist()
+    return search
+
+def flat_search_fn(dataset, column, k, metric):
+    """Exact search through Lance with the index bypassed"""
+    def search(query):
+        result = dataset.to_table(columns=["article_id"], nearest={
+            "column": column, "q": query, "k": k, "metric": metric, "use_index": False,
+        })
+        return result.column("article_id").to_pylist()
+    return search
+
+def reduced_search_fn(table, projection, k, candidate_factor):
+    """Reduced-column candidate search plus full-vector rerank, as the API runs it"""
+    def search(query):
+        candidates = (table.search(projection.transform(query).tolist(),
+                                   vector_column_name=REDUCED_VECTOR_COLUMN)
+                      .metric("L2").limit(k * candidate_factor)
+                      .select(["article_id", TEXT_VECTOR_COLUMN]).to_pandas())
+        return rerank(candidates, query, k)["article_id"].tolist()
+    return search
+
+def main():
+    import lancedb
+
+    parser = argparse.ArgumentParser(description="Sweep ANN parameters against exact ground truth")
+    parser.add_argument("--db-path", default=Config.LANCEDB_PATH)
+    parser.add_argument("--table", default=Config.TABLE_NAME)
+    parser.add_argument("--column", default=TEXT_VECTOR_COLUMN)
+    parser.add_argument("--queries", help="Query log: text lines or JSONL with a 'query' field")
+    parser.add_argument("--sample", type=int, default=200,
+                        help="Catalog items to sample as queries when no query log is given")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobes", type=int, nargs="+", default=[1, 5, 10, 20, 50])
+    parser.add_argument("--refine", type=int, nargs="+", default=[0, 1, 5, 10],
+                        help="refine_factor values; 0 disables refinement")
+    parser.add_argument("--build-index", action="store_true", help="(Re)build the IVF-PQ index first")
+    parser.add_argument("--num-partitions", type=int, default=256)
+    parser.add_argument("--num-sub-vectors", type=int, default=32)
+    parser.add_argument("--reduced", action="store_true",
+                        help="Also measure the PCA-reduced first stage with full-vector rerank")
+    parser.add_argument("--candidates", type=int, nargs="+", default=[2, 5, 10, 20],
+                        help="Candidate pool sizes for --reduced, as multiples of k")
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    table = lancedb.connect(args.db_path).open_table(args.table)
+    metric = VECTOR_METRICS.get(args.column, "L2")
+
+    if args.build_index:
+        print(f"Building index on {args.column} ({args.num_partitions} partitions)...")
+        table.create_index(metric=metric, num_partitions=args.num_partitions,
+                           num_sub_vectors=args.num_sub_vectors,
+                           vector_column_name=args.column, replace=True)
+    dataset = table.to_lance()
+
+    if args.queries:
+        from sentence_transformers import SentenceTransformer
+        texts = load_queries(args.queries)
+        print(f"Encoding {len(texts)} logged queries...")
+        queries = SentenceTransformer(Config.EMBEDDING_MODEL).encode(texts).astype(np.float32)
+    else:
+        queries = sample_catalog_vectors(dataset, args.column, args.sample)
+    print(f"Computing exact top-{args.k} for {len(queries)} queries over {dataset.count_rows()} rows...")
+    exact = exact_topk(dataset, args.column, queries, args.k, metric)
+
+    results = [{"setting": "flat", **evaluate(flat_search_fn(dataset, args.column, args.k, metric),
+                                                queries, exact, args.k)}]
+    if has_vector_index(dataset, args.column):
+        for nprobes in args.nprobes:
+            for refine in args.refine:
+                search_fn = lance_search_fn(table, args.column, args.k, metric, nprobes, refine)
+                stats = evaluate(search_fn, queries, exact, args.k)
+                results.append({"setting": "ann", "nprobes": nprobes, "refine_factor": refine, **stats})
+    else:
+        print(f"No vector index on {args.column}; only the flat baseline was measured (use --build-index)")
+
+    if args.reduced:
+        projection = load_table_projection(table.schema, args.db_path, args.table)
+        if args.column != TEXT_VECTOR_COLUMN or projection is None:
+            print("No reduced vectors for this table/column; run reduced_vectors.py first")
+        else:
+            for factor in args.candidates:
+                search_fn = reduced_search_fn(table, projection, args.k, factor)
+                stats = evaluate(search_fn, queries, exact, args.k)
+                results.append({"setting": f"pca{projection.dims}", "candidates": args.k * factor, **stats})
+
+    print(f"{'setting':<10}{'nprobes':>8}{'refine':>8}{'pool':>6}{'recall@' + str(args.k):>11}"
+          f"{'p50 ms':>10}{'p99 ms':>10}")
+    for row in results:
+        print(f"{row['setting']:<10}{row.get('nprobes', '-'):>8}{row.get('refine_factor', '-'):>8}"
+              f"{row.get('candidates', '-'):>6}{row['recall']:>11}{row['p50_ms']:>10}{row['p99_ms']:>10}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"table": args.table, "column": args.column, "k": args.k,
+                       "queries": len(queries), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Exact in-process vector search over a memory-mapped matrix
+For catalogs up to a few hundred thousand items, one matrix-vector product
+over contiguous vectors beats going through an index. The vector column is
+exported once per table version to .npy files (float32, float16, or int8
+with a per-row scale) that every worker maps read-only, so the OS page
+cache holds a single copy shared by all of them. Group and product type
+filters become boolean masks over the rows.
+
+Usage:
+    python exact_engine.py --dtype int8        # export the current version
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from config import Config
+from facets import GROUP_COLUMN, TYPE_COLUMN
+from image_embeddings import TEXT_VECTOR_COLUMN
+from table_ops import vectors_to_numpy
+
+DTYPES = ("float32", "float16", "int8")
+# Rows converted to float32 at a time while scoring; small enough that the
+# converted block stays in cache for the matmul
+SCORE_BLOCK_ROWS = 4096
+EXPORT_BATCH_ROWS = 65536
+
+def export_dir(base_dir, table_name, version, dtype):
+    """Directory holding the export of one table version"""
+    return os.path.join(base_dir, f"{table_name}-v{version}-{dtype}")
+
+def export_vectors(dataset, path, column=TEXT_VECTOR_COLUMN, dtype="float16",
+                   batch_size=EXPORT_BATCH_ROWS):
+    """Write a dataset version's vectors, norms and facet codes as .npy files
+
+    Rows keep the dataset's scan order, so a row number can be passed
+    straight to dataset.take(). The export is written to a temporary
+    directory and renamed into place, so concurrent workers never see a
+    partial one.
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"Unknown dtype {dtype}; expected one of {DTYPES}")
+    rows = dataset.count_rows()
+    dim = dataset.schema.field(column).type.list_size
+    parent = os.path.dirname(path) or "."
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent, prefix=".export-")
+    try:
+        matrix = np.lib.format.open_memmap(os.path.join(tmp, "vectors.npy"), mode="w+",
+                                           dtype=np.dtype(dtype), shape=(rows, dim))
+        norms = np.empty(rows, dtype=np.float32)
+        scales = np.ones(rows, dtype=np.float32)
+        start = 0
+        for batch in dataset.to_batches(columns=[column], batch_size=batch_size):
+            block = vectors_to_numpy(batch.column(column))
+            stop = start + len(block)
+            norms[start:stop] = np.einsum("ij,ij->i", block, block)
+            if dtype == "int8":
+                scale = np.abs(block).max(axis=1) / 127.0
+                scale[scale == 0] = 1.0
+                matrix[start:stop] = np.round(block / scale[:, None]).astype(np.int8)
+                scales[start:stop] = scale
+            else:
+                matrix[start:stop] = block
+            start = stop
+        matrix.flush()
+        del matrix
+        np.save(os.path.join(tmp, "norms.npy"), norms)
+        np.save(os.path.join(tmp, "scales.npy"), scales)
+
+        facets = dataset.to_table(columns=[GROUP_COLUMN, TYPE_COLUMN])
+        vocab = {}
+        for name in (GROUP_COLUMN, TYPE_COLUMN):
+            values = facets.column(name).to_pylist()
+            vocab[name] = sorted({v for v in values if v is not None})
+            index = {v: i for i, v in enumerate(vocab[name])}
+            codes = np.array([index.get(v, -1) for v in values], dtype=np.int32)
+            np.save(os.path.join(tmp, f"{name}.npy"), codes)
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"column": column, "dtype": dtype, "rows": rows, "dim": dim,
+                       "version": dataset.version, "vocab": vocab}, f)
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            # Another worker finished the same export first
+            if not os.path.exists(os.path.join(path, "meta.json")):
+                raise
+            shutil.rmtree(tmp, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return path
+
+class ExactEngine:
+    """Brute-force top-k over an exported, memory-mapped vector matrix"""
+
+    def __init__(self, path):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.column = self.meta["column"]
+        self.version = self.meta["version"]
+        # Everything is mapped read-only, so workers share the pages
+        self.matrix = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.norms = np.load(os.path.join(path, "norms.npy"), mmap_mode="r")
+        self.scales = np.load(os.path.join(path, "scales.npy"), mmap_mode="r")
+        self.codes = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+                      for name in (GROUP_COLUMN, TYPE_COLUMN)}
+        self.vocab = {name: {v: i for i, v in enumerate(values)}
+                      for name, values in self.meta["vocab"].items()}
+        self.quantized = self.meta["dtype"] == "int8"
+        # Built on first use of each value and kept; one byte per row
+        self._value_masks = {}
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def _value_mask(self, name, value):
+        key = (name, value)
+        mask = self._value_masks.get(key)
+        if mask is None:
+            code = self.vocab[name].get(value)
+            mask = (self.codes[name] == code) if code is not None else np.zeros(len(self), dtype=bool)
+            self._value_masks[key] = mask
+        return mask
+
+    def mask(self, groups=None, items=None):
+        """Rows in any of the groups and any of the product types (None = all rows)"""
+        mask = None
+        for name, values in ((GROUP_COLUMN, groups), (TYPE_COLUMN, items)):
+            if not values:
+                continue
+            selected = np.logical_or.reduce([self._value_mask(name, v) for v in values])
+            mask = selected if mask is None else mask & selected
+        return mask
+
+    def _dots(self, query, rows=None):
+        """query . vector for all rows, or for the given row numbers"""
+        count = len(self) if rows is None else len(rows)
+        dots = np.empty(count, dtype=np.float32)
+        for start in range(0, count, SCORE_BLOCK_ROWS):
+            stop = min(start + SCORE_BLOCK_ROWS, count)
+            selected = slice(start, stop) if rows is None else rows[start:stop]
+            dots[start:stop] = self.matrix[selected].astype(np.float32, copy=False) @ query
+            if self.quantized:
+                dots[start:stop] *= self.scales[selected]
+        return dots
+
+    def search(self, query, k, groups=None, items=None):
+        """Row numbers and L2 distances of the k nearest rows passing the filters"""
+        query = np.asarray(query, dtype=np.float32)
+        mask = self.mask(groups, items)
+        rows = None if mask is None else np.flatnonzero(mask)
+        norms = self.norms if rows is None else self.norms[rows]
+        # Squared L2 without the constant |q|^2 term
+        scores = norms - 2.0 * self._dots(query, rows)
+        k = min(k, len(scores))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        top = np.argpartition(scores, k - 1)[:k]
+        top = top[np.argsort(scores[top])]
+        distances = np.sqrt(np.maximum(scores[top] + float(query @ query), 0))
+        return (top if rows is None else rows[top]), distances
+
+def load_or_export(dataset, base_dir, table_name, dtype, column=TEXT_VECTOR_COLUMN):
+    """Engine for the dataset's current version, exporting it first if needed"""
+    path = export_dir(base_dir, table_name, dataset.version, dtype)
+    if not os.path.exists(os.path.join(path, "meta.json")):
+        print(f"Exporting {table_name} version {dataset.version} vectors as {dtype}...")
+        export_vectors(dataset, path, column, dtype)
+    return ExactEngine(path)
+
+def remove_stale_exports(base_dir, table_name, keep_path):
+    """Delete exports of older table versions"""
+    if not os.path.isdir(base_dir):
+        return
+    for name in os.listdir(base_dir):
+        path = os.path.join(base_dir, name)
+        if name.startswith(f"{table_name}-v") and path != keep_path:
+            shutil.rmtree(path, ignore_errors=True)
+
+def main():
+    import lancedb
+
+    parser = argparse.ArgumentParser(description="Export vectors for the exact search engine")
+    parser.add_argument("--db-path", default=Config.LANCEDB_PATH)
+    parser.add_argument("--table", default=Config.TABLE_NAME)
+    parser.add_argument("--dtype", choices=DTYPES, default=Config.EXACT_ENGINE or "int8")
+    parser.add_argument("--output-dir", default=Config.EXACT_ENGINE_DIR)
+    args = parser.parse_args()
+
+    dataset = lancedb.connect(args.db_path).open_table(args.table).to_lance()
+    engine = load_or_export(dataset, args.output_dir, args.table, args.dtype)
+    path = export_dir(args.output_dir, args.table, engine.version, args.dtype)
+    remove_stale_exports(args.output_dir, args.table, path)
+    print(f"{len(engine)} vectors ready in {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Group and product type facets
+Item counts per (index group, product type) pair, computed in one scan of
+two columns, so facet lists never touch the rest of the table.
+"""
+
+from collections import Counter
+
+GROUP_COLUMN = "index_group_name"
+TYPE_COLUMN = "product_type_name"
+
+class FacetCounts:
+    """Group -> product type co-occurrence counts"""
+
+    def __init__(self, pair_counts):
+        """pair_counts: mapping of (group, product_type) -> item count
+
+        An empty product type still registers its group, without a type count.
+        """
+        self.by_group = {}
+        self.totals = Counter()
+        for (group, product_type), count in pair_counts.items():
+            types = self.by_group.setdefault(group, Counter())
+            if product_type:
+                types[product_type] += count
+                self.totals[product_type] += count
+
+    def groups(self):
+        return list(self.by_group)
+
+    def types(self, groups=None):
+        """Product types with item counts, summed over the given groups (all if none)"""
+        if groups:
+            counts = Counter()
+            for group in groups:
+                counts.update(self.by_group.get(group, {}))
+        else:
+            counts = self.totals
+        return [{"name": name, "count": count}
+                for name, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))]
+
+def build_facets(catalog_df):
+    """Count items per (group, product type) pair, ignoring blank groups"""
+    pairs = catalog_df[[GROUP_COLUMN, TYPE_COLUMN]].fillna("")
+    for column in (GROUP_COLUMN, TYPE_COLUMN):
+        pairs[column] = pairs[column].astype(str).str.strip()
+    pairs = pairs[pairs[GROUP_COLUMN] != ""]
+    counts = pairs.groupby([GROUP_COLUMN, TYPE_COLUMN]).size()
+    return FacetCounts({key: int(count) for key, count in counts.items()})
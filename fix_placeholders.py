@@ -6,11 +6,17 @@ Fix placeholder images for specific items in the LanceDB database
 import pandas as pd
 import lancedb
 import requests
+from sentence_transformers import SentenceTransformer
 import base64
 from io import BytesIO
 from PIL import Image
 import time
 
+from config import Config
+from image_embeddings import IMAGE_VECTOR_COLUMN, generate_image_embeddings
+from image_store import store_images
+from table_ops import fetch_items, upsert_items
+
 def download_and_encode_image(url, max_size=(400, 400), quality=85):
     """Download an image and encode it as base64"""
     try:
@@ -62,8 +68,10 @@ def fix_placeholder_images():
     
     print(f"Fixing {len(fixes)} placeholder images...")
     
-    # Get current data
-    df = table.search().limit(100).to_pandas()
+    # Fetch only the rows being fixed
+    df = fetch_items(table, fixes.keys())
+    updated = []
+    new_images = {}
     
     # Update the specific items
     for article_id, new_url in fixes.items():
@@ -78,8 +86,8 @@ def fix_placeholder_images():
         # Download and encode the new image
         new_image_data = download_and_encode_image(new_url)
         if new_image_data:
-            # Update the image_data for this item
-            df.loc[item_mask, 'image_data'] = new_image_data
+            new_images[article_id] = new_image_data
+            updated.append(article_id)
             print(f"✅ Updated {article_id} with new image")
         else:
             print(f"❌ Failed to update {article_id}")
@@ -87,16 +95,26 @@ def fix_placeholder_images():
         # Small delay to be respectful
         time.sleep(0.5)
     
-    # Drop and recreate the table with updated data
-    try:
-        db.drop_table(table_name)
-        print(f"Dropped existing table: {table_name}")
-    except Exception as e:
-        print(f"Table {table_name} couldn't be dropped: {e}")
+    if not updated:
+        print("No images were replaced")
+        return
+    
+    # Store the new images as deduplicated blobs and point the rows at them,
+    # the same way load_binary_images.build_batch does
+    fixed = df[df['article_id'].isin(updated)].copy()
+    images = [new_images[article_id] for article_id in fixed['article_id']]
+    fixed['image_hash'] = store_images(db, images)
+    fixed['image_data'] = ""
+    if IMAGE_VECTOR_COLUMN in table.schema.names:
+        # The old photo's embedding no longer matches the new one
+        model_name = Config.EMBEDDING_MODEL
+        fixed[IMAGE_VECTOR_COLUMN] = generate_image_embeddings(
+            SentenceTransformer(model_name), images, model_name
+        ).tolist()
     
-    # Create new table with updated data
-    print(f"Recreating table {table_name} with fixed images...")
-    table = db.create_table(table_name, df)
+    # Rewrite only the updated rows in place
+    print(f"Upserting {len(updated)} fixed items into {table_name}...")
+    upsert_items(table, fixed)
     
     print(f"✅ Successfully updated table '{table_name}' with fixed placeholder images!")
     print("\n🖼️ All placeholder images have been replaced with real images!")
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Synthetic catalog generator for benchmarks
+Produces catalogs of any size that follow the hm_mini schema, with clustered
+synthetic vectors and a shared pool of synthetic images, and writes them
+straight to a Lance dataset in large batches.
+
+Usage:
+    python generate_catalog.py --rows 1000000 --table hm_synthetic
+    python generate_catalog.py --rows 10000 --db-path ./bench_data --no-images
+"""
+
+import argparse
+import base64
+import os
+import time
+from io import BytesIO
+
+import numpy as np
+import pyarrow as pa
+from PIL import Image
+
+from config import Config
+
+VECTOR_DIM = 512
+DEFAULT_BATCH_ROWS = 50_000
+
+# Product types per group, with (size family, typical price)
+GROUP_PRODUCT_TYPES = {
+    "Menswear": {
+        "Shirt": ("clothing", 35), "T-Shirt": ("clothing", 15), "Polo": ("clothing", 25),
+        "Jeans": ("waist", 45), "Chinos": ("waist", 40), "Shorts": ("waist", 25),
+        "Sweater": ("clothing", 45), "Hoodie": ("clothing", 40), "Blazer": ("clothing", 90),
+        "Vest": ("clothing", 55), "Tie": ("one", 20),
+    },
+    "Ladieswear": {
+        "Dress": ("clothing", 50), "Blouse": ("clothing", 35), "Skirt": ("clothing", 40),
+        "Pants": ("clothing", 45), "Top": ("clothing", 20), "Cardigan": ("clothing", 45),
+        "Jumpsuit": ("clothing", 60), "Leggings": ("clothing", 25), "Blazer": ("clothing", 85),
+        "Shawl": ("one", 30),
+    },
+    "Divided": {
+        "Beanie": ("one", 15), "Belt": ("clothing", 25), "Gloves": ("clothing", 18),
+        "Scarf": ("one", 22), "Sneakers": ("shoe", 45),
+    },
+    "Baby/Children": {
+        "Onesie": ("baby", 15), "Pajamas": ("kids", 20), "T-Shirt": ("kids", 12),
+        "Dress": ("kids", 25), "Sweater": ("kids", 25),
+    },
+    "Sport": {
+        "Running Shirt": ("clothing", 30), "Yoga Pants": ("clothing", 50),
+        "Sports Bra": ("clothing", 35), "Joggers": ("clothing", 40),
+        "Windbreaker": ("clothing", 70), "Swimsuit": ("clothing", 40),
+        "Training Shoes": ("shoe", 95),
+    },
+}
+
+SIZES = {
+    "clothing": ["XS", "S", "M", "L", "XL"],
+    "waist": ["28", "30", "32", "34", "36"],
+    "shoe": ["37", "38", "39", "40", "41", "42", "43", "44"],
+    "baby": ["0-3M", "3-6M", "6M", "12M", "18M"],
+    "kids": ["2T", "3T", "4T", "5T", "6", "8", "10"],
+    "one": ["One Size"],
+}
+
+COLORS = {
+    "Black": (20, 20, 20), "White": (245, 245, 245), "Gray": (128, 128, 128),
+    "Navy": (20, 30, 90), "Blue": (40, 90, 200), "Sky Blue": (135, 206, 235),
+    "Red": (200, 30, 40), "Burgundy": (110, 20, 40), "Pink": (240, 150, 180),
+    "Green": (40, 140, 60), "Olive": (110, 110, 40), "Khaki": (195, 176, 145),
+    "Brown": (120, 70, 30), "Beige": (225, 210, 180), "Yellow": (240, 210, 40),
+    "Orange": (240, 130, 30), "Purple": (110, 50, 150), "Floral": (220, 120, 160),
+}
+
+ADJECTIVES = ["Classic", "Relaxed", "Slim-Fit", "Oversized", "Cropped", "Essential",
+              "Vintage", "Modern", "Lightweight", "Cozy", "Tailored", "Everyday"]
+MATERIALS = ["cotton", "linen", "wool", "denim", "jersey", "satin", "fleece",
+             "organic cotton", "recycled polyester", "merino", "viscose", "corduroy"]
+FEATURES = [
+    "Perfect for casual everyday wear.",
+    "Designed for comfort and easy layering.",
+    "Features a modern fit and clean finish.",
+    "Made from soft, breathable fabric.",
+    "A versatile piece for work and weekends.",
+    "Finished with subtle details for a polished look.",
+    "Easy to care for and built to last.",
+    "Ideal for warm weather and travel.",
+]
+
+def catalog_types():
+    """Flatten the group/type table into parallel arrays"""
+    groups, types, size_families, base_prices = [], [], [], []
+    for group in Config.GROUP_ORDER:
+        for product_type, (size_family, price) in GROUP_PRODUCT_TYPES[group].items():
+            groups.append(group)
+            types.append(product_type)
+            size_families.append(size_family)
+            base_prices.append(price)
+    return groups, types, size_families, np.array(base_prices, dtype=np.float64)
+
+def make_image(rgb, variant, size=(64, 64)):
+    """Small synthetic product image as a base64 data URL"""
+    img = Image.new('RGB', size, rgb)
+    # A stripe whose position varies per variant keeps the pool's content distinct
+    stripe = (variant * 7) % size[1]
+    img.paste(tuple(255 - c for c in rgb), (0, stripe, size[0], min(size[1], stripe + 4)))
+    output = BytesIO()
+    img.save(output, format='JPEG', quality=80)
+    return "data:image/jpeg;base64," + base64.b64encode(output.getvalue()).decode('utf-8')
+
+class CatalogGenerator:
+    """Deterministic generator of catalog record batches"""
+
+    def __init__(self, rows, seed=0, dim=VECTOR_DIM, noise=0.35, image_hashes=None,
+                 with_image_vectors=True):
+        self.rows = rows
+        self.dim = dim
+        self.noise = noise
+        self.seed = seed
+        self.image_hashes = image_hashes
+        self.with_image_vectors = with_image_vectors
+
+        rng = np.random.default_rng(seed)
+        self.groups, self.types, self.size_families, self.base_prices = catalog_types()
+        self.colors = list(COLORS.keys())
+        # Items cluster by product type, shifted by color, so nearest
+        # neighbors look like they would with real embeddings
+        self.type_centroids = rng.standard_normal((len(self.types), dim)).astype(np.float32)
+        self.color_offsets = 0.5 * rng.standard_normal((len(self.colors), dim)).astype(np.float32)
+        self.image_shift = 0.3 * rng.standard_normal(dim).astype(np.float32)
+        self.schema = self._schema()
+
+    def _schema(self):
+        vector_type = pa.list_(pa.float32(), self.dim)
+        fields = [
+            pa.field("image_url", pa.string()),
+            pa.field("image_data", pa.string()),
+            pa.field("image_hash", pa.string()),
+            pa.field("prod_name", pa.string()),
+            pa.field("detail_desc", pa.string()),
+            pa.field("product_type_name", pa.string()),
+            pa.field("index_group_name", pa.string()),
+            pa.field("price", pa.float64()),
+            pa.field("article_id", pa.string()),
+            pa.field("available", pa.bool_()),
+            pa.field("color", pa.string()),
+            pa.field("size", pa.string()),
+            pa.field("vector", vector_type),
+        ]
+        if self.with_image_vectors:
+            fields.append(pa.field("image_vector", vector_type))
+        return pa.schema(fields)
+
+    def _vectors(self, rng, type_idx, color_idx, shift=None):
+        vectors = self.type_centroids[type_idx] + self.color_offsets[color_idx]
+        vectors += self.noise * rng.standard_normal(vectors.shape, dtype=np.float32)
+        if shift is not None:
+            vectors += shift
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return pa.FixedSizeListArray.from_arrays(pa.array(vectors.ravel()), self.dim)
+
+    def batch(self, start, count):
+        """Generate rows [start, start + count) as a RecordBatch"""
+        # Seed per batch so any slice is reproducible independently
+        rng = np.random.default_rng((self.seed, start))
+        type_idx = rng.integers(0, len(self.types), count)
+        color_idx = rng.integers(0, len(self.colors), count)
+        adjective_idx = rng.integers(0, len(ADJECTIVES), count)
+        material_idx = rng.integers(0, len(MATERIALS), count)
+        feature_idx = rng.integers(0, len(FEATURES), count)
+        size_pick = rng.random(count)
+        prices = np.floor(self.base_prices[type_idx] * rng.lognormal(0.0, 0.3, count)) + 0.99
+
+        types = [self.types[i] for i in type_idx]
+        colors = [self.colors[i] for i in color_idx]
+        sizes = []
+        for i, pick in zip(type_idx, size_pick):
+            options = SIZES[self.size_families[i]]
+            sizes.append(options[int(pick * len(options))])
+
+        columns = {
+            "image_url": pa.array(["binary_stored"] * count),
+            "image_data": pa.array([""] * count),
+            "image_hash": pa.array(
+                [self.image_hashes[(c * 7 + t) % len(self.image_hashes)]
+                 for c, t in zip(color_idx, type_idx)] if self.image_hashes else [""] * count
+            ),
+            "prod_name": pa.array([f"{ADJECTIVES[a]} {t}" for a, t in zip(adjective_idx, types)]),
+            "detail_desc": pa.array([
+                f"{ADJECTIVES[a]} {t.lower()} in {c.lower()} {MATERIALS[m]}. {FEATURES[f]}"
+                for a, t, c, m, f in zip(adjective_idx, types, colors, material_idx, feature_idx)
+            ]),
+            "product_type_name": pa.array(types),
+            "index_group_name": pa.array([self.groups[i] for i in type_idx]),
+            "price": pa.array(prices),
+            "article_id": pa.array([f"SY{i:09d}" for i in range(start, start + count)]),
+            "available": pa.array(rng.random(count) > 0.05),
+            "color": pa.array(colors),
+            "size": pa.array(sizes),
+            "vector": self._vectors(rng, type_idx, color_idx),
+        }
+        if self.with_image_vectors:
+            columns["image_vector"] = self._vectors(rng, type_idx, color_idx, self.image_shift)
+        return pa.RecordBatch.from_arrays([columns[f.name] for f in self.schema], schema=self.schema)
+
+    def batches(self, batch_rows=DEFAULT_BATCH_ROWS):
+        for start in range(0, self.rows, batch_rows):
+            yield self.batch(start, min(batch_rows, self.rows - start))
+
+    def reader(self, batch_rows=DEFAULT_BATCH_ROWS):
+        """Stream the whole catalog as a RecordBatchReader"""
+        return pa.RecordBatchReader.from_batches(self.schema, self.batches(batch_rows))
+
+def image_table_name(table_name):
+    """The synthetic catalog's own blob table, kept apart from the real image store"""
+    return f"{table_name}_images"
+
+def build_image_pool(db, pool_size, image_table):
+    """Store a pool of distinct synthetic images in image_table and return their hashes"""
+    from image_store import store_images
+
+    rgbs = list(COLORS.values())
+    images = [make_image(rgbs[i % len(rgbs)], i) for i in range(pool_size)]
+    return list(dict.fromkeys(store_images(db, images, image_table)))
+
+def write_catalog(rows, db_path="./data", table_name="hm_synthetic", seed=0,
+                  batch_rows=DEFAULT_BATCH_ROWS, image_pool=64, with_image_vectors=True,
+                  image_table=None):
+    """Generate a catalog and write it as a Lance dataset in one commit
+
+    Synthetic images go to image_table, `<table_name>_images` by default,
+    never to the shared image store.
+    """
+    import lance
+    import lancedb
+
+    os.makedirs(db_path, exist_ok=True)
+    db = lancedb.connect(db_path)
+    image_table = image_table or image_table_name(table_name)
+    image_hashes = build_image_pool(db, image_pool, image_table) if image_pool else None
+
+    generator = CatalogGenerator(rows, seed=seed, image_hashes=image_hashes,
+                                 with_image_vectors=with_image_vectors)
+    started = time.perf_counter()
+    lance.write_dataset(
+        generator.reader(batch_rows),
+        os.path.join(db_path, f"{table_name}.lance"),
+        mode="overwrite",
+        max_rows_per_file=max(batch_rows, 1024 * 1024),
+    )
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {rows} rows to {table_name} in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s)")
+    return db.open_table(table_name)
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic fashion catalog")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--db-path", default="./data")
+    parser.add_argument("--table", default="hm_synthetic")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS)
+    parser.add_argument("--image-pool", type=int, default=64,
+                        help="Distinct synthetic images shared by all rows (0 for none)")
+    parser.add_argument("--image-table",
+                        help="Blob table for the synthetic images (default: <table>_images)")
+    parser.add_argument("--no-images", action="store_true", help="Skip images and image vectors")
+    args = parser.parse_args()
+
+    write_catalog(
+        args.rows, args.db_path, args.table, args.seed, args.batch_rows,
+        image_pool=0 if args.no_images else args.image_pool,
+        with_image_vectors=not args.no_images,
+        image_table=args.image_table,
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+CLIP image embeddings and vector indexes for the catalog
+Product photos are embedded once at ingest time into a second vector column,
+so visual similarity never has to be computed per query.
+"""
+
+import base64
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from embedding_cache import cache_or_default, content_hash
+
+IMAGE_VECTOR_COLUMN = "image_vector"
+TEXT_VECTOR_COLUMN = "vector"
+
+# Metric used for each vector column. Image vectors are normalized CLIP
+# embeddings queried with CLIP text vectors, so cosine is the natural fit.
+VECTOR_METRICS = {
+    TEXT_VECTOR_COLUMN: "L2",
+    IMAGE_VECTOR_COLUMN: "cosine",
+}
+
+# Below this many rows an exact scan is faster than any IVF-PQ index
+INDEX_MIN_ROWS = 5000
+
+def decode_image_data(image_data):
+    """Decode a base64 (optionally data-URL) string into an RGB PIL image"""
+    if image_data.startswith('data:'):
+        image_data = image_data.split(',', 1)[1]
+    img = Image.open(BytesIO(base64.b64decode(image_data)))
+    return img.convert('RGB')
+
+def generate_image_embeddings(encoder, image_data_list, model_name, cache=None, batch_size=128):
+    """Embed base64 images with CLIP in large batches, reusing cached vectors
+
+    Images are decoded one batch at a time to keep memory bounded.
+    Returns a float32 array with one normalized row per input image.
+    """
+    cache_model = f"{model_name}/image"
+    hashes = [content_hash(image_data) for image_data in image_data_list]
+    with cache_or_default(cache) as cache:
+        found = cache.get_many(cache_model, hashes)
+
+        missing = {}
+        for key, image_data in zip(hashes, image_data_list):
+            if key not in found and key not in missing:
+                missing[key] = image_data
+        print(f"Image embeddings: {len(found)} cached, {len(missing)} unique images to encode")
+
+        keys = list(missing.keys())
+        for start in range(0, len(keys), batch_size):
+            batch_keys = keys[start:start + batch_size]
+            images = [decode_image_data(missing[key]) for key in batch_keys]
+            encoded = encoder.encode(images, batch_size=batch_size, normalize_embeddings=True)
+            encoded = np.asarray(encoded, dtype=np.float32)
+            cache.put_many(cache_model, batch_keys, encoded)
+            found.update(zip(batch_keys, encoded))
+            print(f"  Encoded {min(start + batch_size, len(keys))}/{len(keys)} images")
+
+    return np.stack([found[key] for key in hashes])
+
+def create_vector_indexes(table, columns=(TEXT_VECTOR_COLUMN, IMAGE_VECTOR_COLUMN)):
+    """Build an IVF-PQ index on each vector column present in the table"""
+    row_count = table.count_rows()
+    if row_count < INDEX_MIN_ROWS:
+        print(f"Skipping vector indexes: {row_count} rows is below {INDEX_MIN_ROWS}")
+        return []
+
+    names = table.schema.names
+    indexed = []
+    for column in columns:
+        if column not in names:
+            continue
+        print(f"Creating {VECTOR_METRICS[column]} index on {column}...")
+        table.create_index(
+            metric=VECTOR_METRICS[column],
+            num_partitions=max(1, int(np.sqrt(row_count))),
+            num_sub_vectors=32,
+            vector_column_name=column,
+            replace=True,
+        )
+        indexed.append(column)
+    return indexed
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Content-addressed image storage for LanceDB
+Each distinct image is stored once as raw bytes in a shared blob table keyed
+by the SHA-256 of its content; article rows only carry that image_hash.
+"""
+
+import base64
+import hashlib
+
+import pandas as pd
+
+from table_ops import ensure_key_index, fetch_items
+
+IMAGE_TABLE_NAME = "hm_images"
+IMAGE_KEY_COLUMN = "image_hash"
+
+def image_bytes_from_data(image_data):
+    """Decode a base64 (optionally data-URL) image string into raw bytes"""
+    if image_data.startswith('data:'):
+        image_data = image_data.split(',', 1)[1]
+    return base64.b64decode(image_data)
+
+def hash_image_bytes(image_bytes):
+    """Content hash used as the blob key"""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+def open_image_table(db, table_name=IMAGE_TABLE_NAME):
+    """Open the image blob table, or return None if it hasn't been created"""
+    if table_name in db.table_names():
+        return db.open_table(table_name)
+    return None
+
+def store_images(db, image_data_list, table_name=IMAGE_TABLE_NAME):
+    """Store base64 images as deduplicated blobs and return their hashes
+
+    Only blobs not already present in the table are written.
+    """
+    hashes = []
+    blobs = {}
+    for image_data in image_data_list:
+        image_bytes = image_bytes_from_data(image_data)
+        key = hash_image_bytes(image_bytes)
+        hashes.append(key)
+        blobs.setdefault(key, image_bytes)
+
+    table = open_image_table(db, table_name)
+    if table is not None and blobs:
+        existing = fetch_items(table, blobs.keys(), columns=[IMAGE_KEY_COLUMN], key=IMAGE_KEY_COLUMN)
+        for key in existing[IMAGE_KEY_COLUMN]:
+            blobs.pop(key, None)
+
+    print(f"Image store: {len(image_data_list)} images, {len(set(hashes))} unique, "
+          f"{len(blobs)} new blobs to write")
+    if blobs:
+        new_blobs = pd.DataFrame({
+            IMAGE_KEY_COLUMN: list(blobs.keys()),
+            "image_bytes": list(blobs.values()),
+        })
+        if table is None:
+            # Every /image request is a point lookup by hash
+            ensure_key_index(db.create_table(table_name, new_blobs), IMAGE_KEY_COLUMN)
+        else:
+            table.add(new_blobs)
+    return hashes
+
+def load_image_bytes(table, image_hash):
+    """Point lookup of a blob by hash, returning raw bytes or None"""
+    rows = fetch_items(table, [image_hash], columns=["image_bytes"], key=IMAGE_KEY_COLUMN)
+    if rows is None or rows.empty:
+        return None
+    return rows.iloc[0]["image_bytes"]
+
+def row_image_hash(row):
+    """A row's blob hash, or "" for legacy rows whose hash is null (NaN in pandas)"""
+    image_hash = row.get(IMAGE_KEY_COLUMN)
+    return image_hash if isinstance(image_hash, str) and image_hash else ""
+
+def load_row_image(row, image_table):
+    """Image bytes for an article row and the ETag to serve them with, or None if absent
+
+    Rows with an image hash are read from the blob table; legacy rows fall
+    back to their inline base64 image_data. Undecodable data raises ValueError.
+    """
+    image_hash = row_image_hash(row)
+    if image_hash and image_table is not None:
+        image_bytes = load_image_bytes(image_table, image_hash)
+        return None if image_bytes is None else (image_bytes, f'"{image_hash}"')
+    image_data = row.get("image_data")
+    if not isinstance(image_data, str) or not image_data:
+        return None
+    return image_bytes_from_data(image_data), None
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Resumable, batched ingestion into LanceDB
+Items are built and committed in batches; after each commit the batch's
+article ids are appended to a checkpoint file, so an interrupted load
+resumes from the last committed batch instead of starting over.
+"""
+
+import os
+
+from table_ops import KEY_COLUMN, open_or_create_table, upsert_items
+
+DEFAULT_BATCH_SIZE = 500
+
+def checkpoint_path(db_path, table_name):
+    """Default checkpoint file location for a table"""
+    return os.path.join(db_path, f".ingest_checkpoint_{table_name}")
+
+class IngestCheckpoint:
+    """Append-only record of article ids already committed to the table"""
+
+    def __init__(self, path):
+        self.path = path
+        self.completed = set()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.completed = {line.strip() for line in f if line.strip()}
+
+    def __contains__(self, article_id):
+        return article_id in self.completed
+
+    def __len__(self):
+        return len(self.completed)
+
+    def mark(self, article_ids):
+        """Record a committed batch, flushed to disk before returning"""
+        article_ids = [str(article_id) for article_id in article_ids]
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(f"{article_id}\n" for article_id in article_ids))
+            f.flush()
+            os.fsync(f.fileno())
+        self.completed.update(article_ids)
+
+    def clear(self):
+        """Forget all progress, e.g. after a load completes"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.completed = set()
+
+def ingest_in_batches(items, build_batch, db, table_name, checkpoint,
+                      batch_size=DEFAULT_BATCH_SIZE, key=KEY_COLUMN):
+    """Build and commit items batch by batch, skipping checkpointed ids
+
+    build_batch takes a list of item dicts and returns the DataFrame to
+    upsert. Rows are committed before they are checkpointed, and upserts
+    are idempotent, so a crash between the two only repeats one batch.
+    An existing table gains any new columns in place before the first
+    batch is written; rows outside this load are never touched.
+    Returns the table, or None if there was nothing left to load.
+    """
+    pending = [item for item in items if str(item[key]) not in checkpoint]
+    if len(checkpoint):
+        print(f"Resuming: {len(items) - len(pending)} items already loaded, {len(pending)} remaining")
+
+    table = None
+    for start in range(0, len(pending), batch_size):
+        batch_df = build_batch(pending[start:start + batch_size])
+
+        created = False
+        if table is None:
+            table, created = open_or_create_table(db, table_name, batch_df, key)
+        if not created:
+            upsert_items(table, batch_df, key)
+
+        checkpoint.mark(batch_df[key].tolist())
+        print(f"Committed {min(start + batch_size, len(pending))}/{len(pending)} items")
+
+    if table is None and table_name in db.table_names():
+        table = db.open_table(table_name)
+    return table
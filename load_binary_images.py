@@ -5,14 +5,35 @@ This script downloads images and stores them as base64-encoded binary data in La
 """
 
 import pandas as pd
-import lancedb
-from sentence_transformers import SentenceTransformer
 import numpy as np
 import requests
 import base64
 from io import BytesIO
 from PIL import Image
 import time
+import argparse
+
+from config import Config
+from embedding_cache import encode_with_cache
+from image_embeddings import create_vector_indexes, generate_image_embeddings
+from image_store import store_images
+from ingest import DEFAULT_BATCH_SIZE, IngestCheckpoint, checkpoint_path, ingest_in_batches
+from reduced_vectors import REDUCED_VECTOR_COLUMN, add_reduced_vectors, load_table_projection
+
+def fetch_with_retries(url, retries=3, backoff=1.0):
+    """GET a URL, retrying transient failures with exponential backoff"""
+    for attempt in range(retries + 1):
+        try:
+            response = requests.get(url, timeout=10, headers={
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+            })
+            response.raise_for_status()
+            return response
+        except requests.RequestException as e:
+            if attempt == retries:
+                raise
+            print(f"Retrying {url} after error: {e}")
+            time.sleep(backoff * (2 ** attempt))
 
 def download_and_encode_image(url, max_size=(400, 400), quality=85):
     """Download an image and encode it as base64"""
@@ -20,10 +41,7 @@ def download_and_encode_image(url, max_size=(400, 400), quality=85):
         print(f"Downloading image: {url}")
         
         # Download the image
-        response = requests.get(url, timeout=10, headers={
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
-        response.raise_for_status()
+        response = fetch_with_retries(url)
         
         # Open and process the image
         img = Image.open(BytesIO(response.content))
@@ -62,8 +80,8 @@ def create_placeholder_image(size=(400, 400), color=(180, 180, 180)):
         print(f"Error creating placeholder: {e}")
         return ""
 
-def create_sample_data_with_binary_images():
-    """Create sample fashion data with binary image data"""
+def create_sample_catalog():
+    """Create sample fashion data, with each item's image source URL in `source_url`"""
     
     # Sample image URLs from reliable sources - 55 total images
     image_urls = [
@@ -781,58 +799,114 @@ def create_sample_data_with_binary_images():
         }
     ]
     
-    # Download and encode images
-    print("Downloading and encoding images...")
     for i, item in enumerate(sample_data):
-        if i < len(image_urls):
-            item["image_data"] = download_and_encode_image(image_urls[i])
-        else:
-            # Create placeholder for items without specific image URLs
-            item["image_data"] = create_placeholder_image()
-        
-        # Small delay to be respectful to image servers
-        time.sleep(0.5)
+        # Items without a specific image URL get a placeholder
+        item["source_url"] = image_urls[i] if i < len(image_urls) else None
     
     return sample_data
 
+def attach_images(items, downloaded):
+    """Return copies of items with image_data, fetching each distinct URL only once
+
+    `downloaded` maps URL to encoded image.
+    """
+    with_images = []
+    for item in items:
+        item = dict(item)
+        url = item.pop("source_url", None)
+        if url not in downloaded:
+            if url is None:
+                downloaded[url] = create_placeholder_image()
+            else:
+                downloaded[url] = download_and_encode_image(url)
+                # Small delay to be respectful to image servers
+                time.sleep(0.5)
+        item["image_data"] = downloaded[url]
+        with_images.append(item)
+    return with_images
+
+def create_sample_data_with_binary_images():
+    """Create sample fashion data with binary image data"""
+    print("Downloading and encoding images...")
+    downloaded = {}
+    sample_data = attach_images(create_sample_catalog(), downloaded)
+    print(f"Fetched {len(downloaded)} distinct images for {len(sample_data)} items")
+    return sample_data
+
+def build_batch(items, db, model, model_name, projection=None):
+    """Download images and compute embeddings for one batch of items"""
+    df = pd.DataFrame(attach_images(items, {}))
+    
+    # Generate embeddings from product descriptions, encoding only cache misses
+    vectors = encode_with_cache(model, df['detail_desc'].tolist(), model_name)
+    df['vector'] = vectors.tolist()
+    if projection is not None:
+        # Project with the table's existing PCA so new rows match its schema
+        df[REDUCED_VECTOR_COLUMN] = projection.transform(vectors).tolist()
+    
+    # Embed the product photos for visual search
+    image_embeddings = generate_image_embeddings(model, df['image_data'].tolist(), model_name)
+    df['image_vector'] = image_embeddings.tolist()
+    
+    # Store each distinct image once and point article rows at its hash
+    df['image_hash'] = store_images(db, df['image_data'].tolist())
+    df['image_data'] = ""
+    return df
+
 def main():
+    import lancedb
+    from sentence_transformers import SentenceTransformer
+
+    parser = argparse.ArgumentParser(description="Load sample fashion data with binary images")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Items committed per batch")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignore any checkpoint from an interrupted run")
+    args = parser.parse_args()
+    
     # Connect to LanceDB
-    db = lancedb.connect("./data")
+    db_path = "./data"
+    db = lancedb.connect(db_path)
     table_name = "hm_mini"
     
-    print(f"Creating sample data with binary images...")
-    sample_data = create_sample_data_with_binary_images()
+    checkpoint = IngestCheckpoint(checkpoint_path(db_path, table_name))
+    if args.restart:
+        checkpoint.clear()
     
-    # Create DataFrame
-    df = pd.DataFrame(sample_data)
+    print(f"Creating sample data with binary images...")
+    sample_data = create_sample_catalog()
+    # Items sharing an image URL land in the same batch, so each URL is
+    # downloaded once without keeping every image in memory across batches
+    sample_data.sort(key=lambda item: item["source_url"] or "")
     
     # Load the sentence transformer model for generating embeddings
     print("Loading sentence transformer model...")
-    model = SentenceTransformer('clip-ViT-B-32')
+    model_name = Config.EMBEDDING_MODEL
+    model = SentenceTransformer(model_name)
     
-    # Generate embeddings from product descriptions
-    print("Generating embeddings...")
-    descriptions = df['detail_desc'].tolist()
-    embeddings = model.encode(descriptions)
+    projection = None
+    if table_name in db.table_names():
+        # New rows must be projected with the PCA the table's column was written with
+        projection = load_table_projection(db.open_table(table_name).schema, db_path, table_name)
     
-    # Add embeddings to the DataFrame
-    df['vector'] = embeddings.tolist()
-    
-    # Drop existing table if it exists and create new one
-    try:
-        db.drop_table(table_name)
-        print(f"Dropped existing table: {table_name}")
-    except Exception as e:
-        print(f"Table {table_name} doesn't exist or couldn't be dropped: {e}")
+    # Commit in batches, upserting by article_id, so an interrupted load
+    # resumes from the last committed batch
+    table = ingest_in_batches(
+        sample_data,
+        lambda items: build_batch(items, db, model, model_name, projection),
+        db, table_name, checkpoint, batch_size=args.batch_size
+    )
     
-    # Create new table with binary image data
-    print(f"Creating table {table_name} with {len(df)} items...")
-    table = db.create_table(table_name, df)
+    if table is not None:
+        create_vector_indexes(table)
+        if Config.REDUCED_SEARCH and REDUCED_VECTOR_COLUMN not in table.schema.names:
+            add_reduced_vectors(db, table_name, db_path=db_path)
+    checkpoint.clear()
     
-    print(f"✅ Successfully created table '{table_name}' with {len(df)} items and binary image data!")
+    print(f"✅ Successfully loaded {len(sample_data)} items with binary image data into '{table_name}'!")
     print("\nSample article IDs for testing:")
-    for i, row in df.iterrows():
-        print(f"  - {row['article_id']}: {row['prod_name']}")
+    for item in sample_data:
+        print(f"  - {item['article_id']}: {item['prod_name']}")
     
     print(f"\n🖼️ Images are now stored as binary data in the database!")
     print(f"📡 You can access images via: http://localhost:8000/image/<article_id>")
@@ -9,6 +9,10 @@ import lancedb
 from sentence_transformers import SentenceTransformer
 import numpy as np
 
+from embedding_cache import encode_with_cache
+from reduced_vectors import REDUCED_VECTOR_COLUMN, load_table_projection
+from table_ops import open_or_create_table, upsert_items
+
 def create_sample_data():
     """Create sample fashion data"""
     sample_data = [
@@ -627,40 +631,37 @@ def create_sample_data():
     
     return pd.DataFrame(sample_data)
 
-def generate_embeddings(data_df, text_column='detail_desc'):
-    """Generate embeddings for text descriptions"""
+def generate_embeddings(data_df, text_column='detail_desc', model_name="clip-ViT-B-32"):
+    """Generate embeddings for text descriptions, reusing cached vectors"""
     print("Generating embeddings...")
-    encoder = SentenceTransformer("clip-ViT-B-32")
+    encoder = SentenceTransformer(model_name)
     
-    # Generate embeddings for each description
-    embeddings = []
-    for desc in data_df[text_column]:
-        embedding = encoder.encode(desc)
-        embeddings.append(embedding.tolist())
+    # Only descriptions that changed since the last run are encoded
+    embeddings = encode_with_cache(encoder, data_df[text_column].tolist(), model_name)
     
-    data_df['vector'] = embeddings
+    data_df['vector'] = embeddings.tolist()
     return data_df
 
 def load_data_to_lancedb(data_df, db_path="./data", table_name="hm_mini"):
-    """Load data into LanceDB table"""
+    """Load data into LanceDB table, upserting by article_id"""
     print(f"Connecting to LanceDB at {db_path}...")
     db = lancedb.connect(db_path)
     
-    try:
-        # Try to open existing table
-        table = db.open_table(table_name)
-        print(f"Opened existing table: {table_name}")
-    except:
-        # Create new table if it doesn't exist
-        print(f"Creating new table: {table_name}")
-        table = db.create_table(table_name, data_df)
-        print("Table created successfully!")
+    if table_name in db.table_names():
+        # Keep the table's reduced vectors in step with the new text vectors
+        projection = load_table_projection(db.open_table(table_name).schema, db_path, table_name)
+        if projection is not None:
+            data_df[REDUCED_VECTOR_COLUMN] = projection.transform(np.stack(data_df['vector'])).tolist()
+    
+    table, created = open_or_create_table(db, table_name, data_df)
+    if created:
+        print(f"Created new table: {table_name}")
         return
     
-    # Add data to existing table
-    print("Adding data to existing table...")
-    table.add(data_df)
-    print("Data added successfully!")
+    # Replace rows that already exist and append new ones
+    print(f"Upserting data into existing table: {table_name}")
+    upsert_items(table, data_df)
+    print("Data upserted successfully!")
 
 def main():
     """Main function to load sample data"""
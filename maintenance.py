@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Dataset maintenance for the LanceDB catalog
+Compacts small fragments left behind by incremental loads, prunes versions
+older than a retention window, re-optimizes vector indexes and rebuilds
+neighbor graphs that compaction left stale.
+
+Usage:
+    python maintenance.py                      # all tables, 7 day retention
+    python maintenance.py --retention-days 1 --tables hm_mini
+"""
+
+import argparse
+import json
+import threading
+import time
+from datetime import timedelta
+
+from neighbor_graph import refresh_neighbor_table
+
+DEFAULT_RETENTION_DAYS = 7
+DEFAULT_TARGET_ROWS_PER_FRAGMENT = 1024 * 1024
+
+def _dataset_stats(table):
+    """Fragment, version and row counts for a table"""
+    dataset = table.to_lance()
+    return {
+        "fragments": len(dataset.get_fragments()),
+        "versions": len(dataset.versions()),
+        "rows": dataset.count_rows(),
+    }
+
+def maintain_table(table, retention=timedelta(days=DEFAULT_RETENTION_DAYS),
+                   target_rows_per_fragment=DEFAULT_TARGET_ROWS_PER_FRAGMENT):
+    """Compact, prune and re-optimize a single table, returning run stats"""
+    started = time.perf_counter()
+    before = _dataset_stats(table)
+    stats = {"table": table.name, "before": before}
+
+    # Merge small fragments and materialize deletions
+    compaction = table.compact_files(target_rows_per_fragment=target_rows_per_fragment)
+    stats["fragments_removed"] = getattr(compaction, "fragments_removed", None)
+    stats["fragments_added"] = getattr(compaction, "fragments_added", None)
+
+    # Fold new rows into existing vector indexes instead of leaving them unindexed
+    dataset = table.to_lance()
+    stats["indexes_optimized"] = 0
+    if dataset.list_indices():
+        dataset.optimize.optimize_indices()
+        stats["indexes_optimized"] = len(dataset.list_indices())
+
+    # Drop manifests and data files only reachable from old versions
+    cleanup = table.cleanup_old_versions(older_than=retention)
+    stats["versions_removed"] = getattr(cleanup, "old_versions", None)
+    stats["bytes_removed"] = getattr(cleanup, "bytes_removed", None)
+
+    stats["after"] = _dataset_stats(table)
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    return stats
+
+def run_maintenance(db_path="./data", table_names=None,
+                    retention=timedelta(days=DEFAULT_RETENTION_DAYS), rebuild_neighbors=True):
+    """Run maintenance over the given tables (all tables by default)
+
+    Compaction gives a table a new version, which retires its neighbor
+    graph; with rebuild_neighbors a stale graph is rebuilt against it.
+    """
+    import lancedb
+
+    db = lancedb.connect(db_path)
+    if not table_names:
+        table_names = db.table_names()
+
+    results = []
+    for table_name in table_names:
+        try:
+            stats = maintain_table(db.open_table(table_name), retention)
+            if rebuild_neighbors:
+                stats["neighbors_rebuilt"] = refresh_neighbor_table(db, table_name)
+            results.append(stats)
+        except Exception as e:
+            print(f"Maintenance failed for {table_name}: {e}")
+            results.append({"table": table_name, "error": str(e)})
+    return results
+
+def print_stats(results):
+    """Print a short per-table summary of a maintenance run"""
+    for stats in results:
+        if "error" in stats:
+            print(f"  {stats['table']}: failed ({stats['error']})")
+            continue
+        before, after = stats["before"], stats["after"]
+        print(f"  {stats['table']}: fragments {before['fragments']} -> {after['fragments']}, "
+              f"versions {before['versions']} -> {after['versions']}, "
+              f"{stats['bytes_removed'] or 0} bytes freed, "
+              f"{stats['indexes_optimized']} indexes optimized, "
+              f"{stats.get('neighbors_rebuilt') or 0} neighbor rows rebuilt, {stats['seconds']}s")
+
+class MaintenanceScheduler:
+    """Background thread that runs maintenance on a fixed interval"""
+
+    def __init__(self, db_path, interval_seconds, table_names=None,
+                 retention=timedelta(days=DEFAULT_RETENTION_DAYS), rebuild_neighbors=True):
+        self.db_path = db_path
+        self.interval_seconds = interval_seconds
+        self.table_names = table_names
+        self.retention = retention
+        self.rebuild_neighbors = rebuild_neighbors
+        self.last_results = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lance-maintenance", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            print("Running scheduled dataset maintenance...")
+            try:
+                self.last_results = run_maintenance(self.db_path, self.table_names, self.retention,
+                                                    self.rebuild_neighbors)
+            except Exception as e:
+                # Keep the schedule alive; the next run may well succeed
+                print(f"Scheduled maintenance failed: {e}")
+                continue
+            print_stats(self.last_results)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact and prune LanceDB tables")
+    parser.add_argument("--db-path", default="./data")
+    parser.add_argument("--tables", nargs="*", help="Tables to maintain (default: all)")
+    parser.add_argument("--retention-days", type=float, default=DEFAULT_RETENTION_DAYS,
+                        help="Keep versions newer than this many days")
+    parser.add_argument("--no-neighbors", action="store_true",
+                        help="Don't rebuild neighbor graphs left stale by compaction")
+    parser.add_argument("--json", action="store_true", help="Print stats as JSON")
+    args = parser.parse_args()
+
+    results = run_maintenance(args.db_path, args.tables, timedelta(days=args.retention_days),
+                              not args.no_neighbors)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print("Maintenance complete:")
+        print_stats(results)
+
+if __name__ == "__main__":
+    main()
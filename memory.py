@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Memory accounting for the search service
+Splits resident memory into the encoder's weights, Arrow allocations,
+registered caches and the Python heap, so worker and cache sizes can be
+chosen from measurements.
+"""
+
+import gc
+import resource
+import sys
+import tracemalloc
+
+import pyarrow as pa
+
+# name -> object with a stats() method returning {"entries": int, "bytes": int}
+_caches = {}
+
+def register_cache(name, cache):
+    """Make a cache visible to memory reports"""
+    _caches[name] = cache
+    return cache
+
+def cache_stats():
+    """Entry counts and byte sizes of all registered caches"""
+    return {name: cache.stats() for name, cache in _caches.items()}
+
+def process_memory():
+    """Current and peak resident set size in bytes"""
+    rss = None
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss = int(line.split()[1]) * 1024
+                    break
+    except OSError:
+        pass
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak = peak if sys.platform == "darwin" else peak * 1024
+    return {"rss_bytes": rss, "peak_rss_bytes": peak}
+
+def model_memory(model):
+    """Bytes held by a torch model's parameters and buffers"""
+    if model is None:
+        return 0
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+def arrow_memory():
+    """Bytes currently allocated by Arrow's default memory pool"""
+    pool = pa.default_memory_pool()
+    return {
+        "allocated_bytes": pa.total_allocated_bytes(),
+        "peak_bytes": pool.max_memory(),
+        "backend": pool.backend_name,
+    }
+
+def python_heap(top=0):
+    """Python object allocator stats, plus top allocation sites if tracemalloc is on"""
+    heap = {
+        "allocated_blocks": sys.getallocatedblocks(),
+        "gc_tracked_objects": len(gc.get_objects()),
+        "tracemalloc": tracemalloc.is_tracing(),
+    }
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        heap["traced_bytes"] = current
+        heap["traced_peak_bytes"] = peak
+        if top:
+            snapshot = tracemalloc.take_snapshot()
+            heap["top_sites"] = [
+                {"site": str(stat.traceback), "bytes": stat.size, "blocks": stat.count}
+                for stat in snapshot.statistics("lineno")[:top]
+            ]
+    return heap
+
+def memory_report(encoder=None, top=0):
+    """Resident memory broken down by component"""
+    process = process_memory()
+    caches = cache_stats()
+    components = {
+        "encoder_bytes": model_memory(encoder),
+        "arrow": arrow_memory(),
+        "caches": caches,
+        "python_heap": python_heap(top),
+    }
+    # Cache entries live on the Python heap, so count them only when the
+    # heap itself isn't traced
+    heap_bytes = components["python_heap"].get("traced_bytes")
+    if heap_bytes is None:
+        heap_bytes = sum(stats.get("bytes", 0) for stats in caches.values())
+    attributed = components["encoder_bytes"] + components["arrow"]["allocated_bytes"] + heap_bytes
+    report = {"process": process, **components, "attributed_bytes": attributed}
+    if process["rss_bytes"] is not None:
+        report["unattributed_bytes"] = process["rss_bytes"] - attributed
+    return report
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Lightweight per-stage latency instrumentation
+Stages are timed with `stage(name)`, collected per request for the
+Server-Timing header, and aggregated into Prometheus histograms served
+from /metrics. Recording a stage costs two perf_counter calls and one
+locked bucket increment, so it stays on in production.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Seconds; spans sub-millisecond point lookups up to slow cold queries
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    """Prometheus-style cumulative histogram, one series per label set"""
+
+    def __init__(self, name, help_text, label_names, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(key, list(counts), total, count)
+                        for key, (counts, total, count) in sorted(self._series.items())]
+        for key, counts, total, count in snapshot:
+            labels = ",".join(f'{name}="{value}"' for name, value in zip(self.label_names, key))
+            prefix = f"{labels}," if labels else ""
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {count}')
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return "\n".join(lines)
+
+class Counter:
+    """Prometheus counter, one series per label set"""
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            return self._series.get(key, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = sorted(self._series.items())
+        for key, count in snapshot:
+            labels = ",".join(f'{name}="{value}"' for name, value in zip(self.label_names, key))
+            lines.append(f"{self.name}{{{labels}}} {count}" if labels else f"{self.name} {count}")
+        return "\n".join(lines)
+
+class Gauge:
+    """Prometheus gauge whose value is read from a callback at scrape time"""
+
+    def __init__(self, name, help_text, callback):
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+
+    def render(self):
+        return "\n".join([f"# HELP {self.name} {self.help_text}",
+                          f"# TYPE {self.name} gauge",
+                          f"{self.name} {self.callback()}"])
+
+class MetricsRegistry:
+    """Collection of metrics rendered together in Prometheus text format"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, label_names, buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help_text, label_names, buckets))
+
+    def counter(self, name, help_text, label_names):
+        return self.register(Counter(name, help_text, label_names))
+
+    def gauge(self, name, help_text, callback):
+        return self.register(Gauge(name, help_text, callback))
+
+    def render(self):
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+registry = MetricsRegistry()
+STAGE_SECONDS = registry.histogram(
+    "stage_duration_seconds", "Time spent in each stage of request handling", ["endpoint", "stage"])
+REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "End-to-end request latency", ["endpoint", "method", "status"])
+
+# Per-request list of (stage, seconds), set by the timing middleware
+_request_timings = ContextVar("request_timings", default=None)
+_request_endpoint = ContextVar("request_endpoint", default="")
+
+def start_request(endpoint):
+    """Begin collecting stage timings for the current request"""
+    timings = []
+    _request_timings.set(timings)
+    _request_endpoint.set(endpoint)
+    return timings
+
+def current_timings():
+    """Stage timings recorded so far for the current request, if any"""
+    return _request_timings.get()
+
+def record_stage(name, seconds):
+    """Record a stage duration measured elsewhere"""
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+    STAGE_SECONDS.observe(seconds, endpoint=_request_endpoint.get(), stage=name)
+
+@contextmanager
+def stage(name):
+    """Time a block as a named stage of the current request"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+def stage_totals(timings):
+    """Sum timings per stage name, in first-seen order"""
+    durations = {}
+    for name, seconds in timings:
+        durations[name] = durations.get(name, 0.0) + seconds
+    return durations
+
+def server_timing_header(timings, total=None):
+    """Format stage timings as a Server-Timing header value (durations in ms)"""
+    durations = stage_totals(timings)
+    if total is not None:
+        durations["total"] = total
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in durations.items())
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Precomputed k-nearest-neighbor graph for related items
+Computes exact top-k neighbors of every article from the stored `vector`
+column with blocked matrix multiplies, and writes them to a compact
+neighbor table tagged with the catalog version it was built from. The API
+serves related items from it with a single point read while that version
+is current, and falls back to a live vector search otherwise (counted in
+`neighbor_graph_fallbacks_total`). Scheduled maintenance rebuilds a stale
+graph after compacting the catalog.
+
+Usage:
+    python neighbor_graph.py                   # hm_mini, 50 neighbors
+    python neighbor_graph.py --k 20 --workers 4
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pyarrow as pa
+
+from config import Config
+from image_embeddings import TEXT_VECTOR_COLUMN
+from metrics import registry
+from table_ops import KEY_COLUMN, ensure_key_index, vectors_to_numpy
+
+DEFAULT_K = 50
+# Upper bound on one block's distance matrix; each worker holds one at a time
+BLOCK_BYTES = 64 * 1024 * 1024
+
+NEIGHBOR_FALLBACKS = registry.counter(
+    "neighbor_graph_fallbacks_total",
+    "Unfiltered /similar requests answered by a live search instead of the neighbor graph",
+    ["reason"])
+
+def neighbor_table_name(table_name):
+    """Name of the neighbor table built from a catalog table"""
+    return f"{table_name}_neighbors"
+
+def topk_neighbors(vectors, k, block_size=None, workers=1):
+    """Exact top-k L2 neighbors of every row, excluding the row itself
+
+    Returns (indices, distances), both shaped (rows, k) and sorted nearest
+    first. Query rows are processed in blocks so only a block-by-catalog
+    distance matrix is ever materialized.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    rows = len(vectors)
+    k = min(k, rows - 1)
+    if k <= 0:
+        return np.empty((rows, 0), dtype=np.int32), np.empty((rows, 0), dtype=np.float32)
+    block_size = block_size or max(1, BLOCK_BYTES // (rows * 4))
+    norms = np.einsum("ij,ij->i", vectors, vectors)
+    indices = np.empty((rows, k), dtype=np.int32)
+    distances = np.empty((rows, k), dtype=np.float32)
+
+    def run_block(start):
+        stop = min(start + block_size, rows)
+        # Squared L2 via |a|^2 - 2ab + |b|^2, which ranks identically to L2
+        dist = vectors[start:stop] @ vectors.T
+        dist *= -2.0
+        dist += norms[start:stop, None]
+        dist += norms[None, :]
+        dist[np.arange(stop - start), np.arange(start, stop)] = np.inf
+        nearest = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        nearest_dist = np.take_along_axis(dist, nearest, axis=1)
+        order = np.argsort(nearest_dist, axis=1)
+        indices[start:stop] = np.take_along_axis(nearest, order, axis=1)
+        distances[start:stop] = np.sqrt(np.maximum(np.take_along_axis(nearest_dist, order, axis=1), 0))
+
+    # NumPy releases the GIL inside matmul, so blocks run in parallel threads
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(run_block, range(0, rows, block_size)))
+    return indices, distances
+
+def neighbor_records(article_ids, indices, distances, source_version):
+    """Arrow table of neighbor ids and distances per article"""
+    article_ids = np.asarray(article_ids, dtype=object)
+    k = indices.shape[1]
+    offsets = pa.array(np.arange(0, len(indices) * k + 1, k, dtype=np.int32))
+    neighbor_ids = pa.ListArray.from_arrays(offsets, pa.array(article_ids[indices.ravel()], pa.string()))
+    neighbor_distances = pa.ListArray.from_arrays(offsets, pa.array(distances.ravel(), pa.float32()))
+    return pa.table({
+        KEY_COLUMN: pa.array(article_ids, pa.string()),
+        "neighbor_ids": neighbor_ids,
+        "distances": neighbor_distances,
+        "source_version": pa.array(np.full(len(indices), source_version, dtype=np.int64)),
+    })
+
+def build_neighbor_table(db, table_name, k=DEFAULT_K, column=TEXT_VECTOR_COLUMN,
+                         block_size=None, workers=1):
+    """Compute the neighbor graph for a table and overwrite its neighbor table"""
+    dataset = db.open_table(table_name).to_lance()
+    # Read a fixed version so the tag matches exactly the vectors used
+    source_version = dataset.version
+    data = dataset.to_table(columns=[KEY_COLUMN, column])
+    vectors = vectors_to_numpy(data.column(column))
+    article_ids = data.column(KEY_COLUMN).to_pylist()
+    print(f"Computing top-{k} neighbors for {len(article_ids)} articles "
+          f"(version {source_version})...")
+
+    started = time.perf_counter()
+    indices, distances = topk_neighbors(vectors, k, block_size, workers)
+    print(f"Computed neighbors in {time.perf_counter() - started:.1f}s")
+
+    records = neighbor_records(article_ids, indices, distances, source_version)
+    name = neighbor_table_name(table_name)
+    # /similar reads one article's row per request
+    ensure_key_index(db.create_table(name, data=records, mode="overwrite"))
+    print(f"Wrote {records.num_rows} rows to {name}")
+    return records.num_rows
+
+def neighbor_graph_state(db, table_name):
+    """(source_version, k) of a table's neighbor graph, or None if it hasn't been built"""
+    name = neighbor_table_name(table_name)
+    if name not in db.table_names():
+        return None
+    head = db.open_table(name).to_lance().to_table(columns=["neighbor_ids", "source_version"], limit=1)
+    if head.num_rows == 0:
+        return None
+    return head.column("source_version")[0].as_py(), len(head.column("neighbor_ids")[0])
+
+def refresh_neighbor_table(db, table_name, column=TEXT_VECTOR_COLUMN, workers=1):
+    """Rebuild a table's neighbor graph, with the same k, if it was built from another version
+
+    Returns the number of rows written, 0 if the graph is current or was never built.
+    """
+    state = neighbor_graph_state(db, table_name)
+    if state is None:
+        return 0
+    source_version, k = state
+    if source_version == db.open_table(table_name).to_lance().version:
+        return 0
+    return build_neighbor_table(db, table_name, k, column, workers=workers)
+
+def main():
+    import lancedb
+
+    parser = argparse.ArgumentParser(description="Precompute related items for every article")
+    parser.add_argument("--db-path", default=Config.LANCEDB_PATH)
+    parser.add_argument("--table", default=Config.TABLE_NAME)
+    parser.add_argument("--k", type=int, default=DEFAULT_K)
+    parser.add_argument("--block-size", type=int,
+                        help="Query rows per block (default: sized to a 64 MB distance matrix)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Blocks computed concurrently (0 = one per core); useful when BLAS is single threaded")
+    args = parser.parse_args()
+
+    db = lancedb.connect(args.db_path)
+    build_neighbor_table(db, args.table, args.k, block_size=args.block_size,
+                         workers=args.workers or os.cpu_count())
+
+if __name__ == "__main__":
+    main()
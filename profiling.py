@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Slow-query log and sampling profiler for the search path
+Requests slower than a threshold are appended to a JSONL log with their
+parameters and stage timings. A fraction of requests can also be profiled
+by a background thread that samples the threadpool workers running the
+request's stages, and writes folded stacks (flamegraph.pl / speedscope
+compatible). The event-loop thread is shared by every in-flight request,
+so it is not sampled; work done directly on the loop doesn't appear.
+"""
+
+import functools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Sampler of the request being profiled, if any; copied into threadpool calls
+_active_sampler = ContextVar("active_sampler", default=None)
+
+class SlowQueryLog:
+    """Appends requests over a latency threshold to a JSONL file
+
+    The append runs on a single background thread, in order, so a slow
+    disk never blocks the event loop.
+    """
+
+    def __init__(self, path, threshold_ms):
+        self.path = path
+        self.threshold_ms = threshold_ms
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-log")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def record(self, elapsed_seconds, **fields):
+        """Log the request if it was slow; returns True if it was logged"""
+        elapsed_ms = elapsed_seconds * 1000
+        if self.threshold_ms is None or elapsed_ms < self.threshold_ms:
+            return False
+        entry = {"timestamp": time.time(), "elapsed_ms": round(elapsed_ms, 2), **fields}
+        self._writer.submit(self._write, json.dumps(entry, default=str))
+        print(f"Slow query ({elapsed_ms:.0f} ms): {fields.get('query')!r}")
+        return True
+
+    def _write(self, line):
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            print(f"Slow query log write failed: {e}")
+
+    def flush(self):
+        """Wait until every recorded entry is on disk"""
+        self._writer.submit(lambda: None).result()
+
+class StackSampler:
+    """Samples the Python stacks of a set of threads at a fixed interval
+
+    Only stacks passing through a frame from `focus_file` are kept, so
+    idle threadpool samples don't drown out the code path of interest.
+    """
+
+    def __init__(self, thread_ids, interval_seconds, focus_file=None):
+        self.thread_ids = set(thread_ids)
+        self._threads_lock = threading.Lock()
+        self.interval_seconds = interval_seconds
+        self.focus_file = os.path.abspath(focus_file) if focus_file else None
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _stack(self, frame):
+        names = []
+        focus_depth = None
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+            if self.focus_file and os.path.abspath(code.co_filename) == self.focus_file:
+                focus_depth = len(names)
+            frame = frame.f_back
+        if self.focus_file:
+            if focus_depth is None:
+                return None
+            # Drop the server/event-loop frames above the outermost focus frame
+            names = names[:focus_depth]
+        return ";".join(reversed(names))
+
+    def add_thread(self, thread_id):
+        with self._threads_lock:
+            self.thread_ids.add(thread_id)
+
+    def remove_thread(self, thread_id):
+        with self._threads_lock:
+            self.thread_ids.discard(thread_id)
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            frames = sys._current_frames()
+            with self._threads_lock:
+                thread_ids = list(self.thread_ids)
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                stack = self._stack(frame) if frame is not None else None
+                if stack:
+                    self.counts[stack] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.counts
+
+def sampled(fn):
+    """Wrap fn so that, in a profiled request, the thread running it is sampled
+
+    Use for work handed to a threadpool (which copies the request's
+    context), so encoding and queries show up in the request's profile.
+    """
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        sampler = _active_sampler.get()
+        thread_id = threading.get_ident()
+        if sampler is None or thread_id in sampler.thread_ids:
+            return fn(*args, **kwargs)
+        sampler.add_thread(thread_id)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            sampler.remove_thread(thread_id)
+    return run
+
+def write_folded(counts, path):
+    """Write stack counts in folded format: 'frame;frame;frame count'"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in counts.most_common():
+            f.write(f"{stack} {count}\n")
+
+class RequestProfiler:
+    """Attaches a StackSampler to a random fraction of requests"""
+
+    def __init__(self, sample_rate, output_dir, interval_ms=5, focus_file=None):
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir
+        self.interval_seconds = interval_ms / 1000
+        self.focus_file = focus_file
+
+    @contextmanager
+    def profile(self, name):
+        """Profile the enclosed block if sampled; yields the output path or None"""
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            yield None
+            return
+        path = os.path.join(self.output_dir, f"{name}-{time.time_ns()}.folded")
+        # Only threads running this request's sampled() work are added; the
+        # loop thread would mix in the frames of concurrent requests
+        sampler = StackSampler((), self.interval_seconds, self.focus_file)
+        sampler.start()
+        token = _active_sampler.set(sampler)
+        try:
+            yield path
+        finally:
+            _active_sampler.reset(token)
+            counts = sampler.stop()
+            if counts:
+                write_folded(counts, path)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+PCA-reduced first-stage vectors
+A PCA projection of the 512-d `vector` column is stored as a second, much
+smaller column. Searches scan the small column for a candidate pool and
+rerank the candidates with their full vectors, so most of the scan reads a
+quarter of the bytes. Each projection is saved under its own fingerprint,
+and the reduced column's field metadata names the fingerprint it was
+written with, so a reader always pairs the data with the right projection.
+
+Usage:
+    python reduced_vectors.py --dims 128       # train and write the column
+"""
+
+import argparse
+import hashlib
+import os
+
+import numpy as np
+import pyarrow as pa
+
+from config import Config
+from image_embeddings import TEXT_VECTOR_COLUMN
+from table_ops import KEY_COLUMN, vectors_to_numpy
+
+REDUCED_VECTOR_COLUMN = "vector_reduced"
+DEFAULT_SAMPLE_ROWS = 50000
+
+# Field metadata key on the reduced column holding the projection fingerprint
+FINGERPRINT_KEY = b"pca_fingerprint"
+
+def pca_path(db_path, table_name, fingerprint):
+    """Where a projection trained for a table is stored"""
+    return os.path.join(db_path, f".pca_{table_name}_{fingerprint}.npz")
+
+def projection_fingerprint(schema):
+    """Fingerprint of the projection a table's reduced column was written with, or None"""
+    if REDUCED_VECTOR_COLUMN not in schema.names:
+        return None
+    value = (schema.field(REDUCED_VECTOR_COLUMN).metadata or {}).get(FINGERPRINT_KEY)
+    return value.decode("utf-8") if value else None
+
+def load_table_projection(schema, db_path, table_name):
+    """The projection a table's reduced column was written with, or None if unknown"""
+    fingerprint = projection_fingerprint(schema)
+    if fingerprint is None:
+        return None
+    path = pca_path(db_path, table_name, fingerprint)
+    return PCAProjection.load(path) if os.path.exists(path) else None
+
+class PCAProjection:
+    """Mean-centered projection onto the top principal components"""
+
+    def __init__(self, mean, components, explained_variance_ratio=None):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)
+        self.explained_variance_ratio = explained_variance_ratio
+
+    @classmethod
+    def fit(cls, vectors, dims):
+        vectors = np.asarray(vectors, dtype=np.float64)
+        mean = vectors.mean(axis=0)
+        centered = vectors - mean
+        covariance = centered.T @ centered / max(len(vectors) - 1, 1)
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+        top = np.argsort(eigenvalues)[::-1][:dims]
+        ratio = float(eigenvalues[top].sum() / eigenvalues.sum())
+        return cls(mean, eigenvectors[:, top].T, ratio)
+
+    @property
+    def dims(self):
+        return len(self.components)
+
+    @property
+    def fingerprint(self):
+        """Content hash identifying this projection"""
+        digest = hashlib.sha1(self.mean.tobytes())
+        digest.update(self.components.tobytes())
+        return digest.hexdigest()[:16]
+
+    def transform(self, vectors):
+        """Project one vector or a matrix of row vectors"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return (vectors - self.mean) @ self.components.T
+
+    def save(self, path):
+        np.savez(path, mean=self.mean, components=self.components,
+                 explained_variance_ratio=self.explained_variance_ratio)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data["mean"], data["components"], float(data["explained_variance_ratio"]))
+
+def rerank(candidates, query_vector, limit, column=TEXT_VECTOR_COLUMN):
+    """Reorder a candidate DataFrame by exact L2 distance on its full vectors"""
+    if candidates.empty:
+        return candidates
+    full = np.stack(candidates[column].to_numpy()).astype(np.float32, copy=False)
+    distances = np.linalg.norm(full - np.asarray(query_vector, dtype=np.float32), axis=1)
+    order = np.argsort(distances, kind="stable")[:limit]
+    return candidates.iloc[order].assign(_distance=distances[order]).reset_index(drop=True)
+
+def sample_vectors(dataset, column, count, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = dataset.count_rows()
+    indices = np.sort(rng.choice(rows, size=min(count, rows), replace=False))
+    return vectors_to_numpy(dataset.take(indices, columns=[column]).column(column))
+
+def add_reduced_vectors(db, table_name, dims=Config.REDUCED_DIMS, sample_rows=DEFAULT_SAMPLE_ROWS,
+                        db_path=Config.LANCEDB_PATH):
+    """Train a projection on a sample of the table and store every item's reduced vector"""
+    table = db.open_table(table_name)
+    dataset = table.to_lance()
+    projection = PCAProjection.fit(sample_vectors(dataset, TEXT_VECTOR_COLUMN, sample_rows), dims)
+    print(f"PCA to {dims} dims keeps {projection.explained_variance_ratio:.1%} of the variance")
+
+    ids, reduced = [], []
+    for batch in dataset.to_batches(columns=[KEY_COLUMN, TEXT_VECTOR_COLUMN]):
+        ids.extend(batch.column(KEY_COLUMN).to_pylist())
+        reduced.append(projection.transform(vectors_to_numpy(batch.column(TEXT_VECTOR_COLUMN))))
+    reduced = np.concatenate(reduced) if reduced else np.empty((0, dims), dtype=np.float32)
+    column = pa.FixedSizeListArray.from_arrays(pa.array(reduced.ravel(), pa.float32()), dims)
+    field = pa.field(REDUCED_VECTOR_COLUMN, column.type,
+                     metadata={FINGERPRINT_KEY: projection.fingerprint.encode("utf-8")})
+
+    # Saved before the column is committed, so no version references a missing file
+    previous = projection_fingerprint(table.schema)
+    projection.save(pca_path(db_path, table_name, projection.fingerprint))
+    if REDUCED_VECTOR_COLUMN in table.schema.names:
+        # Retrained: drop only the old column; other columns and their
+        # indexes are untouched. Readers see no reduced column until the
+        # merge below commits, and fall back to full-vector search meanwhile.
+        dataset.drop_columns([REDUCED_VECTOR_COLUMN])
+        dataset = table.to_lance()
+    # Written as new files next to the existing fragments
+    dataset.merge(pa.Table.from_arrays([pa.array(ids, pa.string()), column],
+                                       schema=pa.schema([pa.field(KEY_COLUMN, pa.string()), field])),
+                  left_on=KEY_COLUMN)
+    remove_stale_projections(db_path, table_name, keep={projection.fingerprint, previous})
+    print(f"Wrote {len(ids)} reduced vectors to {table_name}.{REDUCED_VECTOR_COLUMN}")
+    return projection
+
+def remove_stale_projections(db_path, table_name, keep):
+    """Delete saved projections other than those in keep
+
+    The one being replaced is kept so readers still on the old version
+    can finish with it.
+    """
+    prefix = f".pca_{table_name}_"
+    for name in os.listdir(db_path):
+        fingerprint = name[len(prefix):-len(".npz")]
+        if name.startswith(prefix) and name.endswith(".npz") and fingerprint not in keep:
+            os.remove(os.path.join(db_path, name))
+
+def main():
+    import lancedb
+
+    parser = argparse.ArgumentParser(description="Train PCA and store reduced first-stage vectors")
+    parser.add_argument("--db-path", default=Config.LANCEDB_PATH)
+    parser.add_argument("--table", default=Config.TABLE_NAME)
+    parser.add_argument("--dims", type=int, default=Config.REDUCED_DIMS)
+    parser.add_argument("--sample", type=int, default=DEFAULT_SAMPLE_ROWS,
+                        help="Rows sampled to train the projection")
+    args = parser.parse_args()
+
+    db = lancedb.connect(args.db_path)
+    add_reduced_vectors(db, args.table, args.dims, args.sample, args.db_path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""
+Search targets: which vector columns a query is matched against
+`text` and `image` search one column each; `both` searches the two and
+merges the ranked lists with reciprocal rank fusion.
+"""
+
+import pandas as pd
+from fastapi import HTTPException
+
+def check_target(target, targets, has_image_vectors):
+    """400 for unknown targets, and for image targets on tables without image vectors"""
+    if target not in targets:
+        raise HTTPException(status_code=400, detail=f"Unknown search target: {target}")
+    if target != "text" and not has_image_vectors:
+        raise HTTPException(status_code=400, detail="Table has no image vectors; re-run the image loader")
+
+def fuse_results(frames, limit, k):
+    """Merge ranked result lists with reciprocal rank fusion
+
+    An item scores 1 / (k + rank) in each list it appears in, summed over
+    lists; equal scores keep the order of the first list they came from.
+    """
+    ranked = []
+    for frame in frames:
+        frame = frame.reset_index(drop=True)
+        ranked.append(frame.assign(_rrf=1.0 / (k + frame.index + 1)))
+    merged = pd.concat(ranked, ignore_index=True)
+    merged['_rrf'] = merged.groupby('article_id')['_rrf'].transform('sum')
+    merged = merged.sort_values('_rrf', ascending=False, kind='stable')
+    return merged.drop_duplicates('article_id').head(limit)
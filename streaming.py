@@ -0,0 +1,38 @@
+"""
+Framing for streamed search results
+Turns record batches into NDJSON lines or the chunks of one JSON array,
+keeping the output well-formed even when the scan fails part way.
+"""
+
+import json
+
+def frame_results(batches, convert, fmt="ndjson"):
+    """Yield serialized chunks for an iterable of Arrow record batches
+
+    convert(row) turns one row dict into a JSON-serializable result. If the
+    batches raise mid-stream, the response is already under way, so the
+    failure is sent as a final {"error": ...} record (inside the array for
+    format=json) instead of cutting the body off.
+    """
+    first = True
+    if fmt == "json":
+        yield "["
+    try:
+        for batch in batches:
+            lines = [json.dumps(convert(row)) for row in batch.to_pylist()]
+            if not lines:
+                continue
+            if fmt == "json":
+                yield ("" if first else ",") + ",".join(lines)
+            else:
+                yield "\n".join(lines) + "\n"
+            first = False
+    except Exception as e:
+        print(f"Search stream failed: {e}")
+        error = json.dumps({"error": f"Search error: {e}"})
+        if fmt == "json":
+            yield ("" if first else ",") + error
+        else:
+            yield error + "\n"
+    if fmt == "json":
+        yield "]"
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Typeahead suggestions for the search box
+A trie over product names, product types, colors and popular past queries.
+Every node keeps its top completions by frequency, precomputed at build
+time, so a lookup is one walk down the prefix with no ranking work.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from collections import Counter
+
+DEFAULT_TOP_K = 10
+# Past queries searched fewer times than this are never suggested to others
+DEFAULT_MIN_QUERY_COUNT = 3
+DEFAULT_LOG_MAX_BYTES = 16 * 1024 * 1024
+
+def normalize(text):
+    """Lowercase and collapse whitespace so lookups ignore case and spacing"""
+    return " ".join(str(text).lower().split())
+
+class PrefixIndex:
+    """Trie mapping any word-start prefix of a term to its top terms by count"""
+
+    def __init__(self, entries, top_k=DEFAULT_TOP_K):
+        """entries: iterable of (text, kind, count)"""
+        self.top_k = top_k
+        self._root = {}
+        merged = {}
+        for text, kind, count in entries:
+            key = normalize(text)
+            if not key:
+                continue
+            if key in merged:
+                merged[key]["count"] += count
+            else:
+                merged[key] = {"text": str(text).strip(), "kind": kind, "count": count}
+        self.suggestions = sorted(merged.values(), key=lambda s: (-s["count"], s["text"]))
+        # Inserting in descending count order means each node's top list is
+        # filled with its best completions first and never needs re-sorting
+        for position, suggestion in enumerate(self.suggestions):
+            words = normalize(suggestion["text"]).split(" ")
+            for start in range(len(words)):
+                self._insert(" ".join(words[start:]), position)
+
+    def _insert(self, key, position):
+        node = self._root
+        for char in key:
+            node = node.setdefault(char, {"": []})
+            top = node[""]
+            # A term reached through several of its words is listed once
+            if len(top) < self.top_k and (not top or top[-1] != position):
+                top.append(position)
+
+    def lookup(self, prefix, limit=DEFAULT_TOP_K):
+        """Top suggestions whose text, or one of its words, starts with prefix"""
+        node = self._root
+        for char in normalize(prefix):
+            node = node.get(char)
+            if node is None:
+                return []
+        return [self.suggestions[position] for position in node.get("", [])[:limit]]
+
+    def __len__(self):
+        return len(self.suggestions)
+
+class QueryLog:
+    """JSONL log of search queries, used to rank suggestions and warm caches
+
+    record() only queues the entry; a background thread appends it, so the
+    request path never touches the file. When the file passes max_bytes it
+    is rotated to `<path>.1`, replacing the previous backup, so the log and
+    the cost of reading it stay bounded.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_LOG_MAX_BYTES, queue_size=10000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._writer = None
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def record(self, query, **fields):
+        if not query:
+            return
+        try:
+            self._queue.put_nowait({"timestamp": time.time(), "query": query, **fields})
+        except queue.Full:
+            # Losing a log line beats stalling a search
+            self.dropped += 1
+            return
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._run, name="query-log", daemon=True)
+                    self._writer.start()
+
+    def _run(self):
+        while True:
+            entries = [self._queue.get()]
+            while not self._queue.empty():
+                entries.append(self._queue.get_nowait())
+            try:
+                self._write(entries)
+            except OSError as e:
+                print(f"Query log write failed: {e}")
+            finally:
+                for _ in entries:
+                    self._queue.task_done()
+
+    def _write(self, entries):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(entry) + "\n" for entry in entries))
+            size = f.tell()
+        if size >= self.max_bytes:
+            os.replace(self.path, self.path + ".1")
+
+    def flush(self):
+        """Wait until every recorded entry is on disk"""
+        self._queue.join()
+
+    def entries(self):
+        """Logged searches, oldest first, from the backup and current file"""
+        self.flush()
+        for path in (self.path + ".1", self.path):
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry.get("query"):
+                        yield entry
+
+    def counts(self):
+        """How often each query was searched, case-insensitively"""
+        return Counter(normalize(entry["query"]) for entry in self.entries())
+
+    def top_requests(self, n, default_limit=20):
+        """The n most repeated searches, with their filters, limit and target"""
+        counts = Counter()
+        for entry in self.entries():
+            counts[(entry["query"], tuple(entry.get("groups") or ()), tuple(entry.get("items") or ()),
+                    entry.get("limit", default_limit), entry.get("target", "text"))] += 1
+        return [{"query": query, "groups": list(groups), "items": list(items),
+                 "limit": limit, "target": target}
+                for (query, groups, items, limit, target), _ in counts.most_common(n)]
+
+def build_prefix_index(catalog_df, query_counts=None, top_k=DEFAULT_TOP_K,
+                       min_query_count=DEFAULT_MIN_QUERY_COUNT):
+    """Index catalog field values (by item count) and past queries (by search count)
+
+    Queries searched fewer than min_query_count times are left out, so one
+    user's search is never shown to everyone.
+    """
+    entries = []
+    for column in ("prod_name", "product_type_name", "color"):
+        if column in catalog_df.columns:
+            for text, count in catalog_df[column].dropna().value_counts().items():
+                entries.append((text, column, int(count)))
+    for query, count in (query_counts or {}).items():
+        if count >= min_query_count:
+            entries.append((query, "query", count))
+    return PrefixIndex(entries, top_k)
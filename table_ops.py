@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Incremental table operations for the LanceDB catalog
+Rows are keyed by article_id, so updates and deletes only rewrite the
+fragments that hold the affected articles instead of the whole dataset.
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+KEY_COLUMN = "article_id"
+
+def quote_literal(value):
+    """Quote a value as a SQL string literal for LanceDB filters"""
+    return "'" + str(value).replace("'", "''") + "'"
+
+def article_filter(article_ids, key=KEY_COLUMN):
+    """Build an IN filter matching the given article ids"""
+    ids = [quote_literal(article_id) for article_id in article_ids]
+    return f"{key} IN ({', '.join(ids)})"
+
+def column_type(series):
+    """Arrow type for a DataFrame column; lists of numbers become float32 vectors"""
+    values = series.dropna()
+    if len(values) and isinstance(values.iloc[0], (list, tuple, np.ndarray)):
+        return pa.list_(pa.float32(), len(values.iloc[0]))
+    arrow_type = pa.Array.from_pandas(series).type
+    return pa.string() if pa.types.is_large_string(arrow_type) else arrow_type
+
+def add_missing_columns(table, data_df, key=KEY_COLUMN):
+    """Add data_df's columns that the table lacks, null for every existing row
+
+    The new columns are written as files next to the existing fragments
+    and committed as one new version; no existing row or value changes.
+    Returns the names of the added columns.
+    """
+    missing = [c for c in data_df.columns if c not in table.schema.names]
+    if not missing:
+        return []
+    dataset = table.to_lance()
+    keys = dataset.to_table(columns=[key]).column(key)
+    columns = {key: keys}
+    for column in missing:
+        columns[column] = pa.nulls(len(keys), column_type(data_df[column]))
+    dataset.merge(pa.table(columns), left_on=key)
+    return missing
+
+def open_or_create_table(db, table_name, data_df, key=KEY_COLUMN):
+    """Open an existing table, or create it from data_df if it doesn't exist
+
+    Columns of data_df that the existing table lacks are added in place
+    (see add_missing_columns), so the table is never replaced by the
+    caller's rows. Returns a (table, created) tuple.
+    """
+    if table_name not in db.table_names():
+        table = db.create_table(table_name, data_df)
+        ensure_key_index(table, key)
+        return table, True
+    table = db.open_table(table_name)
+    added = add_missing_columns(table, data_df, key)
+    if added:
+        print(f"Added columns {added} to {table_name}")
+        table = db.open_table(table_name)
+    return table, False
+
+def ensure_key_index(table, key=KEY_COLUMN):
+    """Build a BTREE scalar index on the key column unless one exists
+
+    Without it every keyed lookup or delete scans the whole key column;
+    with it a lookup reads only the pages holding the matching keys. Rows
+    appended later are scanned until maintenance folds them into the index.
+    Returns True if an index was created.
+    """
+    for index in table.to_lance().list_indices():
+        if key in index.get("fields", []):
+            return False
+    table.create_scalar_index(key)
+    return True
+
+def fetch_items(table, article_ids, columns=None, key=KEY_COLUMN):
+    """Fetch full rows for the given article ids, without a row limit
+
+    A filtered scan: cheap with a scalar index on the key column (see
+    ensure_key_index), a full read of that column without one.
+    """
+    article_ids = list(article_ids)
+    if not article_ids:
+        return None
+    dataset = table.to_lance()
+    return dataset.to_table(columns=columns, filter=article_filter(article_ids, key)).to_pandas()
+
+def vectors_to_numpy(array):
+    """Convert an Arrow fixed-size-list vector column into a float32 matrix"""
+    if hasattr(array, "combine_chunks"):
+        array = array.combine_chunks()
+    return array.flatten().to_numpy().reshape(len(array), -1).astype(np.float32, copy=False)
+
+def fill_missing_columns(table, data_df, key=KEY_COLUMN):
+    """Fill table columns that data_df lacks from the stored rows with the same key"""
+    missing = [c for c in table.schema.names if c not in data_df.columns]
+    if not missing:
+        return data_df
+    stored = fetch_items(table, data_df[key].tolist(), columns=[key] + missing, key=key)
+    if stored is None or stored.empty:
+        stored = pd.DataFrame(columns=[key] + missing)
+    return data_df.merge(stored, on=key, how="left")
+
+def upsert_items(table, data_df, key=KEY_COLUMN):
+    """Insert new rows and replace existing rows matched on the key column
+
+    Table columns missing from data_df keep their stored values for
+    existing rows and are null for new ones. Only fragments containing matched rows are rewritten, and the table
+    stays readable throughout.
+    """
+    if data_df is None or data_df.empty:
+        return 0
+    data_df = data_df.drop_duplicates(subset=[key], keep="last")
+    data_df = fill_missing_columns(table, data_df, key)[table.schema.names]
+
+    if hasattr(table, "merge_insert"):
+        # Single atomic commit on LanceDB versions that support it
+        (table.merge_insert(key)
+            .when_matched_update_all()
+            .when_not_matched_insert_all()
+            .execute(data_df))
+    else:
+        # Deletion vectors on the affected fragments, then one appended fragment
+        table.delete(article_filter(data_df[key].tolist(), key))
+        table.add(data_df)
+    return len(data_df)
+
+def delete_items(table, article_ids, key=KEY_COLUMN):
+    """Delete rows by article id, returning how many rows were removed"""
+    article_ids = list(article_ids)
+    if not article_ids:
+        return 0
+    before = table.to_lance().count_rows()
+    table.delete(article_filter(article_ids, key))
+    return before - table.to_lance().count_rows()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for admission control
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from admission import AdmissionLimiter, Overloaded
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+def test_waiters_are_admitted_in_order_as_slots_free():
+    async def scenario():
+        limiter = AdmissionLimiter("encode", limit=1, max_queue=2)
+        order = []
+        
+        async def job(name, hold):
+            async with limiter.slot(time.monotonic() + 5):
+                order.append(name)
+                await asyncio.sleep(hold)
+        
+        tasks = [asyncio.create_task(job(name, 0.01)) for name in "abc"]
+        await asyncio.sleep(0)
+        assert (limiter.active, limiter.queued) == (1, 2)
+        await asyncio.gather(*tasks)
+        return order, limiter
+    
+    order, limiter = run(scenario())
+    assert order == ["a", "b", "c"]
+    assert (limiter.active, limiter.queued) == (0, 0)
+
+def test_full_queue_is_rejected_immediately():
+    async def scenario():
+        limiter = AdmissionLimiter("query", limit=1, max_queue=1, retry_after=3)
+        await limiter.acquire(time.monotonic() + 5)
+        waiting = asyncio.create_task(limiter.acquire(time.monotonic() + 5))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as excinfo:
+            await limiter.acquire(time.monotonic() + 5)
+        limiter.release()
+        await waiting
+        return excinfo.value, limiter
+    
+    error, limiter = run(scenario())
+    assert (error.stage, error.reason, error.retry_after) == ("query", "queue_full", 3)
+    assert limiter.active == 1
+
+def test_waiter_gives_up_at_its_deadline():
+    async def scenario():
+        limiter = AdmissionLimiter("encode", limit=1, max_queue=4)
+        await limiter.acquire(time.monotonic() + 5)
+        with pytest.raises(Overloaded) as excinfo:
+            await limiter.acquire(time.monotonic() + 0.01)
+        assert limiter.queued == 0
+        limiter.release()
+        # The expired waiter must not have kept or leaked the slot
+        await limiter.acquire(time.monotonic())
+        return excinfo.value, limiter
+    
+    error, limiter = run(scenario())
+    assert error.reason == "deadline"
+    assert limiter.active == 1
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        limiter = AdmissionLimiter("encode", limit=1, max_queue=4)
+        await limiter.acquire(time.monotonic() + 5)
+        waiting = asyncio.create_task(limiter.acquire(time.monotonic() + 5))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        assert limiter.queued == 0
+        limiter.release()
+        return limiter
+    
+    assert run(scenario()).active == 0
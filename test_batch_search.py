@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Tests for batch search requests
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from batch_search import BatchSearchSpec, run_batch, validate_batch
+
+TARGETS = {"text": ["vector"], "image": ["image_vector"], "both": ["vector", "image_vector"]}
+
+def specs(*queries):
+    return [BatchSearchSpec(id=f"r{i}", query=query) for i, query in enumerate(queries)]
+
+def test_results_are_keyed_by_request_id_and_texts_encoded_once():
+    batch = specs("dress", "", "shirt", "dress")
+    encoded = []
+
+    async def encode(texts):
+        encoded.append(texts)
+        return [[float(len(text))] for text in texts]
+
+    async def search(spec, vector):
+        return {"query": spec.query, "vector": vector}
+
+    results = asyncio.run(run_batch(batch, encode, search, concurrency=2))
+
+    assert encoded == [["dress", "shirt"]]
+    assert results == {
+        "r0": {"query": "dress", "vector": [5.0]},
+        "r1": {"query": "", "vector": None},
+        "r2": {"query": "shirt", "vector": [5.0]},
+        "r3": {"query": "dress", "vector": [5.0]},
+    }
+
+def test_filter_only_batches_skip_the_encoder():
+    async def encode(texts):
+        raise AssertionError("nothing to encode")
+
+    async def search(spec, vector):
+        return vector
+
+    assert asyncio.run(run_batch(specs("", ""), encode, search, concurrency=1)) == {"r0": None, "r1": None}
+
+def test_duplicate_ids_are_rejected():
+    batch = [BatchSearchSpec(id="a", query="dress"), BatchSearchSpec(id="a", query="shirt")]
+    with pytest.raises(HTTPException) as excinfo:
+        validate_batch(batch, 10, TARGETS, has_image_vectors=True)
+    assert excinfo.value.status_code == 400
+    assert "unique" in excinfo.value.detail
+
+def test_too_many_requests_are_rejected():
+    with pytest.raises(HTTPException) as excinfo:
+        validate_batch(specs("a", "b", "c"), 2, TARGETS, has_image_vectors=True)
+    assert excinfo.value.status_code == 400
+    assert excinfo.value.detail == "At most 2 requests per batch"
+
+def test_targets_are_checked_and_queries_stripped():
+    batch = specs("  dress  ")
+    validate_batch(batch, 10, TARGETS, has_image_vectors=False)
+    assert batch[0].query == "dress"
+
+    for target, has_image_vectors in (("sketch", True), ("image", False)):
+        with pytest.raises(HTTPException) as excinfo:
+            validate_batch([BatchSearchSpec(id="a", target=target)], 10, TARGETS, has_image_vectors)
+        assert excinfo.value.status_code == 400
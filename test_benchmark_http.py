@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Tests for the HTTP benchmark report
+"""
+
+from benchmark_http import print_summary, relative_change
+
+def stats(p50, p99):
+    return {"requests": 10, "errors": 0, "throughput_rps": 5.0, "p50_ms": p50, "p95_ms": p99,
+            "p99_ms": p99, "avg_bytes": 100}
+
+def test_relative_change_skips_missing_or_zero_baselines():
+    assert relative_change(12.0, 10.0) == "+20.0%"
+    assert relative_change(12.0, 0) is None
+    assert relative_change(12.0, None) is None
+    assert relative_change(None, 10.0) is None
+
+def test_summary_compares_only_metrics_with_a_baseline(capsys):
+    summary = {"text": stats(12.0, 30.0), "image": stats(5.0, 9.0), "groups": stats(1.0, 2.0),
+               "total": {"requests": 30, "throughput_rps": 15.0}}
+    baseline = {"text": stats(10.0, 20.0), "image": stats(5.0, 0), "groups": stats(None, None)}
+
+    print_summary(summary, baseline)
+
+    lines = {line.split()[0]: line for line in capsys.readouterr().out.splitlines()}
+    assert lines["text"].endswith("p50 +20.0%  p99 +50.0%")
+    assert lines["image"].endswith("p50 +0.0%  p99 -")
+    assert "p50" not in lines["groups"]
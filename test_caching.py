@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Tests for the in-process LRU result cache
+"""
+
+from caching import LRUCache, VersionedValue, etag_matches, make_etag
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+def test_byte_limit_and_stats():
+    cache = LRUCache(max_entries=100, max_bytes=250, sizer=lambda value: 100)
+    for key in range(3):
+        cache.put(key, "x")
+    cache.get(0)
+    cache.get(2)
+
+    assert cache.stats() == {"entries": 2, "bytes": 200, "hits": 1, "misses": 1}
+
+def test_versioned_value_rebuilds_on_version_change():
+    builds = []
+    derived = VersionedValue(lambda: builds.append(1) or len(builds))
+
+    assert derived.get(version=3) == 1
+    assert derived.get(version=3) == 1
+    assert derived.get(version=4) == 2
+    assert derived.is_current(4) and not derived.is_current(3)
+
+def test_etags_change_with_version_and_match_weakly():
+    etag = make_etag("/search", [("query", "shirt")], 3)
+
+    assert etag != make_etag("/search", [("query", "shirt")], 4)
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", {etag[2:]}', etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Tests for single-flight request coalescing
+"""
+
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from coalesce import SharedFlight, SingleFlight
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+def test_concurrent_identical_calls_share_one_execution():
+    calls = []
+    
+    async def fetch(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return f"result-{key}"
+    
+    async def scenario():
+        flight = SingleFlight("search")
+        results = await asyncio.gather(*(flight.do(key, lambda key=key: fetch(key))
+                                         for key in ["a", "a", "a", "b"]))
+        return results, flight
+    
+    results, flight = run(scenario())
+    assert results == ["result-a", "result-a", "result-a", "result-b"]
+    assert sorted(calls) == ["a", "b"]
+    assert len(flight) == 0
+
+def test_errors_reach_every_caller_and_are_not_kept():
+    attempts = []
+    
+    async def fail():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+    
+    async def scenario():
+        flight = SingleFlight("image")
+        results = await asyncio.gather(flight.do("k", fail), flight.do("k", fail),
+                                       return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in results)
+        with pytest.raises(ValueError):
+            await flight.do("k", fail)
+    
+    run(scenario())
+    assert len(attempts) == 2
+
+def test_cancelled_caller_does_not_cancel_the_shared_call():
+    async def slow():
+        await asyncio.sleep(0.02)
+        return "done"
+    
+    async def scenario():
+        flight = SingleFlight("search")
+        first = asyncio.create_task(flight.do("k", slow))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(flight.do("k", slow))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+    
+    assert run(scenario()) == "done"
+
+def test_shared_flight_reuses_another_workers_result(tmp_path):
+    calls = []
+    
+    async def search():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return {"items": [1, 2, 3]}
+    
+    async def scenario():
+        # Two instances stand in for two worker processes sharing a directory
+        workers = [SharedFlight("search", str(tmp_path), ttl=5.0) for _ in range(2)]
+        return await asyncio.gather(*(
+            worker.do(("q", 20), search, lambda r: json.dumps(r).encode(), json.loads)
+            for worker in workers
+        ))
+    
+    assert run(scenario()) == [{"items": [1, 2, 3]}] * 2
+    assert len(calls) == 1
+
+def test_shared_flight_ignores_expired_results(tmp_path):
+    calls = []
+    
+    async def search():
+        calls.append(1)
+        return len(calls)
+    
+    async def scenario():
+        flight = SharedFlight("search", str(tmp_path), ttl=0.0)
+        first = await flight.do("q", search, lambda r: str(r).encode(), int)
+        await asyncio.sleep(0.01)
+        second = await flight.do("q", search, lambda r: str(r).encode(), int)
+        flight.prune()
+        return first, second
+    
+    assert run(scenario()) == (1, 2)
+    assert not list(tmp_path.glob("*.result"))
+
+def test_shared_flight_runs_different_keys_concurrently(tmp_path):
+    async def search():
+        await asyncio.sleep(0.1)
+        return 1
+
+    async def scenario():
+        flight = SharedFlight("search", str(tmp_path), ttl=5.0)
+        started = time.perf_counter()
+        await asyncio.gather(*(flight.do(f"q{i}", search, lambda r: b"1", int) for i in range(10)))
+        return time.perf_counter() - started
+
+    assert run(scenario()) < 0.5
+
+def test_unshareable_results_are_not_published(tmp_path):
+    calls = []
+
+    async def degraded():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return "filter-only"
+
+    async def scenario():
+        workers = [SharedFlight("search", str(tmp_path), ttl=5.0) for _ in range(2)]
+        first = asyncio.create_task(workers[0].do("q", degraded, lambda r: None, bytes.decode))
+        await asyncio.sleep(0.005)
+        second = await workers[1].do("q", degraded, lambda r: None, bytes.decode)
+        return await first, second
+
+    assert run(scenario()) == ("filter-only", "filter-only")
+    assert len(calls) == 2
+    assert not list(tmp_path.glob("*.result")) and not list(tmp_path.glob("*.pending"))
+
+def test_shared_flight_file_io_stays_off_the_loop(tmp_path):
+    threads = []
+
+    async def search():
+        await asyncio.sleep(0.02)
+        return 1
+
+    async def scenario():
+        workers = [SharedFlight("search", str(tmp_path), ttl=5.0) for _ in range(2)]
+        for worker in workers:
+            for name in ("_read_fresh", "_claim", "_publish", "_remove"):
+                method = getattr(worker, name)
+                setattr(worker, name, lambda *args, method=method: threads.append(threading.get_ident()) or method(*args))
+        results = await asyncio.gather(*(worker.do("q", search, lambda r: b"1", int) for worker in workers))
+        return results, threading.get_ident()
+
+    results, loop_thread = run(scenario())
+    assert results == [1, 1]
+    assert threads and loop_thread not in threads
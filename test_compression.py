@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+Tests for negotiated response compression
+"""
+
+import gzip
+
+import compression
+from compression import compress_body, negotiate_encoding
+
+def test_negotiation_respects_q_values(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", object())
+
+    assert negotiate_encoding("gzip, deflate, br") == "br"
+    assert negotiate_encoding("br;q=0.5, gzip") == "gzip"
+    assert negotiate_encoding("br;q=0, gzip;q=0") is None
+    assert negotiate_encoding("*") == "br"
+    assert negotiate_encoding("") is None
+
+def test_gzip_without_brotli_and_size_threshold(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    body = b'{"detail_desc": "Relaxed-fit sweater in soft wool"}' * 50
+
+    assert negotiate_encoding("br, gzip") == "gzip"
+    compressed, encoding = compress_body(body, "gzip, br", min_bytes=1024)
+    assert encoding == "gzip" and gzip.decompress(compressed) == body
+    assert compress_body(body[:100], "gzip", min_bytes=1024) == (body[:100], None)
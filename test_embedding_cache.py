@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Tests for the content-addressed embedding cache
+"""
+
+import numpy as np
+
+import embedding_cache
+from embedding_cache import EmbeddingCache, encode_with_cache
+
+class CountingEncoder:
+    """Stand-in encoder that records how many texts it was asked to encode"""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, batch_size=64):
+        self.encoded.extend(texts)
+        return np.array([[len(text), 1.0, 2.0] for text in texts], dtype=np.float32)
+
+def test_only_misses_are_encoded(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    encoder = CountingEncoder()
+
+    first = encode_with_cache(encoder, ["a", "bb", "a"], "model", cache)
+    assert encoder.encoded == ["a", "bb"]
+    assert first.shape == (3, 3)
+    assert np.array_equal(first[0], first[2])
+
+    encoder.encoded = []
+    second = encode_with_cache(encoder, ["bb", "ccc", "a"], "model", cache)
+    assert encoder.encoded == ["ccc"]
+    assert np.array_equal(second[0], first[1])
+    assert second[1][0] == 3
+
+def test_cache_is_keyed_by_model(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    encoder = CountingEncoder()
+
+    encode_with_cache(encoder, ["a"], "model-1", cache)
+    encode_with_cache(encoder, ["a"], "model-2", cache)
+    assert encoder.encoded == ["a", "a"]
+    assert len(cache) == 2
+
+def test_default_cache_is_closed_after_each_call(tmp_path, monkeypatch):
+    opened = []
+
+    class TrackedCache(EmbeddingCache):
+        def __init__(self):
+            super().__init__(str(tmp_path / "default.sqlite"))
+            self.closed = False
+            opened.append(self)
+
+        def close(self):
+            self.closed = True
+            super().close()
+
+    monkeypatch.setattr(embedding_cache, "EmbeddingCache", TrackedCache)
+    encoder = CountingEncoder()
+    encode_with_cache(encoder, ["a", "bb"], "model")
+    encode_with_cache(encoder, ["a"], "model")
+
+    assert [cache.closed for cache in opened] == [True, True]
+    assert encoder.encoded == ["a", "bb"]
+
+def test_a_given_cache_is_left_open(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    encode_with_cache(CountingEncoder(), ["a"], "model", cache)
+    assert len(cache) == 1
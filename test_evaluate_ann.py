@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Tests for the ANN recall evaluation
+"""
+
+import json
+
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from evaluate_ann import exact_topk, has_vector_index, load_queries
+
+class VectorDataset:
+    def __init__(self, vectors, indices=()):
+        self.data = pa.table({
+            "article_id": [f"A{i}" for i in range(len(vectors))],
+            "vector": pa.FixedSizeListArray.from_arrays(pa.array(vectors.ravel()), vectors.shape[1]),
+        })
+        self.indices = list(indices)
+
+    def to_batches(self, columns, batch_size):
+        return self.data.select(columns).to_batches(max_chunksize=batch_size)
+
+    def list_indices(self):
+        return self.indices
+
+@pytest.mark.parametrize("metric", ["L2", "cosine", "dot"])
+def test_exact_topk_matches_brute_force_across_blocks(metric):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(200, 8)).astype(np.float32)
+    queries = rng.normal(size=(5, 8)).astype(np.float32)
+
+    found = exact_topk(VectorDataset(vectors), "vector", queries, k=7, metric=metric, batch_size=32)
+
+    if metric == "L2":
+        distances = np.linalg.norm(queries[:, None] - vectors[None], axis=2)
+    elif metric == "cosine":
+        normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        distances = -(queries @ normalized.T)
+    else:
+        distances = -(queries @ vectors.T)
+    expected = [{f"A{i}" for i in row} for row in np.argsort(distances, axis=1)[:, :7]]
+    assert found == expected
+
+def test_only_an_index_on_the_column_counts():
+    vectors = np.zeros((2, 4), dtype=np.float32)
+    key_only = VectorDataset(vectors, [{"name": "article_id_idx", "type": "BTree", "fields": ["article_id"]}])
+    assert not has_vector_index(key_only, "vector")
+
+    indexed = VectorDataset(vectors, key_only.indices + [{"name": "vector_idx", "type": "IVF_PQ", "fields": ["vector"]}])
+    assert has_vector_index(indexed, "vector")
+    assert not has_vector_index(indexed, "image_vector")
+
+def test_queries_load_from_text_and_jsonl(tmp_path):
+    path = tmp_path / "queries.txt"
+    path.write_text("\n".join([
+        "blue shirt",
+        "",
+        json.dumps({"query": "wool coat", "groups": ["Menswear"]}),
+        json.dumps({"query": ""}),
+        json.dumps({"target": "image"}),
+        "  linen dress  ",
+    ]), encoding="utf-8")
+
+    assert load_queries(str(path)) == ["blue shirt", "wool coat", "linen dress"]
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests for the memory-mapped exact vector engine
+"""
+
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from exact_engine import ExactEngine, export_vectors
+
+class FakeDataset:
+    """The slice of the Lance dataset API the export uses"""
+
+    def __init__(self, table, version=1):
+        self.table = table
+        self.schema = table.schema
+        self.version = version
+
+    def count_rows(self):
+        return self.table.num_rows
+
+    def to_batches(self, columns, batch_size):
+        return self.table.select(columns).to_batches(max_chunksize=batch_size)
+
+    def to_table(self, columns):
+        return self.table.select(columns)
+
+def make_dataset(rows=500, dim=16):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(rows, dim)).astype(np.float32)
+    groups = rng.choice(["Ladieswear", "Menswear", "Sport"], size=rows)
+    types = rng.choice(["Dress", "Shirt", "Sweater"], size=rows)
+    table = pa.table({
+        "vector": pa.FixedSizeListArray.from_arrays(pa.array(vectors.ravel()), dim),
+        "index_group_name": groups,
+        "product_type_name": types,
+    })
+    return FakeDataset(table), vectors, groups, types
+
+@pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+def test_topk_matches_brute_force(tmp_path, dtype):
+    dataset, vectors, _, _ = make_dataset()
+    engine = ExactEngine(export_vectors(dataset, str(tmp_path / "export"), dtype=dtype, batch_size=64))
+    query = vectors[7] + 0.01
+
+    rows, distances = engine.search(query, 10)
+    exact = np.argsort(np.linalg.norm(vectors - query, axis=1))[:10]
+    overlap = len(set(rows) & set(exact)) / 10
+    assert overlap == 1.0 if dtype != "int8" else overlap >= 0.9
+    assert rows[0] == 7
+    assert np.all(np.diff(distances) >= 0)
+
+def test_group_and_item_masks(tmp_path):
+    dataset, vectors, groups, types = make_dataset()
+    engine = ExactEngine(export_vectors(dataset, str(tmp_path / "export"), dtype="float32"))
+
+    rows, _ = engine.search(vectors[0], 20, groups=["Menswear", "Sport"], items=["Shirt"])
+    allowed = np.flatnonzero(np.isin(groups, ["Menswear", "Sport"]) & (types == "Shirt"))
+    exact = allowed[np.argsort(np.linalg.norm(vectors[allowed] - vectors[0], axis=1))[:20]]
+    assert list(rows) == list(exact)
+    assert len(engine.search(vectors[0], 5, groups=["Unknown"])[0]) == 0
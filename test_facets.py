@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Tests for group and product type facets
+"""
+
+import pandas as pd
+
+from facets import build_facets
+
+CATALOG = pd.DataFrame({
+    "index_group_name": ["Ladieswear", "Ladieswear", "Ladieswear", "Menswear", "Menswear", "Sport", None],
+    "product_type_name": ["Dress", "Dress", "Sweater", "Sweater", "Shirt", None, "Socks"],
+})
+
+def test_types_are_counted_within_selected_groups():
+    facets = build_facets(CATALOG)
+
+    assert facets.types(["Ladieswear"]) == [{"name": "Dress", "count": 2}, {"name": "Sweater", "count": 1}]
+    assert facets.types(["Ladieswear", "Menswear"]) == [
+        {"name": "Dress", "count": 2}, {"name": "Sweater", "count": 2}, {"name": "Shirt", "count": 1},
+    ]
+    assert facets.types(["Unknown"]) == []
+
+def test_all_groups_listed_and_totals_without_selection():
+    facets = build_facets(CATALOG)
+
+    assert sorted(facets.groups()) == ["Ladieswear", "Menswear", "Sport"]
+    assert {t["name"]: t["count"] for t in facets.types()} == {"Dress": 2, "Sweater": 2, "Shirt": 1}
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Smoke tests for the synthetic catalog generator
+"""
+
+import numpy as np
+
+from generate_catalog import CatalogGenerator, build_image_pool, image_table_name
+from image_store import IMAGE_TABLE_NAME
+from table_ops import vectors_to_numpy
+from test_table_ops import FakeDB
+
+def test_batches_follow_the_schema_and_are_reproducible():
+    generator = CatalogGenerator(250, seed=3, dim=16, image_hashes=["h1", "h2"])
+    batches = list(generator.batches(batch_rows=100))
+
+    assert [batch.num_rows for batch in batches] == [100, 100, 50]
+    assert all(batch.schema == generator.schema for batch in batches)
+    ids = [article_id for batch in batches for article_id in batch.column("article_id").to_pylist()]
+    assert ids == [f"SY{i:09d}" for i in range(250)]
+    assert set(batches[0].column("image_hash").to_pylist()) <= {"h1", "h2"}
+
+    vectors = vectors_to_numpy(batches[1].column("vector"))
+    assert vectors.shape == (100, 16)
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0, atol=1e-5)
+    # Any slice can be regenerated on its own
+    again = CatalogGenerator(250, seed=3, dim=16, image_hashes=["h1", "h2"]).batch(100, 100)
+    assert again.equals(batches[1])
+
+def test_without_images_there_is_no_image_vector_column():
+    generator = CatalogGenerator(10, dim=8, with_image_vectors=False)
+    batch = generator.batch(0, 10)
+    assert "image_vector" not in batch.schema.names
+    assert set(batch.column("image_hash").to_pylist()) == {""}
+
+def test_synthetic_images_stay_out_of_the_shared_image_store():
+    db = FakeDB()
+    hashes = build_image_pool(db, 5, image_table_name("hm_synthetic"))
+
+    assert len(set(hashes)) == 5
+    assert db.table_names() == ["hm_synthetic_images"]
+    assert IMAGE_TABLE_NAME not in db.tables
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Tests for content-addressed image storage
+"""
+
+import base64
+
+import pyarrow as pa
+
+import load_binary_images
+from image_store import (IMAGE_TABLE_NAME, hash_image_bytes, load_image_bytes, load_row_image,
+                         open_image_table, store_images)
+from test_table_ops import FakeDB
+
+PNG = b"\x89PNG fake image"
+
+def encoded(image_bytes):
+    return base64.b64encode(image_bytes).decode()
+
+def test_identical_images_are_stored_once():
+    db = FakeDB()
+    first = store_images(db, [encoded(PNG), "data:image/png;base64," + encoded(PNG), encoded(b"jpeg")])
+
+    assert first[0] == first[1] == hash_image_bytes(PNG)
+    assert db.tables[IMAGE_TABLE_NAME].num_rows == 2
+    # Blobs already in the table aren't written again
+    second = store_images(db, [encoded(b"jpeg"), encoded(b"gif")])
+    assert second[0] == first[2]
+    assert db.tables[IMAGE_TABLE_NAME].num_rows == 3
+
+def test_blobs_are_read_back_by_hash():
+    db = FakeDB()
+    [image_hash] = store_images(db, [encoded(PNG)])
+    table = open_image_table(db)
+
+    assert load_image_bytes(table, image_hash) == PNG
+    assert load_image_bytes(table, hash_image_bytes(b"unknown")) is None
+    assert open_image_table(FakeDB()) is None
+
+def test_each_image_url_is_downloaded_once(monkeypatch):
+    fetched = []
+    monkeypatch.setattr(load_binary_images, "download_and_encode_image",
+                        lambda url: fetched.append(url) or f"data:{url}")
+    monkeypatch.setattr(load_binary_images, "create_placeholder_image", lambda: "placeholder")
+    monkeypatch.setattr(load_binary_images.time, "sleep", lambda seconds: None)
+    items = [{"article_id": "A1", "source_url": "u1"}, {"article_id": "A2", "source_url": "u2"},
+             {"article_id": "A3", "source_url": "u1"}, {"article_id": "A4", "source_url": None}]
+    downloaded = {"u2": "data:cached"}
+
+    with_images = load_binary_images.attach_images(items, downloaded)
+
+    assert fetched == ["u1"]
+    assert [item["image_data"] for item in with_images] == ["data:u1", "data:cached", "data:u1", "placeholder"]
+    assert all("source_url" not in item for item in with_images)
+    assert items[0]["source_url"] == "u1"
+
+def article_rows(**columns):
+    """Article rows as the app reads them: pandas rows from an Arrow table"""
+    return pa.table(columns).to_pandas()
+
+def test_rows_with_a_hash_are_served_from_the_blob_table():
+    db = FakeDB()
+    [image_hash] = store_images(db, [encoded(PNG)])
+    row = article_rows(article_id=["A1"], image_hash=[image_hash], image_data=[""]).iloc[0]
+
+    assert load_row_image(row, open_image_table(db)) == (PNG, f'"{image_hash}"')
+
+def test_legacy_rows_with_a_null_hash_decode_their_inline_data():
+    db = FakeDB()
+    store_images(db, [encoded(b"other image")])
+    data_url = "data:image/png;base64," + encoded(PNG)
+    row = article_rows(article_id=["A1"], image_hash=pa.array([None], pa.string()),
+                       image_data=[data_url]).iloc[0]
+
+    assert load_row_image(row, open_image_table(db)) == (PNG, None)
+
+def test_missing_images_are_none():
+    db = FakeDB()
+    store_images(db, [encoded(PNG)])
+    unknown = article_rows(article_id=["A1"], image_hash=[hash_image_bytes(b"gone")], image_data=[""])
+    empty = article_rows(article_id=["A2"], image_hash=pa.array([None], pa.string()),
+                         image_data=pa.array([None], pa.string()))
+
+    assert load_row_image(unknown.iloc[0], open_image_table(db)) is None
+    assert load_row_image(empty.iloc[0], open_image_table(db)) is None
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Tests for checkpointed ingestion
+"""
+
+import pandas as pd
+
+from ingest import IngestCheckpoint, ingest_in_batches
+from test_table_ops import catalog_db
+
+def test_checkpoint_survives_restart(tmp_path):
+    path = str(tmp_path / "checkpoint")
+    checkpoint = IngestCheckpoint(path)
+    checkpoint.mark(["MS001", "LD001"])
+    checkpoint.mark(["SP001"])
+
+    resumed = IngestCheckpoint(path)
+    assert len(resumed) == 3
+    assert "LD001" in resumed
+    assert "DV001" not in resumed
+
+def test_clear_forgets_progress(tmp_path):
+    path = str(tmp_path / "checkpoint")
+    checkpoint = IngestCheckpoint(path)
+    checkpoint.mark(["MS001"])
+    checkpoint.clear()
+
+    assert len(checkpoint) == 0
+    assert len(IngestCheckpoint(path)) == 0
+
+def test_batches_into_a_table_with_different_columns_keep_other_rows(tmp_path):
+    db = catalog_db(rows=5)
+    checkpoint = IngestCheckpoint(str(tmp_path / "checkpoint"))
+    items = [{"article_id": article_id, "prod_name": f"Loaded {article_id}"}
+             for article_id in ["A1", "N1", "N2"]]
+
+    def build_batch(batch):
+        df = pd.DataFrame(batch)
+        df["image_vector"] = [[0.5, 0.5]] * len(df)
+        return df
+
+    table = ingest_in_batches(items, build_batch, db, "hm_mini", checkpoint, batch_size=2)
+
+    rows = db.tables["hm_mini"].to_pandas().set_index("article_id")
+    assert db.created == []
+    assert sorted(rows.index) == ["A0", "A1", "A2", "A3", "A4", "N1", "N2"]
+    assert rows.loc["A3", "prod_name"] == "Item 3" and rows.loc["A3", "image_vector"] is None
+    assert rows.loc["A1", "prod_name"] == "Loaded A1" and rows.loc["A1", "image_hash"] == "h1"
+    assert "image_vector" in table.schema.names
+    assert len(checkpoint) == 3
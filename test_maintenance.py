@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Tests for scheduled dataset maintenance
+"""
+
+import threading
+
+import maintenance
+from maintenance import MaintenanceScheduler
+
+def test_scheduler_runs_on_its_interval_until_stopped(monkeypatch):
+    calls = []
+    ran = threading.Event()
+
+    def run_maintenance(db_path, table_names, retention, rebuild_neighbors):
+        assert rebuild_neighbors
+        calls.append((db_path, table_names))
+        if len(calls) == 1:
+            raise OSError("dataset busy")
+        if len(calls) == 2:
+            ran.set()
+        return [{"table": "hm_mini", "error": "skipped"}]
+
+    monkeypatch.setattr(maintenance, "run_maintenance", run_maintenance)
+    scheduler = MaintenanceScheduler("./db", 0.01, ["hm_mini"])
+    scheduler.start()
+
+    # A failed run doesn't end the schedule
+    assert ran.wait(2)
+    scheduler.stop()
+    scheduler._thread.join(2)
+    assert not scheduler._thread.is_alive()
+    assert calls[0] == ("./db", ["hm_mini"])
+    assert scheduler.last_results == [{"table": "hm_mini", "error": "skipped"}]
+
+    runs = len(calls)
+    threading.Event().wait(0.05)
+    assert len(calls) == runs
+
+def test_stop_before_the_first_interval_skips_maintenance(monkeypatch):
+    calls = []
+    monkeypatch.setattr(maintenance, "run_maintenance", lambda *args: calls.append(args) or [])
+    scheduler = MaintenanceScheduler("./db", 60)
+    scheduler.start()
+    scheduler.stop()
+    scheduler._thread.join(2)
+
+    assert not scheduler._thread.is_alive()
+    assert calls == []
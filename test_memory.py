@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Tests for memory accounting
+"""
+
+import tracemalloc
+
+from caching import LRUCache
+from memory import memory_report, register_cache
+
+def test_report_breaks_memory_down_by_component():
+    cache = register_cache("test_memory", LRUCache(4))
+    cache.put("key", "x" * 1000)
+
+    report = memory_report()
+
+    assert set(report) >= {"process", "encoder_bytes", "arrow", "caches", "python_heap",
+                           "attributed_bytes"}
+    assert set(report["process"]) == {"rss_bytes", "peak_rss_bytes"}
+    assert set(report["arrow"]) == {"allocated_bytes", "peak_bytes", "backend"}
+    assert report["caches"]["test_memory"]["entries"] == 1
+    assert report["encoder_bytes"] == 0
+    assert report["python_heap"]["gc_tracked_objects"] > 0
+    if report["process"]["rss_bytes"] is not None:
+        assert report["unattributed_bytes"] == report["process"]["rss_bytes"] - report["attributed_bytes"]
+
+def test_top_sites_are_listed_while_tracing():
+    tracemalloc.start()
+    try:
+        heap = memory_report(top=3)["python_heap"]
+    finally:
+        tracemalloc.stop()
+
+    assert heap["tracemalloc"] is True
+    assert len(heap["top_sites"]) <= 3
+    assert set(heap["top_sites"][0]) == {"site", "bytes", "blocks"}
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Tests for stage timing and Prometheus rendering
+"""
+
+from metrics import Counter, Histogram, server_timing_header, stage, start_request
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency", ["stage"], buckets=(0.01, 0.1))
+    histogram.observe(0.005, stage="encode")
+    histogram.observe(0.05, stage="encode")
+    histogram.observe(5.0, stage="encode")
+
+    text = histogram.render()
+    assert 'latency_seconds_bucket{stage="encode",le="0.01"} 1' in text
+    assert 'latency_seconds_bucket{stage="encode",le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{stage="encode",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{stage="encode"} 3' in text
+
+def test_stages_are_collected_per_request():
+    timings = start_request("/search")
+    with stage("query"):
+        pass
+    with stage("query"):
+        pass
+    with stage("encode"):
+        pass
+
+    assert [name for name, _ in timings] == ["query", "query", "encode"]
+    header = server_timing_header(timings, total=0.0123)
+    assert header.startswith("query;dur=")
+    assert header.count("query") == 1
+    assert header.endswith("total;dur=12.30")
+
+def test_counter_series_per_label_set():
+    counter = Counter("rejected_total", "Rejected", ["stage", "reason"])
+    counter.inc(stage="encode", reason="deadline")
+    counter.inc(2, stage="encode", reason="deadline")
+    counter.inc(stage="query", reason="queue_full")
+
+    assert counter.value(stage="encode", reason="deadline") == 3
+    text = counter.render()
+    assert "# TYPE rejected_total counter" in text
+    assert 'rejected_total{stage="encode",reason="deadline"} 3' in text
+    assert 'rejected_total{stage="query",reason="queue_full"} 1' in text
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Tests for the precomputed neighbor graph
+"""
+
+import numpy as np
+import pyarrow as pa
+
+from neighbor_graph import (build_neighbor_table, neighbor_graph_state, neighbor_records,
+                            neighbor_table_name, refresh_neighbor_table, topk_neighbors)
+from test_table_ops import FakeDB
+
+def test_blocked_topk_matches_brute_force():
+    vectors = np.random.default_rng(0).normal(size=(300, 8)).astype(np.float32)
+    indices, distances = topk_neighbors(vectors, 5, block_size=32, workers=2)
+
+    exact = np.linalg.norm(vectors[:, None] - vectors[None], axis=2)
+    np.fill_diagonal(exact, np.inf)
+    assert (indices == np.argsort(exact, axis=1)[:, :5]).all()
+    assert np.allclose(distances, np.sort(exact, axis=1)[:, :5], atol=1e-3)
+
+def test_records_map_indices_to_article_ids():
+    vectors = np.array([[0.0], [1.0], [3.0]], dtype=np.float32)
+    indices, distances = topk_neighbors(vectors, 5)
+    records = neighbor_records(["A", "B", "C"], indices, distances, source_version=7).to_pylist()
+
+    assert records[0]["neighbor_ids"] == ["B", "C"]
+    assert records[2]["neighbor_ids"] == ["B", "A"]
+    assert records[1]["source_version"] == 7
+
+def test_stale_graphs_are_rebuilt_with_the_same_k():
+    db = FakeDB()
+    vectors = np.random.default_rng(1).normal(size=(6, 4)).astype(np.float32)
+    db.create_table("hm_mini", pa.table({
+        "article_id": [f"A{i}" for i in range(6)],
+        "vector": pa.FixedSizeListArray.from_arrays(pa.array(vectors.ravel()), 4),
+    }))
+    assert refresh_neighbor_table(db, "hm_mini") == 0
+    assert neighbor_table_name("hm_mini") not in db.tables
+
+    db.versions["hm_mini"] = 3
+    build_neighbor_table(db, "hm_mini", k=2)
+    assert neighbor_graph_state(db, "hm_mini") == (3, 2)
+    assert refresh_neighbor_table(db, "hm_mini") == 0
+
+    # Compaction or an upsert moves the catalog to a new version
+    db.versions["hm_mini"] = 5
+    assert refresh_neighbor_table(db, "hm_mini") == 6
+    assert neighbor_graph_state(db, "hm_mini") == (5, 2)
+    assert db.indices[neighbor_table_name("hm_mini")] == ["article_id"]
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Performance regression suite
+Measures encode latency, unfiltered and filtered vector search, point image
+lookups, /groups and ingest throughput on a generated catalog, and fails when
+a metric regresses beyond a tolerance relative to stored baselines.
+
+Runs offline on CPU (the CLIP model must already be in the local cache):
+    RUN_PERF=1 python -m pytest -q test_performance.py
+    RUN_PERF=1 PERF_UPDATE_BASELINES=1 python -m pytest -q test_performance.py   # record baselines
+
+Environment:
+    PERF_TOLERANCE   allowed relative regression (default 0.25)
+    PERF_ROWS        generated catalog size (default 20000)
+"""
+
+import json
+import os
+import statistics
+import sys
+import time
+
+import pytest
+
+# Never reach out to the model hub during performance runs
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+pytestmark = pytest.mark.skipif(not os.environ.get("RUN_PERF"), reason="set RUN_PERF=1 to run")
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "perf_baselines.json")
+TOLERANCE = float(os.environ.get("PERF_TOLERANCE", "0.25"))
+ROWS = int(os.environ.get("PERF_ROWS", "20000"))
+ITERATIONS = 30
+WARMUP = 3
+
+_measured = {}
+
+def _load_baselines():
+    if os.path.exists(BASELINES_PATH):
+        with open(BASELINES_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+def measure(fn, iterations=ITERATIONS, warmup=WARMUP):
+    """p50 latency of fn in milliseconds"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+def check(name, value, higher_is_better=False):
+    """Compare a metric with its baseline, or record it when updating baselines"""
+    _measured[name] = value
+    if os.environ.get("PERF_UPDATE_BASELINES"):
+        return
+    baseline = _load_baselines().get(name)
+    if baseline is None:
+        pytest.skip(f"No baseline for {name}; run with PERF_UPDATE_BASELINES=1")
+    if higher_is_better:
+        assert value >= baseline * (1 - TOLERANCE), \
+            f"{name} regressed: {value:.2f} vs baseline {baseline:.2f}"
+    else:
+        assert value <= baseline * (1 + TOLERANCE), \
+            f"{name} regressed: {value:.2f} vs baseline {baseline:.2f}"
+
+@pytest.fixture(scope="session", autouse=True)
+def save_baselines():
+    yield
+    if os.environ.get("PERF_UPDATE_BASELINES") and _measured:
+        baselines = _load_baselines()
+        baselines.update({name: round(value, 3) for name, value in _measured.items()})
+        with open(BASELINES_PATH, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+
+@pytest.fixture(scope="session")
+def catalog(tmp_path_factory):
+    """Generated catalog in a temporary database, with ingest throughput"""
+    pytest.importorskip("lancedb")
+    from generate_catalog import write_catalog
+
+    db_path = str(tmp_path_factory.mktemp("perf_db"))
+    started = time.perf_counter()
+    write_catalog(ROWS, db_path, "hm_perf", image_pool=64)
+    rows_per_second = ROWS / (time.perf_counter() - started)
+    return db_path, "hm_perf", rows_per_second
+
+@pytest.fixture(scope="session")
+def client(catalog, tmp_path_factory):
+    """Test client for the app, serving the generated catalog"""
+    pytest.importorskip("sentence_transformers")
+    from fastapi.testclient import TestClient
+    from config import Config
+    from generate_catalog import image_table_name
+
+    Config.LANCEDB_PATH, Config.TABLE_NAME, _ = catalog
+    Config.IMAGE_TABLE_NAME = image_table_name(Config.TABLE_NAME)
+    # Benchmark traffic must not feed the real suggestions, warm-up or slow-query log
+    logs = tmp_path_factory.mktemp("perf_logs")
+    Config.QUERY_LOG_PATH = str(logs / "query_log.jsonl")
+    Config.SLOW_QUERY_LOG_PATH = str(logs / "slow_queries.jsonl")
+    Config.PROFILE_DIR = str(logs / "profiles")
+    import app
+    # Entering the client runs the startup and shutdown handlers, as in production
+    with TestClient(app.app) as http:
+        yield http, app
+
+def ok(response):
+    """Fail the measurement if the request errored instead of timing the error path"""
+    assert response.status_code == 200, f"{response.request.url}: {response.status_code} {response.text[:200]}"
+    return response
+
+def test_ingest_throughput(catalog):
+    check("ingest_rows_per_second", catalog[2], higher_is_better=True)
+
+def test_encode_latency(client):
+    _, app = client
+    encoder = app.lancedb_service.encoder
+    check("encode_p50_ms", measure(lambda: encoder.encode("blue cotton shirt")))
+
+def uncached_search(http, app, params):
+    """A /search request that misses the result and query vector caches"""
+    app.lancedb_service.search_cache.clear()
+    app.lancedb_service.query_vectors.clear()
+    return ok(http.get("/search", params=params))
+
+def test_vector_search_latency(client):
+    http, app = client
+    params = {"query": "warm wool sweater"}
+    check("search_p50_ms", measure(lambda: uncached_search(http, app, params)))
+
+def test_filtered_vector_search_latency(client):
+    http, app = client
+    params = {"query": "warm wool sweater", "group": "Menswear", "item": "Sweater"}
+    check("filtered_search_p50_ms", measure(lambda: uncached_search(http, app, params)))
+
+def test_image_lookup_latency(client):
+    http, _ = client
+    check("image_p50_ms", measure(lambda: ok(http.get("/image/SY000000042"))))
+
+def test_groups_latency(client):
+    http, _ = client
+    check("groups_p50_ms", measure(lambda: ok(http.get("/groups"))))
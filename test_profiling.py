@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests for the slow-query log and request profiler
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from profiling import RequestProfiler, SlowQueryLog, StackSampler, sampled, write_folded
+
+def encode_query(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+def test_profiled_request_samples_threadpool_work(tmp_path):
+    profiler = RequestProfiler(1.0, str(tmp_path), interval_ms=1, focus_file=__file__)
+
+    async def search():
+        with profiler.profile("search") as path:
+            # Stands in for run_in_threadpool, which also copies the context
+            await asyncio.to_thread(sampled(encode_query), 0.1)
+        return path
+
+    path = asyncio.run(search())
+    with open(path, encoding="utf-8") as f:
+        stacks = f.read()
+    assert "encode_query (test_profiling.py)" in stacks
+
+def spin_on_loop(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+def test_concurrent_requests_on_the_loop_stay_out_of_a_profile(tmp_path):
+    profiler = RequestProfiler(1.0, str(tmp_path), interval_ms=1, focus_file=__file__)
+
+    async def other_request():
+        for _ in range(20):
+            spin_on_loop(0.005)
+            await asyncio.sleep(0)
+
+    async def profiled_request():
+        with profiler.profile("search") as path:
+            await asyncio.to_thread(sampled(encode_query), 0.1)
+        return path
+
+    async def both():
+        path, _ = await asyncio.gather(profiled_request(), other_request())
+        return path
+
+    with open(asyncio.run(both()), encoding="utf-8") as f:
+        stacks = f.read()
+    assert "encode_query (test_profiling.py)" in stacks
+    assert "spin_on_loop" not in stacks
+
+def test_slow_query_log_records_only_requests_over_threshold(tmp_path):
+    log = SlowQueryLog(str(tmp_path / "slow" / "queries.jsonl"), threshold_ms=100)
+
+    assert not log.record(0.099, query="fast")
+    assert log.record(0.25, query="slow", stages={"encode": 0.2})
+    assert log.record(0.1, query="borderline")
+    log.flush()
+
+    with open(log.path, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f]
+    assert [e["query"] for e in entries] == ["slow", "borderline"]
+    assert entries[0]["elapsed_ms"] == 250.0
+    assert entries[0]["stages"] == {"encode": 0.2}
+
+def test_slow_query_log_can_be_disabled(tmp_path):
+    log = SlowQueryLog(str(tmp_path / "queries.jsonl"), threshold_ms=None)
+    assert not log.record(60, query="anything")
+    assert not os.path.exists(log.path)
+
+def test_folded_stacks_are_root_first_and_most_common_first(tmp_path):
+    path = str(tmp_path / "profiles" / "search.folded")
+    write_folded(Counter({"main;search;encode": 3, "main;search;query": 7}), path)
+
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == "main;search;query 7\nmain;search;encode 3\n"
+
+def test_sampler_keeps_only_stacks_through_the_focus_file():
+    def outer():
+        return sys._getframe()
+
+    sampler = StackSampler([threading.get_ident()], 0.001, focus_file=__file__)
+    stack = sampler._stack(outer())
+    frames = stack.split(";")
+    assert frames[-1] == "outer (test_profiling.py)"
+    # Frames above the outermost frame from the focus file are dropped
+    assert frames[0].endswith("(test_profiling.py)")
+    assert StackSampler([threading.get_ident()], 0.001, focus_file="elsewhere.py")._stack(outer()) is None
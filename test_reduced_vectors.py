@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests for PCA-reduced vectors and full-precision rerank
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from reduced_vectors import (FINGERPRINT_KEY, REDUCED_VECTOR_COLUMN, PCAProjection,
+                             add_reduced_vectors, load_table_projection, pca_path,
+                             projection_fingerprint, rerank)
+from test_table_ops import FakeDB
+
+def test_projection_keeps_low_rank_distances(tmp_path):
+    rng = np.random.default_rng(0)
+    # 64-d vectors that live in an 8-d subspace
+    vectors = (rng.normal(size=(400, 8)) @ rng.normal(size=(8, 64))).astype(np.float32)
+    projection = PCAProjection.fit(vectors, 8)
+    assert projection.explained_variance_ratio > 0.999
+
+    path = str(tmp_path / "pca.npz")
+    projection.save(path)
+    reduced = PCAProjection.load(path).transform(vectors)
+    assert reduced.shape == (400, 8)
+    full = np.linalg.norm(vectors[0] - vectors[1:], axis=1)
+    approx = np.linalg.norm(reduced[0] - reduced[1:], axis=1)
+    assert np.allclose(full, approx, rtol=1e-3, atol=1e-3)
+
+def test_rerank_orders_candidates_by_full_distance():
+    candidates = pd.DataFrame({
+        "article_id": ["A", "B", "C"],
+        "vector": [np.array([3.0, 0.0]), np.array([1.0, 0.0]), np.array([0.0, 2.0])],
+    })
+    reranked = rerank(candidates, [0.0, 0.0], limit=2)
+
+    assert reranked["article_id"].tolist() == ["B", "C"]
+    assert reranked["_distance"].tolist() == [1.0, 2.0]
+
+def test_table_schema_selects_the_projection_it_was_written_with(tmp_path):
+    rng = np.random.default_rng(1)
+    old = PCAProjection.fit(rng.normal(size=(100, 16)), 4)
+    new = PCAProjection.fit(rng.normal(size=(100, 16)), 4)
+    assert old.fingerprint != new.fingerprint
+    for projection in (old, new):
+        projection.save(pca_path(str(tmp_path), "hm_mini", projection.fingerprint))
+
+    def schema(fingerprint=None):
+        metadata = {FINGERPRINT_KEY: fingerprint.encode()} if fingerprint else None
+        return pa.schema([pa.field("article_id", pa.string()),
+                          pa.field(REDUCED_VECTOR_COLUMN, pa.list_(pa.float32(), 4), metadata=metadata)])
+
+    loaded = load_table_projection(schema(new.fingerprint), str(tmp_path), "hm_mini")
+    assert loaded.fingerprint == new.fingerprint
+    assert projection_fingerprint(schema()) is None
+    assert load_table_projection(schema(), str(tmp_path), "hm_mini") is None
+    assert load_table_projection(schema("0" * 16), str(tmp_path), "hm_mini") is None
+    assert projection_fingerprint(pa.schema([pa.field("article_id", pa.string())])) is None
+
+def test_retraining_replaces_only_the_reduced_column(tmp_path):
+    rng = np.random.default_rng(2)
+    db = FakeDB()
+    db.create_table("hm_mini", pa.table({
+        "article_id": [f"A{i}" for i in range(50)],
+        "vector": pa.FixedSizeListArray.from_arrays(
+            pa.array(rng.normal(size=50 * 16).astype(np.float32)), 16),
+    }))
+    table = db.open_table("hm_mini")
+    table.create_scalar_index("article_id")
+    table.create_scalar_index("vector")
+
+    first = add_reduced_vectors(db, "hm_mini", dims=4, sample_rows=20, db_path=str(tmp_path))
+    second = add_reduced_vectors(db, "hm_mini", dims=3, sample_rows=30, db_path=str(tmp_path))
+
+    assert first.fingerprint != second.fingerprint
+    data = db.tables["hm_mini"]
+    assert data.schema.names == ["article_id", "vector", REDUCED_VECTOR_COLUMN]
+    assert projection_fingerprint(data.schema) == second.fingerprint
+    assert data.schema.field(REDUCED_VECTOR_COLUMN).type == pa.list_(pa.float32(), 3)
+    # The table was never recreated, so its indexes survive the retrain
+    assert db.created == [("hm_mini", "create")]
+    assert {field for index in table.to_lance().list_indices() for field in index["fields"]} == \
+        {"article_id", "vector"}
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests for search targets, rank fusion and image vector indexes
+"""
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+from fastapi import HTTPException
+
+from config import Config
+from image_embeddings import IMAGE_VECTOR_COLUMN, TEXT_VECTOR_COLUMN, create_vector_indexes
+from search_targets import check_target, fuse_results
+
+def ranked(*article_ids):
+    return pd.DataFrame({"article_id": list(article_ids), "_distance": range(len(article_ids))})
+
+def test_items_in_both_lists_rank_first():
+    fused = fuse_results([ranked("A", "B", "C"), ranked("C", "D", "A")], limit=10, k=60)
+
+    assert fused["article_id"].tolist() == ["A", "C", "B", "D"]
+    assert fused["_rrf"].iloc[0] == pytest.approx(1 / 61 + 1 / 63)
+
+def test_fusion_dedupes_and_keeps_the_first_list_order_on_ties():
+    fused = fuse_results([ranked("A", "B"), ranked("B", "A")], limit=10, k=60)
+    assert fused["article_id"].tolist() == ["A", "B"]
+
+    fused = fuse_results([ranked("A", "B", "C"), ranked("D", "E", "F")], limit=4, k=60)
+    assert fused["article_id"].tolist() == ["A", "D", "B", "E"]
+
+def test_unknown_targets_are_rejected():
+    with pytest.raises(HTTPException) as excinfo:
+        check_target("sketch", Config.SEARCH_TARGETS, has_image_vectors=True)
+    assert excinfo.value.status_code == 400
+    assert excinfo.value.detail == "Unknown search target: sketch"
+
+@pytest.mark.parametrize("target", ["image", "both"])
+def test_image_targets_need_image_vectors(target):
+    check_target(target, Config.SEARCH_TARGETS, has_image_vectors=True)
+    with pytest.raises(HTTPException) as excinfo:
+        check_target(target, Config.SEARCH_TARGETS, has_image_vectors=False)
+    assert excinfo.value.status_code == 400
+
+def test_text_target_works_without_image_vectors():
+    check_target("text", Config.SEARCH_TARGETS, has_image_vectors=False)
+
+class IndexedTable:
+    def __init__(self, rows, columns):
+        self.rows = rows
+        self.schema = pa.schema([pa.field(column, pa.list_(pa.float32(), 4)) for column in columns])
+        self.indexes = {}
+
+    def count_rows(self):
+        return self.rows
+
+    def create_index(self, metric, vector_column_name, **options):
+        self.indexes[vector_column_name] = metric
+
+def test_image_vectors_are_indexed_with_the_cosine_metric():
+    table = IndexedTable(10000, [TEXT_VECTOR_COLUMN, IMAGE_VECTOR_COLUMN])
+    assert create_vector_indexes(table) == [TEXT_VECTOR_COLUMN, IMAGE_VECTOR_COLUMN]
+    assert table.indexes == {TEXT_VECTOR_COLUMN: "L2", IMAGE_VECTOR_COLUMN: "cosine"}
+
+    small = IndexedTable(100, [TEXT_VECTOR_COLUMN, IMAGE_VECTOR_COLUMN])
+    assert create_vector_indexes(small) == [] and small.indexes == {}
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Tests for streamed search result framing
+"""
+
+import json
+
+import pyarrow as pa
+
+from streaming import frame_results
+
+def batches(*sizes):
+    start = 0
+    for size in sizes:
+        yield pa.RecordBatch.from_pydict({"article_id": [f"A{i}" for i in range(start, start + size)]})
+        start += size
+
+def failing(*sizes):
+    yield from batches(*sizes)
+    raise OSError("scanner lost")
+
+def body(chunks):
+    return "".join(chunks)
+
+def test_ndjson_is_one_result_per_line_across_batches():
+    text = body(frame_results(batches(2, 0, 1), dict))
+    assert [json.loads(line) for line in text.splitlines()] == [
+        {"article_id": "A0"}, {"article_id": "A1"}, {"article_id": "A2"}]
+    assert text.endswith("\n")
+
+def test_json_is_one_array_across_batches():
+    assert json.loads(body(frame_results(batches(2, 0, 1), dict, "json"))) == [
+        {"article_id": "A0"}, {"article_id": "A1"}, {"article_id": "A2"}]
+
+def test_empty_results_are_well_formed():
+    assert body(frame_results(batches(), dict)) == ""
+    assert json.loads(body(frame_results(batches(0), dict, "json"))) == []
+
+def test_failure_mid_stream_ends_with_an_error_record():
+    lines = body(frame_results(failing(2), dict)).splitlines()
+    assert json.loads(lines[-1]) == {"error": "Search error: scanner lost"}
+    assert len(lines) == 3
+
+    records = json.loads(body(frame_results(failing(2), dict, "json")))
+    assert records[:2] == [{"article_id": "A0"}, {"article_id": "A1"}]
+    assert records[-1] == {"error": "Search error: scanner lost"}
+    assert json.loads(body(frame_results(failing(), dict, "json"))) == [
+        {"error": "Search error: scanner lost"}]
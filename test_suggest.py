@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests for typeahead suggestions
+"""
+
+import os
+
+import pandas as pd
+
+from suggest import PrefixIndex, QueryLog, build_prefix_index
+
+def test_prefix_matches_any_word_ranked_by_count():
+    index = PrefixIndex([
+        ("Denim Jacket", "prod_name", 3),
+        ("Slim Denim Jeans", "prod_name", 7),
+        ("Wool Sweater", "prod_name", 5),
+    ])
+
+    assert [s["text"] for s in index.lookup("den")] == ["Slim Denim Jeans", "Denim Jacket"]
+    assert [s["text"] for s in index.lookup("SLIM  d")] == ["Slim Denim Jeans"]
+    assert index.lookup("x") == []
+
+def test_catalog_values_and_logged_queries_are_indexed(tmp_path):
+    log = QueryLog(str(tmp_path / "queries.jsonl"))
+    for query in ["blue shirt", "Blue Shirt", "blazer"]:
+        log.record(query)
+    catalog = pd.DataFrame({
+        "prod_name": ["Oxford Shirt", "Oxford Shirt", "Linen Blazer"],
+        "product_type_name": ["Shirt", "Shirt", "Blazer"],
+        "color": ["Blue", "White", "Beige"],
+    })
+
+    index = build_prefix_index(catalog, log.counts(), min_query_count=1)
+    suggestions = {s["text"]: s for s in index.lookup("bl")}
+    assert suggestions["blue shirt"] == {"text": "blue shirt", "kind": "query", "count": 2}
+    # A query matching a catalog value adds to its count instead of duplicating it
+    assert suggestions["Blazer"]["count"] == 2
+    assert set(suggestions) == {"blue shirt", "Blazer", "Blue", "Linen Blazer"}
+
+def test_top_requests_ranks_full_searches(tmp_path):
+    log = QueryLog(str(tmp_path / "queries.jsonl"))
+    for _ in range(3):
+        log.record("dress", groups=["Ladieswear"], items=[], target="text", limit=20)
+    log.record("dress", groups=[], items=[], target="text", limit=20)
+    log.record("shirt", groups=[], items=[], target="image")
+    log.record("shirt", groups=[], items=[], target="image")
+    log.flush()
+    with open(log.path, "a", encoding="utf-8") as f:
+        f.write("not json\n")
+
+    assert log.top_requests(2) == [
+        {"query": "dress", "groups": ["Ladieswear"], "items": [], "limit": 20, "target": "text"},
+        {"query": "shirt", "groups": [], "items": [], "limit": 20, "target": "image"},
+    ]
+    assert log.top_requests(0) == []
+
+def test_rare_queries_are_not_suggested(tmp_path):
+    log = QueryLog(str(tmp_path / "queries.jsonl"))
+    for query in ["blue shirt"] * 3 + ["blue private query"]:
+        log.record(query)
+
+    index = build_prefix_index(pd.DataFrame({"prod_name": []}), log.counts())
+    assert [s["text"] for s in index.lookup("blue")] == ["blue shirt"]
+
+def test_log_rotates_to_a_single_backup(tmp_path):
+    log = QueryLog(str(tmp_path / "queries.jsonl"), max_bytes=200)
+    for i in range(30):
+        log.record(f"query {i}")
+        log.flush()
+
+    assert os.path.exists(log.path + ".1")
+    assert os.path.getsize(log.path) < 200
+    assert not os.path.exists(log.path + ".2")
+    # Only the newest entries survive, still oldest first
+    queries = [entry["query"] for entry in log.entries()]
+    assert queries == [f"query {i}" for i in range(30 - len(queries), 30)]
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Tests for keyed table operations and in-place schema changes
+"""
+
+import re
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from table_ops import (add_missing_columns, column_type, delete_items, ensure_key_index,
+                       open_or_create_table, upsert_items)
+
+class FakeDataset:
+    """The slice of the Lance dataset API the table operations use"""
+
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+
+    @property
+    def data(self):
+        return self.db.tables[self.name]
+
+    def count_rows(self):
+        return self.data.num_rows
+
+    def list_indices(self):
+        return [{"name": f"{field}_idx", "type": "BTree", "fields": [field]}
+                for field in self.db.indices.get(self.name, [])]
+
+    @property
+    def version(self):
+        return self.db.versions.get(self.name, 1)
+
+    def to_table(self, columns=None, filter=None, limit=None):
+        data = self.data
+        if filter:
+            key, values = re.match(r"(\w+) IN \((.*)\)", filter).groups()
+            ids = [v.replace("''", "'") for v in re.findall(r"'((?:[^']|'')*)'", values)]
+            data = data.filter(pc.is_in(data.column(key), pa.array(ids, data.schema.field(key).type)))
+        data = data if limit is None else data.slice(0, limit)
+        return data.select(columns) if columns else data
+
+    def to_batches(self, columns=None):
+        return self.to_table(columns).to_batches()
+
+    def take(self, indices, columns=None):
+        return self.to_table(columns).take(pa.array(indices))
+
+    def drop_columns(self, columns):
+        self.db.tables[self.name] = self.data.drop_columns(columns)
+
+    def merge(self, other, left_on):
+        position = {key: i for i, key in enumerate(other.column(left_on).to_pylist())}
+        rows = pa.array([position.get(key) for key in self.data.column(left_on).to_pylist()], pa.int64())
+        data = self.data
+        for name in other.schema.names:
+            if name != left_on:
+                data = data.append_column(other.schema.field(name), other.column(name).take(rows))
+        self.db.tables[self.name] = data
+
+class FakeMergeInsert:
+    def __init__(self, table, key):
+        self.table = table
+        self.key = key
+
+    def when_matched_update_all(self):
+        return self
+
+    def when_not_matched_insert_all(self):
+        return self
+
+    def execute(self, data_df):
+        self.table.delete_keys(data_df[self.key].tolist())
+        self.table.add(data_df)
+
+class FakeTable:
+    """The slice of the LanceDB table API the table operations use"""
+
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+        self.schema = db.tables[name].schema
+
+    def to_lance(self):
+        return FakeDataset(self.db, self.name)
+
+    def create_scalar_index(self, column):
+        self.db.indices.setdefault(self.name, []).append(column)
+
+    def merge_insert(self, key):
+        return FakeMergeInsert(self, key)
+
+    def add(self, data_df):
+        data = self.db.tables[self.name]
+        rows = pa.Table.from_pandas(data_df, schema=data.schema, preserve_index=False)
+        self.db.tables[self.name] = pa.concat_tables([data, rows])
+
+    def delete_keys(self, ids):
+        data = self.db.tables[self.name]
+        self.db.tables[self.name] = data.filter(pc.invert(pc.is_in(data.column("article_id"), pa.array(ids))))
+
+    def delete(self, condition):
+        self.delete_keys(re.findall(r"'((?:[^']|'')*)'", condition))
+
+class FakeDB:
+    def __init__(self):
+        self.tables = {}
+        self.indices = {}
+        self.versions = {}
+        self.created = []
+
+    def table_names(self):
+        return list(self.tables)
+
+    def open_table(self, name):
+        return FakeTable(self, name)
+
+    def create_table(self, name, data, mode="create"):
+        self.created.append((name, mode))
+        self.tables[name] = data if isinstance(data, pa.Table) else pa.Table.from_pandas(data, preserve_index=False)
+        return FakeTable(self, name)
+
+def catalog_db(rows=3):
+    db = FakeDB()
+    db.create_table("hm_mini", pa.table({
+        "article_id": [f"A{i}" for i in range(rows)],
+        "prod_name": [f"Item {i}" for i in range(rows)],
+        "image_hash": [f"h{i}" for i in range(rows)],
+    }))
+    db.created.clear()
+    return db
+
+def test_column_type_maps_vectors_to_fixed_size_lists():
+    assert column_type(pd.Series([[0.1, 0.2, 0.3], None])) == pa.list_(pa.float32(), 3)
+    assert column_type(pd.Series(["a", "b"])) == pa.string()
+
+def test_new_columns_are_added_in_place_without_replacing_rows():
+    db = catalog_db()
+    incoming = pd.DataFrame({
+        "article_id": ["A1", "B9"],
+        "prod_name": ["Item 1 v2", "New item"],
+        "image_hash": ["h1", "h9"],
+        "vector": [[1.0, 2.0], [3.0, 4.0]],
+    })
+
+    table, created = open_or_create_table(db, "hm_mini", incoming)
+    assert not created and db.created == []
+    assert table.schema.field("vector").type == pa.list_(pa.float32(), 2)
+    upsert_items(table, incoming)
+
+    rows = db.tables["hm_mini"].to_pandas().set_index("article_id")
+    assert sorted(rows.index) == ["A0", "A1", "A2", "B9"]
+    assert rows.loc["A0", "prod_name"] == "Item 0" and rows.loc["A0", "vector"] is None
+    assert rows.loc["A1", "prod_name"] == "Item 1 v2" and list(rows.loc["A1", "vector"]) == [1.0, 2.0]
+
+def test_columns_missing_from_the_update_keep_stored_values():
+    db = catalog_db()
+    table, _ = open_or_create_table(db, "hm_mini", pd.DataFrame({"article_id": ["A2"], "prod_name": ["x"]}))
+    upsert_items(table, pd.DataFrame({"article_id": ["A2", "B1"], "prod_name": ["Renamed", "Fresh"]}))
+
+    rows = db.tables["hm_mini"].to_pandas().set_index("article_id")
+    assert rows.loc["A2", "image_hash"] == "h2" and rows.loc["A2", "prod_name"] == "Renamed"
+    assert pd.isna(rows.loc["B1", "image_hash"])
+
+def test_add_missing_columns_is_a_no_op_for_matching_frames():
+    db = catalog_db()
+    frame = pd.DataFrame({"article_id": ["A0"], "prod_name": ["x"], "image_hash": ["h"]})
+    assert add_missing_columns(db.open_table("hm_mini"), frame) == []
+
+def test_delete_counts_rows_actually_removed():
+    db = catalog_db()
+    assert delete_items(db.open_table("hm_mini"), ["A0", "A2", "missing"]) == 2
+    assert db.tables["hm_mini"].column("article_id").to_pylist() == ["A1"]
+    assert delete_items(db.open_table("hm_mini"), []) == 0
+
+def test_key_index_is_built_once_and_on_table_creation():
+    db = catalog_db()
+    table = db.open_table("hm_mini")
+    assert ensure_key_index(table)
+    assert not ensure_key_index(table)
+    assert db.indices == {"hm_mini": ["article_id"]}
+
+    open_or_create_table(db, "hm_new", pd.DataFrame({"article_id": ["N1"]}))
+    assert db.indices["hm_new"] == ["article_id"]
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for startup cache warm-up
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from admission import Overloaded
+from suggest import QueryLog
+from warmup import WarmUp, warm_searches
+
+def logged(tmp_path, queries):
+    log = QueryLog(str(tmp_path / "queries.jsonl"))
+    for query, times in queries:
+        for _ in range(times):
+            log.record(query, groups=[], items=[], limit=20, target="text")
+    return log
+
+class StubEncoder:
+    def __init__(self):
+        self.batches = []
+        self.vectors = {}
+
+    async def encode(self, texts):
+        self.batches.append(list(texts))
+        self.vectors.update({text: [float(len(text))] for text in texts})
+
+def test_failed_searches_are_skipped_and_the_rest_cached(tmp_path):
+    log = logged(tmp_path, [("dress", 3), ("broken", 2), ("shirt", 1)])
+    encoder = StubEncoder()
+    cache = {}
+
+    async def search(request):
+        if request["query"] == "broken":
+            raise HTTPException(status_code=500, detail="Search error")
+        cache[request["query"]] = encoder.vectors[request["query"]]
+        return None
+
+    warmed = asyncio.run(warm_searches(log, 3, encoder.encode, search))
+
+    assert warmed == 2
+    assert encoder.batches == [["dress", "broken", "shirt"]]
+    assert cache == {"dress": [5.0], "shirt": [5.0]}
+
+def test_overload_stops_warming(tmp_path):
+    log = logged(tmp_path, [("dress", 2), ("shirt", 1)])
+    searched = []
+
+    async def search(request):
+        searched.append(request["query"])
+        raise Overloaded("query", "queue full", 1)
+
+    assert asyncio.run(warm_searches(log, 2, StubEncoder().encode, search)) == 0
+    assert searched == ["dress"]
+
+def test_not_ready_until_warm_up_finishes(tmp_path):
+    log = logged(tmp_path, [("dress", 1)])
+    encoder = StubEncoder()
+    cache = {}
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def search(request):
+            await release.wait()
+            cache[request["query"]] = encoder.vectors[request["query"]]
+
+        warm_up = WarmUp()
+        warm_up.start(lambda: warm_searches(log, 1, encoder.encode, search))
+        await asyncio.sleep(0.01)
+        with pytest.raises(HTTPException) as excinfo:
+            warm_up.check()
+        assert excinfo.value.status_code == 503
+        assert cache == {}
+
+        release.set()
+        await warm_up.task
+        warm_up.check()
+
+    asyncio.run(scenario())
+    assert cache == {"dress": [5.0]}
+
+def test_failed_warm_up_still_becomes_ready():
+    async def warm():
+        raise RuntimeError("model not loaded")
+
+    async def scenario():
+        warm_up = WarmUp()
+        warm_up.start(warm)
+        await warm_up.task
+        return warm_up.ready
+
+    assert asyncio.run(scenario())
@@ -0,0 +1,63 @@
+"""
+Startup cache warm-up
+Replays the most repeated logged searches so the first real requests hit a
+warm cache, and tracks when the service is ready to take traffic.
+"""
+
+import asyncio
+
+from fastapi import HTTPException
+
+from admission import Overloaded
+
+async def warm_searches(query_log, count, encode, search, usable=lambda request: True):
+    """Encode the top logged queries in one pass, then replay their searches
+
+    encode(texts) stores the query vectors; search(request) runs one logged
+    request and returns its fallback reason, or None for a cacheable result.
+    A failing search is skipped; overload stops the warm-up, since live
+    traffic then fills the cache itself. Returns the number of searches cached.
+    """
+    requests = [r for r in query_log.top_requests(count) if usable(r)]
+    texts = list(dict.fromkeys(r["query"] for r in requests))
+    if texts:
+        try:
+            await encode(texts)
+        except Overloaded:
+            return 0
+        except Exception as e:
+            # Each search encodes its own text instead
+            print(f"Warm-up encode failed: {e}")
+    warmed = 0
+    for r in requests:
+        try:
+            warmed += await search(r) is None
+        except Overloaded:
+            break
+        except Exception as e:
+            print(f"Skipping warm-up search {r['query']!r}: {e}")
+    return warmed
+
+class WarmUp:
+    """Runs warm-up in the background; ready once it has finished, failed or been skipped"""
+
+    def __init__(self):
+        self.ready = False
+        self.task = None
+
+    def start(self, warm):
+        async def run():
+            try:
+                await warm()
+            except Exception as e:
+                # Warming is best effort; serve cold rather than never becoming ready
+                print(f"Search cache warm-up failed: {e}")
+            finally:
+                self.ready = True
+
+        self.task = asyncio.create_task(run())
+
+    def check(self):
+        """Raise a 503 until warm-up is over"""
+        if not self.ready:
+            raise HTTPException(status_code=503, detail="Warming search cache")